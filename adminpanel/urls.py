@@ -119,8 +119,10 @@ path('test-series-courses/create/', tviews.test_series_create, name='test_series
 path('test-series-courses/<int:pk>/', tviews.test_series_detail, name='test_series_detail'),
 path('test-series-courses/<int:pk>/edit/', tviews.test_series_edit, name='test_series_edit'),
 path('test-series-courses/<int:pk>/delete/', tviews.test_series_delete, name='test_series_delete'),
+path('test-series-courses/<int:pk>/clone/', tviews.test_series_clone, name='test_series_clone'),
 path('test-series-courses/<int:series_pk>/schedule-test/', tviews.test_create, name='test_create'),
 path('scheduled-tests/<int:pk>/edit/', tviews.test_edit, name='test_edit'),
+path('scheduled-tests/<int:pk>/clone/', tviews.test_clone, name='test_clone'),
 path('scheduled-tests/<int:test_pk>/add-question/', tviews.question_create, name='question_create'),
 
 
@@ -0,0 +1,70 @@
+# base/management/commands/copy_media.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.files.storage import InvalidStorageError, storages
+from django.core.management.base import BaseCommand, CommandError
+from base.storage import INCOMING_PREFIX, walk_files
+
+# Upload staging and attempt archives are node-local working data
+EXCLUDED_DIRS = ('storage/',)
+TEMP_PREFIXES = (INCOMING_PREFIX, '.tmp-')
+
+
+class Command(BaseCommand):
+    help = 'Copy every media file to another storage (e.g. an S3 bucket), several files at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', help="STORAGES alias to copy to, e.g. s3")
+        parser.add_argument('--source', default='default', help="STORAGES alias to copy from")
+        parser.add_argument('--workers', type=int, default=8, help="Files copied concurrently")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be copied")
+
+    def handle(self, *args, **options):
+        try:
+            source, target = storages[options['source']], storages[options['target']]
+        except InvalidStorageError as e:
+            raise CommandError(str(e))
+        if options['source'] == options['target']:
+            raise CommandError("Source and target must be different storages")
+
+        names = [
+            name for name in walk_files(source)
+            if not name.startswith(EXCLUDED_DIRS) and not name.rsplit('/', 1)[-1].startswith(TEMP_PREFIXES)
+        ]
+        self.stdout.write(f"{len(names)} file(s) to check")
+        stats = {'copied': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+
+        def copy(name):
+            size = source.size(name)
+            if target.exists(name):
+                # Re-runs only copy what is missing or was cut short
+                if target.size(name) == size:
+                    return 'skipped', 0
+                if not options['dry_run']:
+                    target.delete(name)
+            if not options['dry_run']:
+                with source.open(name, 'rb') as f:
+                    target.save(name, f)
+            return 'copied', size
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            futures = {pool.submit(copy, name): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    outcome, size = future.result()
+                except Exception as e:
+                    stats['failed'] += 1
+                    self.stderr.write(f"  ✗ {futures[future]}: {e}")
+                    continue
+                stats[outcome] += 1
+                stats['bytes'] += size
+                if outcome == 'copied' and options['verbosity'] > 1:
+                    self.stdout.write(f"  {futures[future]}")
+
+        action = 'Would copy' if options['dry_run'] else 'Copied'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {action} {stats['copied']} file(s) ({stats['bytes'] / 1024 ** 2:.1f} MB), "
+            f"{stats['skipped']} already present"
+        ))
+        if stats['failed']:
+            raise CommandError(f"{stats['failed']} file(s) failed; run the command again to retry them")
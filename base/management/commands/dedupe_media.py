@@ -0,0 +1,22 @@
+# base/management/commands/dedupe_media.py
+from django.core.management.base import BaseCommand, CommandError
+from base.storage import content_storage, dedupe_legacy_files, local_path
+
+
+class Command(BaseCommand):
+    help = 'Move existing course videos, PDFs and question images into content-addressed blobs, storing duplicates once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report how much would be saved")
+
+    def handle(self, *args, **options):
+        if not local_path(content_storage(), ''):
+            raise CommandError("dedupe_media works on local media only; run it before copy_media moves media to S3")
+        stats = dedupe_legacy_files(options['dry_run'])
+        if stats['missing']:
+            self.stdout.write(self.style.WARNING(f"⚠ {stats['missing']} referenced file(s) are missing and were left alone"))
+        action = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {action} {stats['files']} file(s) into blobs ({stats['rows']} row(s) updated), "
+            f"{stats['bytes_freed'] / 1024 ** 2:.1f} MB of duplicates freed"
+        ))
@@ -0,0 +1,18 @@
+# base/management/commands/gc_blobs.py
+from django.core.management.base import BaseCommand
+from base.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = 'Remove content-addressed media blobs that no row refers to any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=24 * 3600, help="Keep blobs written or reused within this many seconds")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be removed")
+
+    def handle(self, *args, **options):
+        removed, freed = collect_garbage(options['grace'], options['dry_run'])
+        for name in removed:
+            self.stdout.write(f"  {name}")
+        action = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f'✅ {action} {len(removed)} blob(s), {freed / 1024 ** 2:.1f} MB'))
@@ -0,0 +1,33 @@
+# base/management/commands/media_gc.py
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from base.orphans import BATCH_SIZE, QUARANTINE_DIR, collect_orphans
+from base.storage import local_path
+
+
+class Command(BaseCommand):
+    help = 'Delete or quarantine media files that no database row refers to any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=24 * 3600, help="Only touch files older than this many seconds")
+        parser.add_argument('--quarantine', action='store_true', help=f"Move orphans to MEDIA_ROOT/{QUARANTINE_DIR}/ instead of deleting them")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Orphans re-checked and removed per batch")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be removed")
+
+    def handle(self, *args, **options):
+        root = local_path(default_storage, '')
+        if not root:
+            raise CommandError("media_gc scans local media only; on S3 use gc_blobs and bucket lifecycle rules")
+        handled, stats = collect_orphans(
+            options['min_age'], options['dry_run'], options['quarantine'], max(1, options['batch_size']), root
+        )
+        for name in handled:
+            self.stdout.write(f"  {name}")
+        if options['dry_run']:
+            action = 'Would remove'
+        else:
+            action = 'Quarantined' if options['quarantine'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {action} {stats['orphans']} orphaned file(s), {stats['bytes'] / 1024 ** 2:.1f} MB "
+            f"({stats['scanned']} scanned, {stats['recent']} too recent to touch)"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_notificationbatch_notification_clicked_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercourseaccess',
+            name='media_token_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -153,6 +153,7 @@ class UserCourseAccess(models.Model):
     access_granted_at = models.DateTimeField(default=timezone.now)
     is_active = models.BooleanField(default=True)
     expires_at = models.DateTimeField(null=True, blank=True)  # For time-limited access
+    media_token_version = models.PositiveIntegerField(default=1)  # Bumped on revocation; older signed media URLs are refused
     
     class Meta:
         unique_together = ('user', 'course_id', 'course_type')
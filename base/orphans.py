@@ -0,0 +1,171 @@
+"""
+Orphaned media files.
+
+Deleting a course, PDF, question or test series removes its rows but leaves
+its uploads in MEDIA_ROOT (only ``Banner.delete`` removes its image).
+``manage.py media_gc`` finds files no row refers to and deletes them, or
+moves them to a quarantine directory to be inspected first.
+
+A file is referenced when any FileField/ImageField of any model holds its
+name, when it lies in the HLS output directory of a course video (playlists,
+segments, ``offline.json``), or when it is a video's preview sprite or
+WebVTT index. Shared files (cloned tests, content-addressed blobs) are kept
+as long as one row uses them.
+
+MEDIA_ROOT is walked with ``os.scandir`` one directory at a time and
+references are read in chunks, so memory grows with the number of
+referenced names, not with the size of the tree. Files modified within
+``min_age`` seconds are never touched: their row may not be saved yet
+(uploads, jobs writing HLS output). Orphans are handled in batches and each
+batch is checked against the database again just before it is removed.
+"""
+import os
+import posixpath
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+REFERENCE_CHUNK = 2000
+BATCH_SIZE = 500
+# Upload staging, attempt archives and the quarantine itself
+KEEP_DIRS = {'storage'}
+QUARANTINE_DIR = os.path.join('storage', 'quarantine')
+
+
+def file_fields():
+    """``(model, field name)`` of every concrete FileField/ImageField"""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def referenced_media():
+    """``(names, directories)`` referenced by rows; directories end with ``/``"""
+    from video_courses.models import CourseVideo
+
+    names, directories = set(), set()
+    for model, field in file_fields():
+        rows = model._base_manager.exclude(**{field: ''}).exclude(**{f"{field}__isnull": True})
+        names.update(rows.values_list(field, flat=True).iterator(chunk_size=REFERENCE_CHUNK))
+
+    rows = CourseVideo._base_manager.values_list('hls_playlist', 'preview_sprite', 'preview_vtt')
+    for playlist, sprite, vtt in rows.iterator(chunk_size=REFERENCE_CHUNK):
+        if playlist:
+            directories.add(posixpath.dirname(playlist) + '/')
+        names.update(name for name in (sprite, vtt) if name)
+    return names, directories
+
+
+def scan_media(root, skip_directories=()):
+    """Yield ``(name, os.DirEntry)`` for every file below ``root``, depth first"""
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        try:
+            iterator = os.scandir(os.path.join(root, relative))
+        except FileNotFoundError:
+            continue
+        with iterator as entries:
+            for entry in entries:
+                name = posixpath.join(relative, entry.name) if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in KEEP_DIRS and name + '/' not in skip_directories:
+                        pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry
+
+
+def _still_referenced(names):
+    """Names of ``names`` that rows created since the scan started refer to"""
+    from video_courses.models import CourseVideo
+
+    found = set()
+    for model, field in file_fields():
+        found.update(model._base_manager.filter(**{f"{field}__in": names}).values_list(field, flat=True))
+    found.update(
+        name
+        for row in CourseVideo._base_manager.filter(Q(preview_sprite__in=names) | Q(preview_vtt__in=names))
+        .values_list('preview_sprite', 'preview_vtt')
+        for name in row
+    )
+    return found
+
+
+def _remove_empty_parents(root, name):
+    directory = posixpath.dirname(name)
+    while directory:
+        try:
+            os.rmdir(os.path.join(root, directory))
+        except OSError:
+            return
+        directory = posixpath.dirname(directory)
+
+
+def _dispose(root, batch, quarantine):
+    """Delete or quarantine one batch; returns ``(names, bytes)`` actually handled"""
+    live = _still_referenced([name for name, _ in batch])
+    handled, freed = [], 0
+    for name, size in batch:
+        if name in live:
+            continue
+        path = os.path.join(root, name)
+        try:
+            if quarantine:
+                target = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        _remove_empty_parents(root, name)
+        handled.append(name)
+        freed += size
+    return handled, freed
+
+
+def collect_orphans(min_age=24 * 3600, dry_run=False, quarantine=False, batch_size=BATCH_SIZE, root=None):
+    """
+    Remove (or with ``quarantine`` move to ``storage/quarantine/<timestamp>/``)
+    unreferenced files older than ``min_age`` seconds. Returns the handled
+    names and counts: ``scanned``, ``recent``, ``orphans`` and ``bytes``.
+    """
+    root = str(root or settings.MEDIA_ROOT)
+    quarantine_root = None
+    if quarantine and not dry_run:
+        quarantine_root = os.path.join(root, QUARANTINE_DIR, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    names, directories = referenced_media()
+    cutoff = datetime.now().timestamp() - min_age
+    stats = {'scanned': 0, 'recent': 0, 'orphans': 0, 'bytes': 0}
+    handled, batch = [], []
+
+    def flush():
+        if dry_run:
+            done, freed = [name for name, _ in batch], sum(size for _, size in batch)
+        else:
+            done, freed = _dispose(root, batch, quarantine_root)
+        handled.extend(done)
+        stats['orphans'] += len(done)
+        stats['bytes'] += freed
+        batch.clear()
+
+    for name, entry in scan_media(root, directories):
+        stats['scanned'] += 1
+        if name in names:
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime > cutoff:
+            stats['recent'] += 1
+            continue
+        batch.append((name, stat.st_size))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return handled, stats
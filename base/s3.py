@@ -0,0 +1,359 @@
+"""
+S3-compatible object storage for media (AWS S3, MinIO, Ceph, R2, ...).
+
+Point both media aliases of ``STORAGES`` at the same bucket and location so
+app nodes share one media store and no bytes live on their disks::
+
+    S3_OPTIONS = {"bucket_name": "edutrellis-media", "endpoint_url": "http://minio:9000", ...}
+    STORAGES["default"] = {"BACKEND": "base.s3.S3Storage", "OPTIONS": S3_OPTIONS}
+    STORAGES["content"] = {"BACKEND": "base.s3.S3ContentAddressedStorage", "OPTIONS": S3_OPTIONS}
+
+* Uploads larger than ``multipart_threshold`` are sent as multipart uploads
+  of ``multipart_chunksize`` parts, ``max_concurrency`` parts at a time.
+  Memory stays at about concurrency x part size whatever the file size, and
+  a failed upload is aborted so no orphaned parts are billed.
+* Reads stream the object body; seeking re-requests from the new offset
+  with a ``Range`` header.
+* ``url()`` and ``presigned_url()`` return presigned GET URLs valid for
+  ``querystring_expire`` seconds. ``serve_file`` answers entitled requests
+  with a redirect to one, so video and PDF bytes never pass through Django.
+  ffprobe/ffmpeg read sources through the same URLs with range requests
+  (see ``video_courses.probing.local_source``).
+
+boto3 is only imported when the storage is first used (``pip install boto3``).
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from .storage import blob_name, is_blob
+
+MB = 1024 * 1024
+# S3 refuses parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * MB
+DELETE_BATCH = 1000
+
+
+def _is_missing(error):
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+class S3File(File):
+    """Read-only object body; opened lazily, seekable through range requests"""
+
+    def __init__(self, storage, name):
+        self._storage = storage
+        self._body = None
+        self._position = 0
+        self._size = None
+        super().__init__(None, name)
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._size = self._storage.size(self.name)
+        return self._size
+
+    @property
+    def closed(self):
+        return False
+
+    def _stream(self):
+        from botocore.exceptions import ClientError
+
+        if self._body is None:
+            params = {'Bucket': self._storage.bucket_name, 'Key': self._storage._key(self.name)}
+            if self._position:
+                params['Range'] = f"bytes={self._position}-"
+            try:
+                self._body = self._storage.client.get_object(**params)['Body']
+            except ClientError as e:
+                if _is_missing(e):
+                    raise FileNotFoundError(self.name)
+                raise
+        return self._body
+
+    def open(self, mode='rb'):
+        self.seek(0)
+        return self
+
+    def read(self, size=-1):
+        if self._position and self._position >= self.size:
+            return b''
+        data = self._stream().read(None if size is None or size < 0 else size)
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset != self._position:
+            self.close()
+            self._position = offset
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+
+@deconstructible(path='base.s3.S3Storage')
+class S3Storage(Storage):
+    def __init__(
+        self, bucket_name=None, endpoint_url=None, region_name=None, access_key=None, secret_key=None,
+        location='', querystring_expire=3600, multipart_threshold=64 * MB, multipart_chunksize=16 * MB,
+        max_concurrency=8, addressing_style=None,
+    ):
+        if not bucket_name:
+            raise ImproperlyConfigured(f"{type(self).__name__} needs the bucket_name option")
+        self.bucket_name = bucket_name
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.location = location.strip('/')
+        self.querystring_expire = querystring_expire
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = max(MIN_PART_SIZE, multipart_chunksize)
+        self.max_concurrency = max(1, max_concurrency)
+        self.addressing_style = addressing_style
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """boto3 S3 client, shared by all threads (boto3 clients are thread safe)"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        import boto3
+                        from botocore.config import Config
+                    except ImportError:
+                        raise ImproperlyConfigured("S3 media storage requires boto3 (pip install boto3)")
+                    config = Config(
+                        signature_version='s3v4',
+                        max_pool_connections=max(10, self.max_concurrency * 2),
+                        s3={'addressing_style': self.addressing_style} if self.addressing_style else {},
+                    )
+                    self._client = boto3.session.Session().client(
+                        's3',
+                        endpoint_url=self.endpoint_url,
+                        region_name=self.region_name,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                        config=config,
+                    )
+        return self._client
+
+    def _key(self, name):
+        name = posixpath.normpath((name or '').replace('\\', '/')).lstrip('/')
+        if name == '.':
+            name = ''
+        if name == '..' or name.startswith('../'):
+            raise SuspiciousFileOperation(f"Detected path traversal attempt in '{name}'")
+        return posixpath.join(self.location, name) if self.location else name
+
+    def _head(self, name):
+        return self.client.head_object(Bucket=self.bucket_name, Key=self._key(name))
+
+    # ---------------------------------------------
+    # Reading
+    # ---------------------------------------------
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError("S3 media files are read-only; save a new file instead")
+        return S3File(self, name)
+
+    def exists(self, name):
+        from botocore.exceptions import ClientError
+
+        try:
+            self._head(name)
+        except ClientError as e:
+            if _is_missing(e):
+                return False
+            raise
+        return True
+
+    def size(self, name):
+        return self._head(name)['ContentLength']
+
+    def get_modified_time(self, name):
+        modified = self._head(name)['LastModified']
+        return modified if settings.USE_TZ else timezone.make_naive(modified)
+
+    def listdir(self, path):
+        prefix = self._key(path).rstrip('/')
+        prefix = f"{prefix}/" if prefix else ''
+        directories, files = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            directories.extend(entry['Prefix'][len(prefix):].rstrip('/') for entry in page.get('CommonPrefixes', []))
+            files.extend(entry['Key'][len(prefix):] for entry in page.get('Contents', []))
+        return directories, files
+
+    # ---------------------------------------------
+    # URLs
+    # ---------------------------------------------
+    def presigned_url(self, name, expires=None, **response_headers):
+        """
+        Presigned GET URL; ``response_headers`` override headers of the
+        response, e.g. ``ResponseContentDisposition``.
+        """
+        params = {'Bucket': self.bucket_name, 'Key': self._key(name), **response_headers}
+        return self.client.generate_presigned_url(
+            'get_object', Params=params, ExpiresIn=expires or self.querystring_expire
+        )
+
+    def url(self, name):
+        return self.presigned_url(name)
+
+    # ---------------------------------------------
+    # Writing
+    # ---------------------------------------------
+    def _save(self, name, content):
+        key = self._key(name)
+        extra = {'ContentType': mimetypes.guess_type(name)[0] or 'application/octet-stream'}
+        size = getattr(content, 'size', None)
+        if size is not None and size <= self.multipart_threshold:
+            body = b''.join(content.chunks())
+            self.client.put_object(Bucket=self.bucket_name, Key=key, Body=body, **extra)
+        else:
+            self._multipart_upload(key, content, extra)
+        return name.replace('\\', '/')
+
+    def _upload_part(self, key, upload_id, number, data):
+        response = self.client.upload_part(
+            Bucket=self.bucket_name, Key=key, UploadId=upload_id, PartNumber=number, Body=data
+        )
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def _multipart_upload(self, key, content, extra):
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=key, **extra)['UploadId']
+        parts = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='s3-upload') as pool:
+                pending = set()
+                for number, data in enumerate(content.chunks(self.multipart_chunksize), start=1):
+                    # Bounded read-ahead: never hold more than max_concurrency parts
+                    if len(pending) >= self.max_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        parts.extend(future.result() for future in done)
+                    pending.add(pool.submit(self._upload_part, key, upload_id, number, data))
+                parts.extend(future.result() for future in pending)
+            if not parts:
+                # Empty file: S3 cannot complete an upload without parts
+                self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+                self.client.put_object(Bucket=self.bucket_name, Key=key, Body=b'', **extra)
+                return
+            parts.sort(key=lambda part: part['PartNumber'])
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+            raise
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket_name, Key=self._key(name))
+
+    def delete_directory(self, name):
+        """Remove every object under ``name/``"""
+        prefix = self._key(name).rstrip('/') + '/'
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys = [{'Key': entry['Key']} for entry in page.get('Contents', [])]
+            for start in range(0, len(keys), DELETE_BATCH):
+                self.client.delete_objects(
+                    Bucket=self.bucket_name, Delete={'Objects': keys[start:start + DELETE_BATCH], 'Quiet': True}
+                )
+
+
+@deconstructible(path='base.s3.S3ContentAddressedStorage')
+class S3ContentAddressedStorage(S3Storage):
+    """``base.storage.ContentAddressedStorage`` on an object store"""
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        top = name.split('/', 1)[0] if '/' in name else ''
+        extension = os.path.splitext(name)[1]
+        digest = getattr(content, 'sha256', None)
+        staged = content.temporary_file_path() if digest and hasattr(content, 'temporary_file_path') else None
+        spool = None
+        if staged is None:
+            # Hash while spooling to disk, so the upload below can be sized and retried
+            spool = tempfile.TemporaryFile()
+            hasher = hashlib.sha256()
+            for chunk in content.chunks():
+                hasher.update(chunk)
+                spool.write(chunk)
+            digest = hasher.hexdigest()
+            size = spool.tell()
+            content = File(spool, name)
+            content.size = size
+
+        final = blob_name(top, digest, extension)
+        try:
+            if self.exists(final):
+                self._touch(final)
+            else:
+                super()._save(final, content)
+        finally:
+            if spool is not None:
+                spool.close()
+        if staged:
+            os.remove(staged)
+        return final
+
+    def _touch(self, name):
+        """Refresh LastModified of a reused blob so gc_blobs keeps it through its grace period"""
+        from botocore.exceptions import ClientError
+
+        key = self._key(name)
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket_name, Key=key, CopySource={'Bucket': self.bucket_name, 'Key': key},
+                MetadataDirective='REPLACE', ContentType=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            )
+        except ClientError:
+            # Objects over 5 GB cannot be copied in one request; the grace period is a safety net only
+            pass
+
+    def delete(self, name):
+        """Blobs may be shared; unreferenced ones are removed by gc_blobs"""
+        if name and not is_blob(name):
+            super().delete(name)
+
+    def remove_blob(self, name):
+        super().delete(name)
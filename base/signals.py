@@ -1,8 +1,10 @@
 # base/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from live_class.models import LiveClassCourse, LiveClassSession
-from .models import User, Notification
+from video_courses.streaming import forget_entitlement
+from video_courses.signing import forget_media_token_version, revoke_media_tokens
+from .models import User, Notification, UserCourseAccess
 import logging
 
 logger = logging.getLogger(__name__)
@@ -150,4 +152,21 @@ def notify_session_became_free(sender, instance, created, **kwargs):
                 logger.info(f"Created {len(notifications)} notifications for session that became free: {instance.class_name}")
                 
             except Exception as e:
-                logger.error(f"Error creating notifications for session that became free: {e}")
\ No newline at end of file
+                logger.error(f"Error creating notifications for session that became free: {e}")
+
+
+@receiver(post_save, sender=UserCourseAccess)
+@receiver(post_delete, sender=UserCourseAccess)
+def forget_cached_entitlement(sender, instance, **kwargs):
+    """Purchases, renewals and revocations take effect on the next video or PDF request"""
+    forget_entitlement(instance.user_id, instance.course_id, instance.course_type)
+
+    # Signed media URLs already handed out stop working when access is lost
+    resource = f"{instance.course_type}:{instance.course_id}"
+    if kwargs.get('signal') is post_delete or instance.has_access:
+        # Re-read the version: a deleted grant reads as 0 and a new one starts at 1
+        forget_media_token_version(instance.user_id, resource)
+    else:
+        revoke_media_tokens(instance.user_id, resource)
+        # A later save() of this instance must not write the old version back
+        instance.refresh_from_db(fields=['media_token_version'])
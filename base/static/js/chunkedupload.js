@@ -0,0 +1,114 @@
+// Resumable chunked uploads (tus protocol, see video_courses/uploads.py)
+(function() {
+  'use strict';
+
+  const ENDPOINT = '/uploads/';
+  const DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024;
+  const RETRY_DELAYS = [1000, 3000, 5000, 10000, 20000];
+
+  function csrfToken() {
+    const input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    if (input) return input.value;
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  }
+
+  function encodeMetadata(metadata) {
+    return Object.entries(metadata)
+      .map(([key, value]) => `${key} ${btoa(unescape(encodeURIComponent(value)))}`)
+      .join(',');
+  }
+
+  // Uploads survive a reload: the same file resumes where it stopped
+  function storageKey(file, kind) {
+    return `chunked-upload:${kind}:${file.name}:${file.size}:${file.lastModified}`;
+  }
+
+  function sleep(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+  }
+
+  function request(method, url, headers, body) {
+    return fetch(url, {
+      method: method,
+      credentials: 'same-origin',
+      headers: Object.assign({ 'Tus-Resumable': '1.0.0', 'X-CSRFToken': csrfToken() }, headers),
+      body: body,
+    });
+  }
+
+  async function createUpload(file, kind) {
+    const response = await request('POST', ENDPOINT, {
+      'Upload-Length': String(file.size),
+      'Upload-Metadata': encodeMetadata({ filename: file.name, kind: kind }),
+    });
+    if (response.status !== 201) {
+      throw new Error((await response.text()) || `Upload refused (${response.status})`);
+    }
+    return {
+      url: response.headers.get('Location'),
+      chunkSize: Math.min(DEFAULT_CHUNK_SIZE, parseInt(response.headers.get('Upload-Chunk-Max-Size'), 10) || DEFAULT_CHUNK_SIZE),
+    };
+  }
+
+  async function currentOffset(url) {
+    const response = await request('HEAD', url, {});
+    if (response.status !== 200) return null;
+    return parseInt(response.headers.get('Upload-Offset'), 10);
+  }
+
+  // Upload `file` and resolve with the upload id to submit with the form
+  async function upload(file, kind, onProgress) {
+    const key = storageKey(file, kind);
+    let session = JSON.parse(localStorage.getItem(key) || 'null');
+    let offset = session ? await currentOffset(session.url).catch(() => null) : null;
+    if (offset === null) {
+      session = await createUpload(file, kind);
+      localStorage.setItem(key, JSON.stringify(session));
+      offset = 0;
+    }
+
+    let attempt = 0;
+    while (offset < file.size) {
+      if (onProgress) onProgress(offset, file.size);
+      const chunk = file.slice(offset, offset + session.chunkSize);
+      try {
+        const response = await request('PATCH', session.url, {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset),
+        }, chunk);
+        if (response.status === 204) {
+          offset = parseInt(response.headers.get('Upload-Offset'), 10);
+          attempt = 0;
+          continue;
+        }
+        if (response.status === 409) {
+          // Another tab or a lost response moved the offset: ask the server
+          offset = await currentOffset(session.url);
+          if (offset === null) {
+            localStorage.removeItem(key);
+            throw new Error('Upload expired. Submit again to restart it.');
+          }
+          continue;
+        }
+        if (response.status < 500) {
+          localStorage.removeItem(key);
+          throw new Error((await response.text()) || `Upload failed (${response.status})`);
+        }
+      } catch (error) {
+        if (!(error instanceof TypeError)) throw error;  // TypeError = network failure
+      }
+      if (attempt >= RETRY_DELAYS.length) {
+        throw new Error('Upload interrupted. Submit again to resume.');
+      }
+      await sleep(RETRY_DELAYS[attempt++]);
+      offset = (await currentOffset(session.url).catch(() => null)) ?? offset;
+    }
+
+    localStorage.removeItem(key);
+    if (onProgress) onProgress(file.size, file.size);
+    return session.url.replace(/\/$/, '').split('/').pop();
+  }
+
+  window.ChunkedUpload = { upload: upload };
+})();
@@ -1,7 +1,13 @@
 // Service Worker for EduTrellis PWA
-const CACHE_VERSION = 'edutrellis-v1.0.0';
+const CACHE_VERSION = 'edutrellis-v1.1.0';
 const CACHE_NAME = `edutrellis-cache-${CACHE_VERSION}`;
 
+// Offline download packs of purchased video courses (see video_courses/offline.py).
+// Kept in their own cache so app updates do not throw away downloaded lectures.
+const PACK_CACHE = 'edutrellis-offline-packs';
+const PACK_PREFIX = '/offline-packs/';
+const PACK_CONCURRENCY = 3;
+
 // Files to cache immediately on install
 const STATIC_CACHE_URLS = [
   '/',
@@ -44,7 +50,7 @@ self.addEventListener('activate', (event) => {
       .then((cacheNames) => {
         return Promise.all(
           cacheNames.map((cacheName) => {
-            if (cacheName !== CACHE_NAME) {
+            if (cacheName !== CACHE_NAME && cacheName !== PACK_CACHE) {
               console.log('[ServiceWorker] Deleting old cache:', cacheName);
               return caches.delete(cacheName);
             }
@@ -68,6 +74,17 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  // Downloaded lectures are answered from the pack cache only
+  if (url.pathname.startsWith(PACK_PREFIX)) {
+    event.respondWith(servePackFile(url.pathname));
+    return;
+  }
+
+  // Signed media is large and served with its own cache headers
+  if (url.pathname.startsWith('/signed-media/')) {
+    return;
+  }
+
   // Skip Chrome extensions and browser-specific URLs
   if (request.url.includes('chrome-extension://') || 
       request.url.includes('moz-extension://') ||
@@ -129,8 +146,134 @@ self.addEventListener('message', (event) => {
   if (event.data && event.data.type === 'SKIP_WAITING') {
     self.skipWaiting();
   }
+  if (event.data && event.data.type === 'SYNC_PACK') {
+    event.waitUntil(syncPack(event.data.url, event.source));
+  }
+  if (event.data && event.data.type === 'REMOVE_PACK') {
+    event.waitUntil(removePack(event.data.course, event.source));
+  }
 });
 
+// ===== OFFLINE PACKS =====
+function chunkKey(sha256) {
+  return `${PACK_PREFIX}chunks/${sha256}.ts`;
+}
+
+function packKey(courseId) {
+  return `${PACK_PREFIX}courses/${courseId}.json`;
+}
+
+async function servePackFile(pathname) {
+  const cache = await caches.open(PACK_CACHE);
+  const cached = await cache.match(pathname);
+  return cached || new Response('Not downloaded', { status: 404, headers: { 'Content-Type': 'text/plain' } });
+}
+
+async function sha256Hex(buffer) {
+  const digest = await crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function fetchChunk(chunk) {
+  const response = await fetch(chunk.url, { credentials: 'same-origin' });
+  if (!response.ok) {
+    throw new Error(`Chunk download failed (${response.status})`);
+  }
+  const body = await response.arrayBuffer();
+  if (await sha256Hex(body) !== chunk.sha256) {
+    throw new Error('Chunk is corrupt, please sync again');
+  }
+  return body;
+}
+
+// Download every chunk of a pack that is not cached yet. Chunks are stored
+// under their content hash, so an interrupted or repeated sync only fetches
+// what is missing or has changed.
+async function syncPack(manifestUrl, client) {
+  const notify = (data) => client && client.postMessage(Object.assign({ type: 'PACK_PROGRESS' }, data));
+  try {
+    const response = await fetch(manifestUrl, { credentials: 'same-origin' });
+    if (!response.ok) {
+      throw new Error(`Pack request failed (${response.status})`);
+    }
+    const pack = await response.json();
+    const cache = await caches.open(PACK_CACHE);
+    const videos = pack.videos.filter((video) => video.available);
+
+    const chunks = new Map();
+    videos.forEach((video) => video.chunks.forEach((chunk) => chunks.set(chunk.sha256, chunk)));
+    const queue = [];
+    for (const chunk of chunks.values()) {
+      if (!(await cache.match(chunkKey(chunk.sha256)))) {
+        queue.push(chunk);
+      }
+    }
+
+    let done = chunks.size - queue.length;
+    notify({ course: pack.course, done: done, total: chunks.size });
+    const worker = async () => {
+      while (queue.length) {
+        const chunk = queue.shift();
+        const body = await fetchChunk(chunk);
+        await cache.put(chunkKey(chunk.sha256), new Response(body, {
+          headers: { 'Content-Type': 'video/mp2t', 'Content-Length': String(body.byteLength) }
+        }));
+        done += 1;
+        notify({ course: pack.course, done: done, total: chunks.size });
+      }
+    };
+    await Promise.all(Array.from({ length: PACK_CONCURRENCY }, worker));
+
+    for (const video of videos) {
+      await cache.put(video.playlist_url, new Response(video.playlist, {
+        headers: { 'Content-Type': 'application/vnd.apple.mpegurl' }
+      }));
+    }
+    await cache.put(packKey(pack.course), new Response(JSON.stringify(pack), {
+      headers: { 'Content-Type': 'application/json' }
+    }));
+    await pruneChunks(cache);
+    notify({ course: pack.course, done: done, total: chunks.size, complete: true, version: pack.version });
+  } catch (error) {
+    console.error('[ServiceWorker] Pack sync failed:', error);
+    notify({ error: error.message });
+  }
+}
+
+async function removePack(courseId, client) {
+  const cache = await caches.open(PACK_CACHE);
+  const stored = await cache.match(packKey(courseId));
+  if (stored) {
+    const pack = await stored.json();
+    for (const video of pack.videos.filter((v) => v.available)) {
+      await cache.delete(video.playlist_url);
+    }
+    await cache.delete(packKey(courseId));
+    await pruneChunks(cache);
+  }
+  if (client) {
+    client.postMessage({ type: 'PACK_PROGRESS', course: courseId, removed: true });
+  }
+}
+
+// Drop chunks no stored pack refers to any more (replaced or removed lectures)
+async function pruneChunks(cache) {
+  const keys = await cache.keys();
+  const used = new Set();
+  for (const request of keys) {
+    if (new URL(request.url).pathname.startsWith(`${PACK_PREFIX}courses/`)) {
+      const pack = await (await cache.match(request)).json();
+      pack.videos.filter((v) => v.available).forEach((v) => v.chunks.forEach((c) => used.add(c.sha256)));
+    }
+  }
+  for (const request of keys) {
+    const match = new URL(request.url).pathname.match(/\/chunks\/([0-9a-f]{64})\.ts$/);
+    if (match && !used.has(match[1])) {
+      await cache.delete(request);
+    }
+  }
+}
+
 // Background sync (for future features)
 self.addEventListener('sync', (event) => {
   if (event.tag === 'sync-data') {
@@ -0,0 +1,298 @@
+"""
+Content-addressed media storage.
+
+Course videos, e-library PDFs and question/solution images are often the
+same file uploaded again (to another course or bundle, or while editing a
+cloned test). FileFields using ``content_storage`` store every distinct
+file once, named after its SHA-256:
+
+    <top-level upload dir>/blobs/<first two hex digits>/<sha256><ext>
+
+e.g. ``elibrary/blobs/3f/3fa4...e1.pdf``. The digest is computed while the
+upload streams into a temporary file next to the blobs; if that blob already
+exists the copy is dropped and the existing name is returned. Files that
+arrive with a known digest (finished chunked uploads, see
+video_courses/uploads.py) are moved in without being read again.
+
+Blob names never change content, so they can be cached forever by browsers
+and CDNs. Blobs are shared between rows, so ``delete()`` never removes one:
+``manage.py gc_blobs`` counts the references of every blob across all
+content-addressed FileFields and removes the unreferenced ones, and
+``manage.py dedupe_media`` moves files uploaded before this storage existed
+into blobs. The same scheme runs on object stores through
+``base.s3.S3ContentAddressedStorage``; garbage collection only uses the
+storage API and works with either.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.files import File
+from django.db import models, transaction
+from django.utils import timezone
+
+BLOB_DIR = 'blobs'
+INCOMING_PREFIX = '.incoming-'
+UPLOAD_WORKERS = 8
+BLOB_RE = re.compile(r'(?:^|/)blobs/([0-9a-f]{2})/(\1[0-9a-f]{62})(\.[a-z0-9]{1,8})?$')
+EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,8}$')
+
+
+def content_storage():
+    """Storage of content-addressed FileFields (``STORAGES['content']``)"""
+    return storages['content']
+
+
+def is_blob(name):
+    return bool(name and BLOB_RE.search(name))
+
+
+def blob_name(top, digest, extension=''):
+    extension = extension.lower()
+    if not EXTENSION_RE.match(extension):
+        extension = ''
+    return posixpath.join(top, BLOB_DIR, digest[:2], digest + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save
+        return name
+
+    def _save(self, name, content):
+        top = name.split('/', 1)[0] if '/' in name else ''
+        extension = os.path.splitext(name)[1]
+        blobs_root = self.path(posixpath.join(top, BLOB_DIR))
+        os.makedirs(blobs_root, exist_ok=True)
+
+        digest = getattr(content, 'sha256', None)
+        if digest and hasattr(content, 'temporary_file_path'):
+            source = content.temporary_file_path()
+        else:
+            fd, source = tempfile.mkstemp(dir=blobs_root, prefix=INCOMING_PREFIX)
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    f.write(chunk)
+            digest = hasher.hexdigest()
+
+        final = blob_name(top, digest, extension)
+        path = self.path(final)
+        if os.path.exists(path):
+            os.remove(source)
+            # Fresh reference: keep gc_blobs from collecting it before the row is saved
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_move_safe(source, path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+        return final
+
+    def delete(self, name):
+        """Blobs may be shared; unreferenced ones are removed by gc_blobs"""
+        if name and not is_blob(name):
+            super().delete(name)
+
+    def remove_blob(self, name):
+        super().delete(name)
+
+
+# ---------------------------------------------
+# Directories of generated media
+# ---------------------------------------------
+def local_path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def upload_directory(storage, local_dir, name, workers=UPLOAD_WORKERS):
+    """Save every file under ``local_dir`` as ``name/<relative path>``, concurrently"""
+    files = []
+    for directory, _, filenames in os.walk(local_dir):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            files.append((path, posixpath.join(name, os.path.relpath(path, local_dir).replace(os.sep, '/'))))
+
+    def save(item):
+        path, target = item
+        with open(path, 'rb') as f:
+            storage.save(target, File(f, target))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-upload') as pool:
+        list(pool.map(save, files))
+
+
+@contextmanager
+def local_directory(storage, name):
+    """
+    Local directory for tools that write many files (ffmpeg HLS output):
+    the storage directory itself on local storage, otherwise a temporary
+    directory uploaded to ``name`` when the block exits without error.
+    """
+    path = local_path(storage, name)
+    if path:
+        os.makedirs(path, exist_ok=True)
+        yield path
+        return
+    with tempfile.TemporaryDirectory(prefix='media-') as tmp:
+        yield tmp
+        upload_directory(storage, tmp, name)
+
+
+def delete_directory(storage, name):
+    """Remove ``name`` and everything below it"""
+    if not name:
+        return
+    path = local_path(storage, name)
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+    elif hasattr(storage, 'delete_directory'):
+        storage.delete_directory(name)
+    else:
+        directories, files = storage.listdir(name)
+        for directory in directories:
+            delete_directory(storage, posixpath.join(name, directory))
+        for filename in files:
+            storage.delete(posixpath.join(name, filename))
+
+
+def walk_files(storage, name=''):
+    """Storage names of every file below ``name``"""
+    try:
+        directories, files = storage.listdir(name)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        yield posixpath.join(name, filename) if name else filename
+    for directory in directories:
+        yield from walk_files(storage, posixpath.join(name, directory) if name else directory)
+
+
+# ---------------------------------------------
+# References and garbage collection
+# ---------------------------------------------
+def content_fields():
+    """``(model, field name)`` of every FileField stored in content_storage"""
+    storage = content_storage()
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, models.FileField) and field.storage is storage
+    ]
+
+
+def blob_references():
+    """``Counter`` of blob name -> number of rows referring to it"""
+    references = Counter()
+    for model, field in content_fields():
+        names = model._base_manager.exclude(**{field: ''}).exclude(**{f"{field}__isnull": True})
+        references.update(name for name in names.values_list(field, flat=True).iterator() if is_blob(name))
+    return references
+
+
+def stored_blobs():
+    """Storage names of every stored blob, and of leftovers of interrupted uploads"""
+    storage = content_storage()
+    try:
+        tops = sorted(storage.listdir('')[0])
+    except FileNotFoundError:
+        return
+    for top in [''] + tops:
+        for name in walk_files(storage, posixpath.join(top, BLOB_DIR)):
+            if is_blob(name) or posixpath.basename(name).startswith(INCOMING_PREFIX):
+                yield name
+
+
+def collect_garbage(grace=24 * 3600, dry_run=False):
+    """
+    Remove blobs no row refers to and that have not been written or reused
+    for ``grace`` seconds (uploads whose row is not saved yet). Returns
+    ``(removed names, bytes freed)``.
+    """
+    storage = content_storage()
+    references = blob_references()
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    removed, freed = [], 0
+    for name in stored_blobs():
+        if references[name]:
+            continue
+        if storage.get_modified_time(name) > cutoff:
+            continue
+        size = storage.size(name)
+        if not dry_run:
+            storage.remove_blob(name)
+        removed.append(name)
+        freed += size
+    return removed, freed
+
+
+# ---------------------------------------------
+# Files uploaded before content addressing
+# ---------------------------------------------
+def _link_or_copy(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def dedupe_legacy_files(dry_run=False):
+    """
+    Move files referenced by content-addressed FileFields under their old
+    upload names into blobs, repointing every row. Identical files collapse
+    into one blob. The old file is only removed once the rows are updated.
+    Returns counts: ``files``, ``rows``, ``missing`` and ``bytes_freed``.
+    """
+    storage = content_storage()
+    stats = {'files': 0, 'rows': 0, 'missing': 0, 'bytes_freed': 0}
+    fields = content_fields()
+    names, seen = set(), set()
+    for model, field in fields:
+        names.update(
+            name for name in model._base_manager.exclude(**{field: ''}).exclude(**{f"{field}__isnull": True})
+            .values_list(field, flat=True).distinct().iterator()
+            if not is_blob(name)
+        )
+
+    for name in sorted(names):
+        path = storage.path(name)
+        if not os.path.isfile(path):
+            stats['missing'] += 1
+            continue
+        with open(path, 'rb') as f:
+            digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        top = name.split('/', 1)[0] if '/' in name else ''
+        target = blob_name(top, digest, os.path.splitext(name)[1])
+        target_path = storage.path(target)
+        duplicate = target in seen or os.path.exists(target_path)
+        seen.add(target)
+        stats['files'] += 1
+        if duplicate:
+            stats['bytes_freed'] += os.path.getsize(path)
+        if dry_run:
+            continue
+
+        if not duplicate:
+            _link_or_copy(path, target_path)
+        with transaction.atomic():
+            for model, field in fields:
+                # update(): no save() side effects such as re-probing videos
+                stats['rows'] += model._base_manager.filter(**{field: name}).update(**{field: target})
+        os.remove(path)
+    return stats
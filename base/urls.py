@@ -38,8 +38,12 @@ urlpatterns = [
     path('exam/<int:test_id>/start/', views.start_test, name='front_exam_start'),
     path('exam/session/<uuid:attempt_id>/', views.take_test, name='front_exam_session'),
     path('exam/session/<uuid:attempt_id>/submit/', views.submit_test, name='front_exam_submit'),
+    path('exam/session/<uuid:attempt_id>/autosave/', views.autosave_test, name='front_exam_autosave'),
+    path('exam/session/<uuid:attempt_id>/time-check/', views.exam_time_check, name='front_exam_time_check'),
+    path('exam/time/', views.exam_server_time, name='front_exam_time'),
     path('exam/session/<uuid:attempt_id>/result/', views.test_result, name='front_exam_result'),
     path('exam/session/<uuid:attempt_id>/review/', views.review_answers, name='front_exam_review'),
+    path('my-progress/', views.my_progress, name='my_progress'),
     
     # Product Bundles - NEW
     # path('bundles/', views.product_bundles_list, name='product_bundles_list'),
@@ -5,7 +5,9 @@ from django.contrib.auth import authenticate, login, logout, update_session_auth
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse, FileResponse, HttpResponse, Http404, HttpResponseBadRequest
+from django.views.decorators.cache import never_cache
+from django.http import JsonResponse, HttpResponse, Http404, HttpResponseBadRequest
+from django.core.exceptions import PermissionDenied
 from django.urls import reverse
 from django.utils import timezone
 from django.core.cache import cache
@@ -23,16 +25,30 @@ from .forms import (
     PasswordChangeSimpleForm, 
     OTPVerificationForm
 )
-from .models import User, OTPVerification, UserCourseAccess, Payment
+from .models import User, OTPVerification, UserCourseAccess, Payment, Notification as UserNotification
+from .storage import is_blob
 from .utils import has_smtp_configured, create_and_send_otp
 from video_courses.models import VideoCourse, Category
+from video_courses.progress import course_progress, has_bit, progress_for_courses
+from video_courses.signing import video_urls
+from elibrary.downloads import record_download
+from video_courses.streaming import can_read, serve_file, IMMUTABLE_CACHE, PRIVATE_CACHE
 from live_class.models import LiveClassCourse, LiveClassSession
-from testseries.models import TestSeries, Test, TestAttempt, StudentAnswer
+from testseries.models import TestSeries, Test, TestAttempt, StudentAnswer, ArchivedAttempt, PerformanceRollup, ScoreHistogram
+from testseries.archive import get_attempt_or_404
+from testseries.rollups import cohort_percentile
+from testseries.papers import get_paper, BlueprintError
+from testseries.deadlines import (
+    issue_token, read_token, deadline_for, question_set_version, seconds_left, is_late,
+    grace_seconds, save_answers, saved_answers,
+)
+from testseries.submission import submit_attempt
+from testseries.publication import results_published
+from testseries.histograms import score_histogram
 from elibrary.models import (
     ELibraryCourse, 
     ELibraryPDF, 
-    ELibraryEnrollment, 
-    ELibraryDownload
+    ELibraryEnrollment
 )
 from adminpanel.models import (
     ProductBundle, 
@@ -47,7 +63,8 @@ import json
 import os
 import secrets
 import string
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.utils.datastructures import MultiValueDict
 import logging
 
 from django.http import HttpResponse, JsonResponse
@@ -55,13 +72,14 @@ from django.views.decorators.http import require_GET
 from django.views.decorators.cache import cache_control
 from django.conf import settings
 from django.shortcuts import render
+from django.contrib.staticfiles import finders
 import os
 
 @require_GET
 @cache_control(max_age=0, no_cache=True, no_store=True, must_revalidate=True)
 def service_worker(request):
     """Serve the service worker from root URL"""
-    sw_path = os.path.join(settings.BASE_DIR, 'static', 'js', 'serviceworker.js')
+    sw_path = finders.find('serviceworker.js') or os.path.join(settings.STATIC_ROOT, 'serviceworker.js')
     
     try:
         with open(sw_path, 'r', encoding='utf-8') as sw_file:
@@ -263,6 +281,15 @@ def notifications_list(request):
     # Get user notifications
     user_notifications = list(notifications_query[:20])
     
+    # === COHORT NOTIFICATIONS (one row per test, e.g. results published) ===
+    cohort_notifications = list(
+        UserNotification.objects.filter(
+            user__isnull=True,
+            related_object_type='test_results',
+            related_object_id__in=TestAttempt.objects.filter(user=request.user).values('test_id'),
+        ).exclude(expires_at__lt=timezone.now()).order_by('-created_at')[:10]
+    )
+    
     # === ADMIN BROADCAST NOTIFICATIONS ===
     # Get active admin notifications that are scheduled to show
     admin_notifications = AdminNotification.objects.filter(
@@ -302,6 +329,21 @@ def notifications_list(request):
             'is_admin': False
         })
     
+    # Add cohort notifications (shared rows, so no per-user read state)
+    for notification in cohort_notifications:
+        notification_data.append({
+            'id': f'admin_cohort_{notification.id}',
+            'title': notification.title,
+            'message': notification.message,
+            'link': notification.link or '#',
+            'is_read': False,
+            'created_at': notification.created_at.strftime('%b %d, %Y at %I:%M %p'),
+            'type': notification.notification_type,
+            'priority': notification.priority,
+            'source': 'cohort',
+            'is_admin': True
+        })
+    
     # Add admin broadcast notifications
     for notification in admin_notifications:
         notification_data.append({
@@ -1059,8 +1101,11 @@ def test_series_detail(request, pk):
         
         # Add stats for each test
         for test in tests:
-            test.question_count = test.questions.count()
-            test.total_marks = sum(q.marks for q in test.questions.all())
+            if test.question_bank_id:
+                test.question_count = test.total_questions
+            else:
+                test.question_count = test.questions.count()
+                test.total_marks = sum(q.marks for q in test.questions.all())
             
             # Check if user has attempted this test
             if request.user.is_authenticated:
@@ -1068,7 +1113,7 @@ def test_series_detail(request, pk):
                     user=request.user, 
                     test=test,
                     status='submitted'
-                ).count()
+                ).count() + ArchivedAttempt.objects.filter(user=request.user, test=test).count()
                 test.can_attempt = test.user_attempts < test.max_attempts
                 
                 # Get best score if available
@@ -1141,7 +1186,7 @@ def start_test(request, test_id):
         user=request.user, 
         test=test,
         status='submitted'
-    ).count()
+    ).count() + ArchivedAttempt.objects.filter(user=request.user, test=test).count()
     
     if user_attempts >= test.max_attempts:
         messages.error(request, f'You have already used all {test.max_attempts} attempts for this test.')
@@ -1155,32 +1200,45 @@ def start_test(request, test_id):
     ).first()
     
     if incomplete_attempt:
-        return redirect('front_exam_session', attempt_id=incomplete_attempt.id)
+        return redirect('front_exam_session', attempt_id=incomplete_attempt.public_id)
     
-    # Get total marks for the test
-    total_marks = test.questions.aggregate(Sum('marks'))['marks__sum'] or 0
+    # Bank-driven tests draw a paper; others use the test's own questions
+    paper = None
+    if test.question_bank_id:
+        try:
+            paper = get_paper(test, request.user)
+        except BlueprintError as e:
+            logger.error(f"Paper generation failed for test {test.id}: {e}")
+            messages.error(request, '❌ This test paper could not be prepared. Please contact support.')
+            return redirect('front_exam_series_detail', pk=test.test_series.pk)
+        total_questions = len(paper.question_ids)
+        total_marks = paper.total_marks
+    else:
+        total_questions = test.questions.count()
+        total_marks = test.questions.aggregate(Sum('marks'))['marks__sum'] or 0
     
     # Create new test attempt
     attempt = TestAttempt.objects.create(
         user=request.user,
         test=test,
+        paper=paper,
         attempt_number=user_attempts + 1,
-        total_questions=test.questions.count(),
+        total_questions=total_questions,
         total_marks=total_marks,
         status='in_progress'
     )
     
     messages.success(request, f'Test started! You have {test.duration_minutes} minutes to complete.')
-    return redirect('front_exam_session', attempt_id=attempt.id)
+    return redirect('front_exam_session', attempt_id=attempt.public_id)
 
 
 @login_required
 def take_test(request, attempt_id):
     """Take test interface"""
-    attempt = get_object_or_404(TestAttempt, id=attempt_id, user=request.user)
+    attempt = get_object_or_404(TestAttempt, public_id=attempt_id, user=request.user)
     
     if attempt.status == 'submitted':
-        return redirect('front_exam_result', attempt_id=attempt.id)
+        return redirect('front_exam_result', attempt_id=attempt.public_id)
     
     # Check if time expired
     elapsed_time = timezone.now() - attempt.started_at
@@ -1188,15 +1246,14 @@ def take_test(request, attempt_id):
     
     if elapsed_time.total_seconds() >= duration_seconds:
         # Auto-submit if time is up
-        return redirect('front_exam_submit', attempt_id=attempt.id)
+        return redirect('front_exam_submit', attempt_id=attempt.public_id)
     
-    questions = attempt.test.questions.all().order_by('order')
+    questions = attempt.get_questions()
     
     # Shuffle questions if enabled
     if attempt.test.shuffle_questions:
-        questions = list(questions)
         import random
-        random.seed(attempt.id.int)  # Use attempt ID as seed for consistency
+        random.seed(attempt.public_id.int)  # Use attempt ID as seed for consistency
         random.shuffle(questions)
     
     # Calculate remaining time
@@ -1207,199 +1264,117 @@ def take_test(request, attempt_id):
         'test': attempt.test,
         'questions': questions,
         'time_remaining': max(0, time_remaining),
+        # Signed deadline checked by autosave/submit without the attempt row
+        'deadline_token': issue_token(attempt, questions),
+        'deadline_ms': int(deadline_for(attempt).timestamp() * 1000),
     }
     return render(request, 'take_test.html', context)
 
 
+@never_cache
+def exam_server_time(request):
+    """Server clock in epoch milliseconds, for exam timer skew correction"""
+    return JsonResponse({'now': int(timezone.now().timestamp() * 1000)})
+
+
+@login_required
+@never_cache
+def exam_time_check(request, attempt_id):
+    """Remaining time of an attempt, read from its deadline token"""
+    claims = read_token(request.GET.get('token'), attempt_id, request.user.pk)
+    if claims is None:
+        return JsonResponse({'error': 'Invalid exam session'}, status=403)
+    return JsonResponse({
+        'remaining': max(0, int(seconds_left(claims))),
+        'deadline': claims['d'] * 1000,
+        'now': int(timezone.now().timestamp() * 1000),
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def autosave_test(request, attempt_id):
+    """Keep in-progress answers; the deadline comes from the token alone"""
+    claims = read_token(request.POST.get('deadline_token'), attempt_id, request.user.pk)
+    if claims is None:
+        return JsonResponse({'error': 'Invalid exam session'}, status=403)
+    if is_late(claims):
+        return JsonResponse({'error': 'Time is up', 'remaining': 0}, status=409)
+    
+    answers = {key: values for key, values in request.POST.lists() if key.startswith('question_')}
+    if not save_answers(attempt_id, answers):
+        return JsonResponse({'error': 'Test already submitted', 'remaining': 0}, status=409)
+    return JsonResponse({'saved': True, 'remaining': max(0, int(seconds_left(claims)))})
+
+
 @login_required
 def submit_test(request, attempt_id):
     """Submit test and calculate results"""
-    attempt = get_object_or_404(TestAttempt, id=attempt_id, user=request.user)
+    # Reject forged or foreign deadline tokens before loading the attempt
+    claims = None
+    if request.method == 'POST' and request.POST.get('deadline_token'):
+        claims = read_token(request.POST['deadline_token'], attempt_id, request.user.pk)
+        if claims is None:
+            messages.error(request, '❌ Invalid exam session. Please reopen the test.')
+            return redirect('front_exam_session', attempt_id=attempt_id)
+    
+    attempt = get_object_or_404(TestAttempt, public_id=attempt_id, user=request.user)
     
     if attempt.status == 'submitted':
         messages.info(request, 'This test has already been submitted.')
-        return redirect('front_exam_result', attempt_id=attempt.id)
+        return redirect('front_exam_result', attempt_id=attempt.public_id)
     
-    if request.method == 'POST':
-        # Calculate time spent
-        time_spent = timezone.now() - attempt.started_at
-        attempt.time_spent = time_spent
-        attempt.submitted_at = timezone.now()
-        
-        # Initialize counters
-        correct_answers = 0
-        wrong_answers = 0
-        attempted_questions = 0
-        marks_obtained = 0.0
-        subject_wise_score = {}
-        
-        # Get all questions for this test
-        questions = attempt.test.questions.all()
-        
-        # Process each question
-        for question in questions:
-            answer_key = f'question_{question.id}'
-            
-            # Get student's answer from POST data
-            if question.question_type == 'mcq_multiple':
-                selected_answer = request.POST.getlist(answer_key)
-            else:
-                selected_answer = request.POST.get(answer_key, '')
-            
-            # Check if answered
-            is_answered = bool(selected_answer) and not (isinstance(selected_answer, list) and len(selected_answer) == 0)
-            
-            # Skip if not answered - create empty record
-            if not is_answered:
-                StudentAnswer.objects.create(
-                    attempt=attempt,
-                    question=question,
-                    selected_answer={},
-                    is_correct=False,
-                    marks_obtained=0,
-                    is_attempted=False
-                )
-                continue
-            
-            attempted_questions += 1
-            
-            # Normalize answers for comparison
-            if isinstance(selected_answer, list):
-                student_answer = sorted([ans.lower().strip() for ans in selected_answer])
-            else:
-                student_answer = selected_answer.lower().strip()
-            
-            # Get correct answer
-            correct_answer = question.correct_answer
-            
-            # Check if answer is correct
-            is_correct = False
-            question_marks = 0.0
-            
-            if question.question_type == 'mcq_multiple':
-                # For multiple choice, compare as sorted lists
-                if isinstance(correct_answer, dict) and 'answers' in correct_answer:
-                    correct_list = sorted([ans.lower().strip() for ans in correct_answer['answers']])
-                elif isinstance(correct_answer, list):
-                    correct_list = sorted([ans.lower().strip() for ans in correct_answer])
-                else:
-                    correct_list = []
-                
-                is_correct = student_answer == correct_list
-            
-            elif question.question_type in ['mcq_single', 'true_false']:
-                # For single choice
-                if isinstance(correct_answer, dict) and 'answer' in correct_answer:
-                    correct_value = correct_answer['answer'].lower().strip()
-                elif isinstance(correct_answer, str):
-                    correct_value = correct_answer.lower().strip()
-                else:
-                    correct_value = ''
-                
-                is_correct = student_answer == correct_value
-            
-            elif question.question_type in ['fill_blank', 'numerical']:
-                # For text/numerical answers
-                if isinstance(correct_answer, dict) and 'answer' in correct_answer:
-                    correct_value = str(correct_answer['answer']).lower().strip()
-                elif isinstance(correct_answer, str):
-                    correct_value = correct_answer.lower().strip()
-                else:
-                    correct_value = ''
-                
-                is_correct = student_answer == correct_value
-            
-            # Calculate marks
-            if is_correct:
-                correct_answers += 1
-                question_marks = float(question.marks)
-            else:
-                wrong_answers += 1
-                # Apply negative marking if enabled
-                if attempt.test.test_series.has_negative_marking:
-                    question_marks = -float(question.negative_marks)
-            
-            marks_obtained += question_marks
-            
-            # Track subject-wise score
-            if question.subject:
-                subject_name = question.subject.name
-                if subject_name not in subject_wise_score:
-                    subject_wise_score[subject_name] = {
-                        'correct': 0,
-                        'wrong': 0,
-                        'marks': 0.0
-                    }
-                
-                if is_correct:
-                    subject_wise_score[subject_name]['correct'] += 1
-                else:
-                    subject_wise_score[subject_name]['wrong'] += 1
-                subject_wise_score[subject_name]['marks'] += question_marks
-            
-            # Save student answer with proper format
-            StudentAnswer.objects.create(
-                attempt=attempt,
-                question=question,
-                selected_answer={'answer': selected_answer} if not isinstance(selected_answer, list) else {'answers': selected_answer},
-                is_correct=is_correct,
-                marks_obtained=question_marks,
-                is_attempted=True,  # Fixed: Set is_attempted flag
-                answered_at=timezone.now()  # Fixed: Set answered timestamp
-            )
-            
-            # Update question analytics
-            question.total_attempts += 1
-            if is_correct:
-                question.correct_attempts += 1
-            question.save(update_fields=['total_attempts', 'correct_attempts'])
-        
-        # Calculate percentage
-        percentage_score = 0
-        if attempt.total_marks > 0:
-            percentage_score = (marks_obtained / float(attempt.total_marks)) * 100
-        
-        # Update attempt with results
-        attempt.status = 'submitted'
-        attempt.attempted_questions = attempted_questions
-        attempt.correct_answers = correct_answers
-        attempt.wrong_answers = wrong_answers
-        attempt.marks_obtained = marks_obtained
-        attempt.percentage_score = max(0, percentage_score)
-        attempt.subject_wise_score = subject_wise_score
-        attempt.save()
-        
-        # Update test series analytics
-        test_series = attempt.test.test_series
-        test_series.total_attempts += 1
-        
-        # Recalculate average score
-        all_attempts = TestAttempt.objects.filter(
-            test__test_series=test_series,
-            status='submitted'
-        )
-        if all_attempts.exists():
-            avg_score = all_attempts.aggregate(avg=Sum('marks_obtained'))['avg'] or 0
-            test_series.average_score = avg_score / all_attempts.count() if all_attempts.count() > 0 else 0
-        
-        test_series.save()
-        
+    now = timezone.now()
+    if claims:
+        deadline = datetime.fromtimestamp(claims['d'], tz=dt_timezone.utc)
+    else:
+        deadline = deadline_for(attempt)
+    late = now > deadline + timedelta(seconds=grace_seconds())
+    
+    # Before the deadline only an explicit POST submits; afterwards the
+    # timer's redirect grades the answers autosaved up to the deadline
+    if request.method == 'POST' or now >= deadline:
+        # Get all questions served in this attempt
+        questions = attempt.get_questions()
+        if claims and claims['v'] != question_set_version(attempt, questions):
+            logger.warning(f"Question set of attempt {attempt.id} changed after its deadline token was issued")
+        
+        # Answers from the form, or the last autosave for late submissions
+        if request.method == 'POST' and not late:
+            submitted = request.POST
+        else:
+            # Read under the attempt's row lock, from whichever worker saved it
+            submitted = lambda: MultiValueDict(saved_answers(attempt) or {})
+            if request.method == 'POST':
+                logger.warning(f"Late submission of attempt {attempt.id}; grading answers saved by the deadline")
+        
+        # Grade and save, as of the deadline at the latest
+        if submit_attempt(attempt, submitted, min(now, deadline), questions=questions) is None:
+            messages.info(request, 'This test has already been submitted.')
+            return redirect('front_exam_result', attempt_id=attempt.public_id)
+        
+        if late:
+            messages.warning(request, '⏰ Time was up. Your answers saved before the deadline were submitted.')
         messages.success(request, 'Test submitted successfully!')
-        return redirect('front_exam_result', attempt_id=attempt.id)
+        return redirect('front_exam_result', attempt_id=attempt.public_id)
     
     # If GET request, just redirect to result
-    return redirect('front_exam_result', attempt_id=attempt.id)
+    return redirect('front_exam_result', attempt_id=attempt.public_id)
 
 
 
 @login_required
 def test_result(request, attempt_id):
     """Show test results"""
-    attempt = get_object_or_404(TestAttempt, id=attempt_id, user=request.user)
+    attempt = get_attempt_or_404(attempt_id, request.user)
     
     if attempt.status != 'submitted':
         messages.warning(request, 'Please submit the test first to see results.')
-        return redirect('front_exam_session', attempt_id=attempt.id)
+        return redirect('front_exam_session', attempt_id=attempt.public_id)
+    
+    # Deferred results stay hidden until the whole cohort is published
+    if not results_published(attempt.test):
+        return render(request, 'test_result_pending.html', {'attempt': attempt, 'test': attempt.test})
     
     # Calculate skipped questions
     skipped_questions = attempt.total_questions - attempt.attempted_questions
@@ -1407,39 +1382,55 @@ def test_result(request, attempt_id):
     # Get all answers for review (if allowed)
     student_answers = None
     if attempt.test.allow_review:
-        student_answers = StudentAnswer.objects.filter(
-            attempt=attempt
-        ).select_related('question', 'question__subject')
+        student_answers = attempt.get_student_answers()
+    
+    # Place the score in the test's distribution
+    histogram = score_histogram(attempt.test_id)
+    score_distribution = []
+    better_than = None
+    if histogram and histogram.count > 1:
+        better_than = histogram.percent_below(attempt.percentage_score)
+        peak = max(histogram.buckets) or 1
+        width = 100 // ScoreHistogram.BUCKETS
+        my_bucket = ScoreHistogram.bucket_of(attempt.percentage_score)
+        for index, count in enumerate(histogram.buckets):
+            score_distribution.append({
+                'label': f"{index * width}-{(index + 1) * width}%",
+                'count': count,
+                'height': round(count / peak * 100),
+                'is_mine': index == my_bucket,
+            })
     
     context = {
         'attempt': attempt,
         'test': attempt.test,
         'skipped_questions': skipped_questions,
         'student_answers': student_answers,
+        'histogram': histogram,
+        'score_distribution': score_distribution,
+        'better_than': better_than,
     }
     return render(request, 'test_result.html', context)
 
 @login_required
 def review_answers(request, attempt_id):
     """Review test answers with correct solutions"""
-    attempt = get_object_or_404(TestAttempt, id=attempt_id, user=request.user)
+    attempt = get_attempt_or_404(attempt_id, request.user)
     
     # Check if review is allowed
     if not attempt.test.allow_review:
         messages.error(request, 'Answer review is not available for this test.')
-        return redirect('front_exam_result', attempt_id=attempt.id)
+        return redirect('front_exam_result', attempt_id=attempt.public_id)
     
     if attempt.status != 'submitted':
         messages.warning(request, 'Please submit the test first to review answers.')
-        return redirect('front_exam_session', attempt_id=attempt.id)
+        return redirect('front_exam_session', attempt_id=attempt.public_id)
+    
+    if not results_published(attempt.test):
+        return redirect('front_exam_result', attempt_id=attempt.public_id)
     
     # Get all student answers with related question data
-    student_answers = StudentAnswer.objects.filter(
-        attempt=attempt
-    ).select_related(
-        'question', 
-        'question__subject'
-    ).order_by('question__order')
+    student_answers = attempt.get_student_answers()
     
     # Prepare answers with additional context
     answers_with_context = []
@@ -1548,14 +1539,49 @@ def review_answers(request, attempt_id):
         'subject_analysis': subject_analysis,
     }
     
-    # Mark as reviewed
-    if not attempt.is_reviewed:
+    # Mark as reviewed (archived attempts are read-only)
+    if not attempt.is_reviewed and not attempt.is_archived:
         attempt.is_reviewed = True
         attempt.save(update_fields=['is_reviewed'])
     
     return render(request, 'review_answers.html', context)
 
 
+@login_required
+def my_progress(request):
+    """Cross-test progress dashboard, rendered from the user's rollup rows"""
+    rollups = list(PerformanceRollup.objects.filter(user=request.user))
+    overall = next((r for r in rollups if r.dimension == 'overall'), None)
+    subjects = sorted(
+        (r for r in rollups if r.dimension == 'subject' and r.attempted),
+        key=lambda r: r.accuracy
+    )
+    difficulty_order = {'easy': 0, 'medium': 1, 'hard': 2}
+    difficulties = sorted(
+        (r for r in rollups if r.dimension == 'difficulty' and r.attempted),
+        key=lambda r: difficulty_order.get(r.key, 3)
+    )
+    
+    # Score trend over the most recent attempts (oldest first for the chart)
+    recent_attempts = list(
+        TestAttempt.objects.filter(user=request.user, status='submitted')
+        .exclude(test__show_result_immediately=False, test__results_published_at__isnull=True)
+        .select_related('test')
+        .order_by('-submitted_at')[:10]
+    )
+    recent_attempts.reverse()
+    
+    context = {
+        'overall': overall,
+        'subjects': subjects,
+        'weakest_subjects': subjects[:3],
+        'difficulties': difficulties,
+        'recent_attempts': recent_attempts,
+        'percentile': cohort_percentile(overall) if overall and overall.tests_taken else None,
+    }
+    return render(request, 'my_progress.html', context)
+
+
 
 
 
@@ -1701,6 +1727,24 @@ def video_course_detail(request, pk):
                 # User hasn't purchased this course
                 context['has_access'] = False
                 context['is_purchased'] = False
+
+            # ===== WATCH PROGRESS (one row read) =====
+            progress = course_progress(request.user, course.pk)
+            if progress:
+                for video in videos:
+                    video.is_completed = has_bit(progress['completed'], video.progress_bit) if video.progress_bit is not None else False
+                    if video.pk == progress.get('video_id'):
+                        context['resume_video'] = video
+                minutes, seconds = divmod(progress.get('position', 0), 60)
+                context['resume_position'] = progress.get('position', 0)
+                context['resume_display'] = f"{minutes}:{seconds:02d}"
+                context['completed_count'] = progress['completed_count']
+
+        # ===== SIGNED MEDIA URLS (entitlement checked once per page view) =====
+        for video in videos:
+            if context['is_purchased'] or video.is_preview:
+                for name, url in video_urls(request.user, video).items():
+                    setattr(video, name, url)
         
         return render(request, 'video_course_detail.html', context)
     
@@ -2675,62 +2719,44 @@ def elibrary_course_detail(request, pk):
 
 
 
-@login_required
-def elibrary_view_pdf(request, pdf_id):
-    """View a PDF file (no access restrictions)."""
-    
-    pdf = get_object_or_404(ELibraryPDF, pk=pdf_id, is_active=True)
-    
-    # Log download
-    ELibraryDownload.objects.create(
-        user=request.user,
-        pdf=pdf,
-        ip_address=request.META.get('REMOTE_ADDR')
-    )
-    
-    # Update download count
-    pdf.download_count += 1
-    pdf.save()
-    
-    # Serve PDF
+def _is_first_read(request):
+    """Viewers fetch a PDF in many ranged requests; only the first one counts as a read"""
+    if request.method == 'HEAD':
+        return False
+    byte_range = request.headers.get('Range', '')
+    return not byte_range or byte_range.replace(' ', '').startswith('bytes=0-')
+
+
+def _serve_pdf(request, pdf_id, as_attachment):
+    """Entitlement check (cached), download log and ranged delivery of one PDF"""
+    pdf = get_object_or_404(ELibraryPDF.objects.select_related('course'), pk=pdf_id, is_active=True)
+    if not can_read(request.user, pdf):
+        raise PermissionDenied("Purchase the course to read this PDF.")
+
+    if _is_first_read(request):
+        # Buffered: rows, counters and daily rollups are written in bulk
+        record_download(request.user.pk, pdf, request.META.get('REMOTE_ADDR'))
+
+    # Blob names change with the content, so browsers may keep them
+    cache_control = IMMUTABLE_CACHE if is_blob(pdf.file.name) else PRIVATE_CACHE
     try:
-        return FileResponse(
-            open(pdf.file.path, 'rb'),
-            content_type='application/pdf',
-            as_attachment=False,
-            filename=f"{pdf.title}.pdf"
-        )
+        return serve_file(request, pdf.file.name, cache_control, filename=f"{pdf.title}.pdf", as_attachment=as_attachment)
     except FileNotFoundError:
         raise Http404("PDF file not found")
 
 
 @login_required
+@require_http_methods(["GET", "HEAD"])
+def elibrary_view_pdf(request, pdf_id):
+    """View a PDF in the browser; Range requests let viewers load single pages."""
+    return _serve_pdf(request, pdf_id, as_attachment=False)
+
+
+@login_required
+@require_http_methods(["GET", "HEAD"])
 def elibrary_download_pdf(request, pdf_id):
-    """Force download a PDF file (no access restrictions)."""
-    
-    pdf = get_object_or_404(ELibraryPDF, pk=pdf_id, is_active=True)
-    
-    # Log download
-    ELibraryDownload.objects.create(
-        user=request.user,
-        pdf=pdf,
-        ip_address=request.META.get('REMOTE_ADDR')
-    )
-    
-    # Update download count
-    pdf.download_count += 1
-    pdf.save()
-    
-    # Force download
-    try:
-        return FileResponse(
-            open(pdf.file.path, 'rb'),
-            content_type='application/pdf',
-            as_attachment=True,
-            filename=f"{pdf.title}.pdf"
-        )
-    except FileNotFoundError:
-        raise Http404("PDF file not found")
+    """Download a PDF file; interrupted downloads resume with Range requests."""
+    return _serve_pdf(request, pdf_id, as_attachment=True)
 
 
 @login_required
@@ -3309,6 +3335,15 @@ def my_purchases(request):
         if access.payment:
             total_spent += access.payment.amount / 100
     
+    # Resume points for all video courses in one query
+    progress = progress_for_courses(user, [item['course'].pk for item in purchases['video_courses']])
+    for item in purchases['video_courses']:
+        course_progress_entry = progress.get(item['course'].pk)
+        if course_progress_entry:
+            minutes, seconds = divmod(course_progress_entry.get('position', 0), 60)
+            item['completed_count'] = course_progress_entry['completed_count']
+            item['resume_display'] = f"{minutes}:{seconds:02d}"
+    
     # Count total purchases
     total_purchases = course_access_records.count()
     
@@ -114,6 +114,35 @@ STATIC_ROOT = BASE_DIR / "staticfiles"  # Where collectstatic stores files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# "content" stores course videos, PDFs and question images once per distinct
+# file under its SHA-256 (see base/storage.py)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "content": {"BACKEND": "base.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# S3-compatible object storage (AWS S3, MinIO, ...; needs boto3, see base/s3.py).
+# Both media aliases must use the same bucket and location. Copy existing
+# media first with: python manage.py copy_media s3
+# The bucket needs a CORS rule allowing GET from the site for offline packs.
+# S3_MEDIA_OPTIONS = {
+#     "bucket_name": "edutrellis-media",
+#     "endpoint_url": "http://127.0.0.1:9000",  # omit for AWS
+#     "region_name": "us-east-1",
+#     "access_key": "...",
+#     "secret_key": "...",
+#     "addressing_style": "path",  # MinIO
+#     "querystring_expire": 3600,
+#     "multipart_threshold": 64 * 1024 * 1024,
+#     "multipart_chunksize": 16 * 1024 * 1024,
+#     "max_concurrency": 8,
+# }
+# STORAGES["default"] = {"BACKEND": "base.s3.S3Storage", "OPTIONS": S3_MEDIA_OPTIONS}
+# STORAGES["content"] = {"BACKEND": "base.s3.S3ContentAddressedStorage", "OPTIONS": S3_MEDIA_OPTIONS}
+# To copy into the bucket before switching, define it as a third alias:
+# STORAGES["s3"] = STORAGES["default"]
+
 # --------------------
 # CUSTOM USER MODEL
 # --------------------
@@ -143,6 +172,64 @@ RAZORPAY_KEY_SECRET = 'F1mtVXEvOvbyc6atPUAEwdZd'
 
 JITSI_DOMAIN = "meet.ffmuc.net"
 
+# --------------------
+# TEST SERIES
+# --------------------
+# Seconds between folds of buffered Question analytics deltas
+QUESTION_STATS_FLUSH_INTERVAL = 60
+# 'rows' = one StudentAnswer per question, 'packed' = one AttemptAnswerSheet per attempt
+TESTSERIES_ANSWER_STORAGE = 'rows'
+# Cold archive of old attempts (see testseries/archive.py)
+ATTEMPT_ARCHIVE_ROOT = MEDIA_ROOT / "storage" / "attempt_archive"
+ATTEMPT_ARCHIVE_CACHE_SIZE = 256
+# Seconds a submission may arrive after the signed exam deadline (network delay)
+EXAM_DEADLINE_GRACE_SECONDS = 30
+
+# --------------------
+# VIDEO STREAMING
+# --------------------
+# None = Django streams the bytes; 'x-accel-redirect' (nginx) or 'x-sendfile'
+# (Apache/lighttpd) = Django only authorizes and the proxy sends the file
+VIDEO_STREAM_OFFLOAD = None
+# nginx `internal` location aliased to MEDIA_ROOT, used with 'x-accel-redirect'
+VIDEO_STREAM_ACCEL_PREFIX = "/protected-media/"
+VIDEO_STREAM_CHUNK_SIZE = 1024 * 1024
+# Signed media URLs (see video_courses/signing.py). To rotate the key, move the
+# old one into the fallbacks until MEDIA_URL_TTL has passed.
+MEDIA_URL_TTL = 6 * 3600
+MEDIA_SIGNING_KEY = None
+MEDIA_SIGNING_KEY_FALLBACKS = []
+# Revocations are stored in the database; this is how long a worker may cache the version
+MEDIA_TOKEN_VERSION_CACHE_TTL = 30
+# HLS packaging of uploads (see video_courses/transcode.py)
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+VIDEO_TRANSCODE_ON_UPLOAD = True
+# Background threads shared by metadata probing and HLS packaging
+VIDEO_TRANSCODE_WORKERS = 2
+# Watch-progress heartbeats are buffered per worker and upserted in batches
+VIDEO_PROGRESS_FLUSH_INTERVAL = 30
+VIDEO_PROGRESS_BUFFER_SIZE = 500
+
+# --------------------
+# RESUMABLE UPLOADS
+# --------------------
+# Chunked (tus) uploads of course videos and PDFs, see video_courses/uploads.py.
+# Keep the staging area on the same filesystem as MEDIA_ROOT so finished files
+# are moved into place instead of copied.
+UPLOAD_STAGING_ROOT = MEDIA_ROOT / "storage" / "upload_staging"
+UPLOAD_CHUNK_MAX_SIZE = 32 * 1024 * 1024
+UPLOAD_MAX_SIZE = 20 * 1024 ** 3
+# Seconds before an untouched upload is removed by `manage.py purge_uploads`
+UPLOAD_EXPIRY = 24 * 3600
+
+# --------------------
+# E-LIBRARY
+# --------------------
+# PDF reads are buffered per worker and written in bulk (see elibrary/downloads.py)
+ELIBRARY_DOWNLOAD_FLUSH_INTERVAL = 30
+ELIBRARY_DOWNLOAD_BUFFER_SIZE = 500
+
 # --------------------
 # DEFAULTS
 # --------------------
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ELibraryCourse, ELibraryPDF, ELibraryEnrollment, ELibraryDownload
+from .models import ELibraryCourse, ELibraryPDF, ELibraryEnrollment, ELibraryDownload, ELibraryDownloadDaily
 
 
 # Inline PDF display under course
@@ -58,3 +58,14 @@ class ELibraryDownloadAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'pdf__title', 'ip_address')
     readonly_fields = ('downloaded_at',)
     ordering = ('-downloaded_at',)
+
+
+@admin.register(ELibraryDownloadDaily)
+class ELibraryDownloadDailyAdmin(admin.ModelAdmin):
+    list_display = ('day', 'course', 'pdf', 'downloads')
+    list_filter = ('course', 'day')
+    search_fields = ('pdf__title', 'course__title')
+    date_hierarchy = 'day'
+    list_select_related = ('course', 'pdf')
+    readonly_fields = ('pdf', 'course', 'day', 'downloads')
+    ordering = ('-day', '-downloads')
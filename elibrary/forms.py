@@ -1,3 +1,5 @@
+import uuid
+
 from django import forms
 from django.forms import modelformset_factory
 from video_courses.models import Category
@@ -83,8 +85,11 @@ class ELibraryPDFForm(forms.ModelForm):
 class MultiplePDFUploadForm(forms.Form):
     pdfs = MultipleFileField(
         label="PDF Files",
-        help_text="Select multiple PDF files (Max 10 files, 50MB each)"
+        required=False,
+        help_text="Select multiple PDF files (Max 10 files)"
     )
+    # Comma separated ids of files sent by the chunked uploader (video_courses/uploads.py)
+    uploads = forms.CharField(required=False, widget=forms.HiddenInput)
     chapter_number = forms.IntegerField(
         min_value=1, 
         initial=1,
@@ -96,6 +101,20 @@ class MultiplePDFUploadForm(forms.Form):
         help_text="Use filename as PDF title"
     )
 
+    def clean_uploads(self):
+        ids = [value.strip() for value in self.cleaned_data['uploads'].split(',') if value.strip()]
+        try:
+            return [uuid.UUID(value) for value in ids]
+        except ValueError:
+            raise forms.ValidationError("Invalid upload id")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['pdfs'] = [f for f in cleaned_data.get('pdfs') or [] if f]
+        if not cleaned_data['pdfs'] and not cleaned_data.get('uploads') and 'uploads' not in self.errors:
+            self.add_error('pdfs', 'Select at least one PDF file.')
+        return cleaned_data
+
 
 # Formset for managing multiple PDFs
 ELibraryPDFFormSet = modelformset_factory(
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-19 04:38
+
+import base.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elibrary', '0003_elibrarycourse_is_free'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='elibrarycourse',
+            name='preview_pdf',
+            field=models.FileField(blank=True, null=True, storage=base.storage.content_storage, upload_to='elibrary/courses/previews/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf'])]),
+        ),
+        migrations.AlterField(
+            model_name='elibrarypdf',
+            name='file',
+            field=models.FileField(storage=base.storage.content_storage, upload_to='elibrary/pdfs/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf'])]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 04:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elibrary', '0004_content_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='elibrarydownload',
+            name='downloaded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='ELibraryDownloadDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_downloads', to='elibrary.elibrarycourse')),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_downloads', to='elibrary.elibrarypdf')),
+            ],
+            options={
+                'verbose_name_plural': 'E-library daily downloads',
+                'indexes': [models.Index(fields=['course', 'day'], name='elibrary_el_course__c71668_idx')],
+                'constraints': [models.UniqueConstraint(fields=('pdf', 'day'), name='unique_pdf_download_day')],
+            },
+        ),
+    ]
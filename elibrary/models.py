@@ -1,6 +1,8 @@
 from django.db import models
 from base.models import User
+from base.storage import content_storage
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 from video_courses.models import Category  # Import from existing category model
 import os
 import math
@@ -28,6 +30,7 @@ class ELibraryCourse(models.Model):
     cover_image = models.ImageField(upload_to='elibrary/courses/covers/', blank=True, null=True)
     preview_pdf = models.FileField(
         upload_to='elibrary/courses/previews/', 
+        storage=content_storage,
         blank=True, null=True,
         validators=[FileExtensionValidator(allowed_extensions=['pdf'])]
     )
@@ -88,6 +91,7 @@ class ELibraryPDF(models.Model):
     description = models.TextField(blank=True)
     file = models.FileField(
         upload_to='elibrary/pdfs/',
+        storage=content_storage,
         validators=[FileExtensionValidator(allowed_extensions=['pdf'])]
     )
     
@@ -153,8 +157,29 @@ class ELibraryEnrollment(models.Model):
 class ELibraryDownload(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     pdf = models.ForeignKey(ELibraryPDF, on_delete=models.CASCADE)
-    downloaded_at = models.DateTimeField(auto_now_add=True)
+    # Set when the read happened, not when the buffered row is written (see downloads.py)
+    downloaded_at = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
 
     # def __str__(self):
     #     return f"{self.user.first_name} - {self.pdf.title}"
+
+
+class ELibraryDownloadDaily(models.Model):
+    """Reads per PDF and day, maintained by the download buffer for the admin"""
+    pdf = models.ForeignKey(ELibraryPDF, on_delete=models.CASCADE, related_name='daily_downloads')
+    course = models.ForeignKey(ELibraryCourse, on_delete=models.CASCADE, related_name='daily_downloads')
+    day = models.DateField()
+    downloads = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'E-library daily downloads'
+        constraints = [
+            models.UniqueConstraint(fields=['pdf', 'day'], name='unique_pdf_download_day'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.pdf} - {self.day}: {self.downloads}"
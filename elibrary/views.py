@@ -8,6 +8,7 @@ from django.core.paginator import Paginator
 from django.utils import timezone
 from django.db import transaction
 from video_courses.models import Category
+from video_courses.uploads import StagedFile, UploadError, claim_upload
 from .models import ELibraryCourse, ELibraryPDF, ELibraryEnrollment, ELibraryDownload
 from .forms import ELibraryCourseForm, ELibraryPDFForm, MultiplePDFUploadForm, ELibraryPDFFormSet
 
@@ -224,14 +225,13 @@ def elibrary_course_delete(request, pk):
             course_title = course.title
             pdf_count = course.pdfs.count()
             
-            # Delete associated PDF files
+            # Delete associated PDF files (blobs shared with other PDFs are left to gc_blobs)
             deleted_files = 0
             for pdf in course.pdfs.all():
                 if pdf.file:
                     try:
-                        if os.path.exists(pdf.file.path):
-                            os.remove(pdf.file.path)
-                            deleted_files += 1
+                        pdf.file.delete(save=False)
+                        deleted_files += 1
                     except OSError as e:
                         messages.warning(
                             request,
@@ -250,8 +250,7 @@ def elibrary_course_delete(request, pk):
             # Delete preview PDF
             if course.preview_pdf:
                 try:
-                    if os.path.exists(course.preview_pdf.path):
-                        os.remove(course.preview_pdf.path)
+                    course.preview_pdf.delete(save=False)
                 except OSError:
                     pass
             
@@ -317,6 +316,11 @@ def elibrary_pdf_upload_multiple(request, course_pk):
         if form.is_valid():
             try:
                 files = form.cleaned_data['pdfs']
+                for upload_id in form.cleaned_data['uploads']:
+                    try:
+                        files.append(claim_upload(request.user, upload_id, 'pdf'))
+                    except UploadError as e:
+                        messages.warning(request, f'⚠ {e}', extra_tags='warning')
                 chapter_number = form.cleaned_data['chapter_number']
                 auto_title = form.cleaned_data['auto_title']
                 
@@ -341,6 +345,8 @@ def elibrary_pdf_upload_multiple(request, course_pk):
                                 order=index,
                                 uploaded_by=request.user
                             )
+                            if isinstance(pdf_file, StagedFile):
+                                pdf_file.release()
                             created_count += 1
                             
                         except Exception as e:
@@ -405,11 +411,10 @@ def elibrary_pdf_delete(request, pk):
             pdf_title = pdf.title
             course_title = course.title
             
-            # Delete the physical file
+            # Delete the physical file (unless it is a blob other PDFs may share)
             if pdf.file:
                 try:
-                    if os.path.exists(pdf.file.path):
-                        os.remove(pdf.file.path)
+                    pdf.file.delete(save=False)
                 except OSError as e:
                     messages.warning(
                         request,
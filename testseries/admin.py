@@ -4,7 +4,11 @@ from django.utils.html import format_html
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from video_courses.models import Category
-from .models import TestSeries, Test, Question, Subject, TestAttempt, StudentAnswer
+from .models import TestSeries, Test, Question, QuestionBank, Subject, TestAttempt, StudentAnswer
+from .regrade import queue_regrade
+from .dedup import duplicate_clusters, index_questions, merge_duplicates
+from .publication import publish_results
+from .cloning import clone_series, clone_test
 
 class QuestionInline(admin.TabularInline):
     model = Question
@@ -12,12 +16,74 @@ class QuestionInline(admin.TabularInline):
     fields = ('order', 'question_text', 'question_type', 'difficulty', 'marks')
     ordering = ('order',)
 
+class BankQuestionInline(admin.TabularInline):
+    model = Question
+    fk_name = 'bank'
+    extra = 1
+    fields = ('question_text', 'subject', 'question_type', 'difficulty', 'marks')
+
+class QuestionBankAdmin(admin.ModelAdmin):
+    list_display = ('name', 'question_count', 'pools_built_at', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+    readonly_fields = ('pools_built_at',)
+    inlines = [BankQuestionInline]
+    actions = ['rebuild_pools', 'merge_near_duplicates']
+
+    def question_count(self, obj):
+        return obj.questions.count()
+    question_count.short_description = 'Questions'
+
+    def rebuild_pools(self, request, queryset):
+        """Recompute the difficulty/subject pools papers are drawn from"""
+        for bank in queryset:
+            bank.rebuild_pools()
+        self.message_user(request, f'Rebuilt pools of {queryset.count()} bank(s).')
+    rebuild_pools.short_description = "Rebuild question pools"
+
+    def merge_near_duplicates(self, request, queryset):
+        """Flag near-duplicate questions of each bank as merged into the oldest copy"""
+        for bank in queryset:
+            questions = bank.questions.all()
+            index_questions(questions.filter(minhash__isnull=True))
+            merged = merge_duplicates(duplicate_clusters(questions))
+            self.message_user(request, f'"{bank.name}": {merged} near-duplicate question(s) merged.')
+    merge_near_duplicates.short_description = "Merge near-duplicate questions"
+
 class TestAdmin(admin.ModelAdmin):
     list_display = ('title', 'test_series', 'render_test_button', 'duration_minutes', 'total_questions', 'max_attempts', 'is_active')
     list_filter = ('test_series', 'is_active')
     search_fields = ('title',)
     inlines = [QuestionInline]
     prepopulated_fields = {'slug': ('title',)}
+    actions = ['regrade_tests', 'publish_test_results', 'clone_tests']
+
+    def regrade_tests(self, request, queryset):
+        """Queue a re-score of all submitted attempts against the current answer keys"""
+        queued = queue_regrade(queryset)
+        self.message_user(
+            request,
+            f'{queued} test(s) queued for regrading; scores update on the next `manage.py regrade_test` run.'
+        )
+    regrade_tests.short_description = "Regrade attempts of selected tests"
+
+    def publish_test_results(self, request, queryset):
+        """Finalize, rank and release deferred results now"""
+        for test in queryset.select_related('test_series'):
+            report = publish_results(test)
+            self.message_user(
+                request,
+                f'"{test.title}": results published, {report["ranked"]} attempt(s) ranked, '
+                f'{report["finalized"]} open attempt(s) finalized.'
+            )
+    publish_test_results.short_description = "Publish results of selected tests"
+
+    def clone_tests(self, request, queryset):
+        """Copy tests with their questions into the same series"""
+        for test in queryset.select_related('test_series'):
+            copy = clone_test(test)
+            self.message_user(request, f'"{test.title}" cloned as "{copy.title}" ({copy.total_questions} questions).')
+    clone_tests.short_description = "Clone selected tests"
 
     def get_urls(self):
         urls = super().get_urls()
@@ -57,6 +123,14 @@ class TestSeriesAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     prepopulated_fields = {'slug': ('title',)}
     readonly_fields = ('total_tests', 'total_attempts', 'average_score')
+    actions = ['clone_test_series']
+
+    def clone_test_series(self, request, queryset):
+        """Copy series with all of their tests and questions"""
+        for test_series in queryset:
+            copy = clone_series(test_series)
+            self.message_user(request, f'"{test_series.title}" cloned as "{copy.title}" ({copy.total_tests} tests).')
+    clone_test_series.short_description = "Clone selected test series"
 
 class TestAttemptAdmin(admin.ModelAdmin):
     list_display = ('user', 'test', 'attempt_number', 'status', 'percentage_score', 'marks_obtained', 'created_at')
@@ -72,6 +146,7 @@ class SubjectAdmin(admin.ModelAdmin):
 admin.site.register(TestSeries, TestSeriesAdmin)
 admin.site.register(Test, TestAdmin)
 admin.site.register(Question)
+admin.site.register(QuestionBank, QuestionBankAdmin)
 admin.site.register(Subject, SubjectAdmin)
 admin.site.register(TestAttempt, TestAttemptAdmin)
 admin.site.register(StudentAnswer)
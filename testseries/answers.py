@@ -0,0 +1,136 @@
+"""
+Persistence of graded answers in either storage mode.
+
+``TESTSERIES_ANSWER_STORAGE = 'rows'`` (default) keeps one StudentAnswer row
+per question; ``'packed'`` writes a single AttemptAnswerSheet per attempt.
+Readers go through ``TestAttempt.get_student_answers`` and do not care which
+mode was used.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .grading import stored_answer
+from .models import AttemptAnswerSheet, StudentAnswer, TestAttempt
+from .packing import pack_answers
+
+
+def answer_storage_mode():
+    return getattr(settings, 'TESTSERIES_ANSWER_STORAGE', 'rows')
+
+
+def store_answers(attempt, questions, answers, results):
+    """
+    Persist the graded answers of ``attempt``.
+
+    ``answers`` maps question id to the raw selected value and ``results``
+    maps question id to ``(is_attempted, is_correct, marks)``.
+    """
+    if answer_storage_mode() == 'packed':
+        entries = []
+        for question in questions:
+            is_attempted, is_correct, marks = results[question.id]
+            entries.append({
+                'question_id': question.id,
+                'selected_answer': stored_answer(answers[question.id]),
+                'is_attempted': is_attempted,
+                'is_correct': is_correct,
+                'marks': marks,
+                'time_spent': 0,
+                'is_marked_for_review': False,
+            })
+        AttemptAnswerSheet.objects.create(attempt=attempt, data=pack_answers(entries))
+        return
+
+    answered_at = timezone.now()
+    student_answers = []
+    for question in questions:
+        is_attempted, is_correct, marks = results[question.id]
+        student_answers.append(StudentAnswer(
+            attempt=attempt,
+            question=question,
+            selected_answer=stored_answer(answers[question.id]),
+            is_correct=is_correct,
+            marks_obtained=marks,
+            is_attempted=is_attempted,
+            answered_at=answered_at if is_attempted else None,
+        ))
+    StudentAnswer.objects.bulk_create(student_answers)
+
+
+def pack_attempts(attempt_ids, delete_rows=False):
+    """
+    Convert the StudentAnswer rows of the given attempts into answer sheets.
+
+    Attempts that already have a sheet are skipped. Returns the number of
+    sheets written and the total packed size in bytes.
+    """
+    done = set(
+        AttemptAnswerSheet.objects.filter(attempt_id__in=attempt_ids).values_list('attempt_id', flat=True)
+    )
+    entries = {}
+    rows = StudentAnswer.objects.filter(attempt_id__in=attempt_ids).exclude(
+        attempt_id__in=done
+    ).order_by('question__order', 'question__created_at').values_list(
+        'attempt_id', 'question_id', 'selected_answer', 'is_attempted', 'is_correct',
+        'marks_obtained', 'time_spent', 'is_marked_for_review',
+    )
+    for attempt_id, question_id, selected, attempted, correct, marks, time_spent, review in rows:
+        entries.setdefault(attempt_id, []).append({
+            'question_id': question_id,
+            'selected_answer': selected,
+            'is_attempted': attempted,
+            'is_correct': correct,
+            'marks': marks,
+            'time_spent': time_spent,
+            'is_marked_for_review': review,
+        })
+
+    sheets = [
+        AttemptAnswerSheet(attempt_id=attempt_id, data=pack_answers(attempt_entries))
+        for attempt_id, attempt_entries in entries.items()
+    ]
+    with transaction.atomic():
+        AttemptAnswerSheet.objects.bulk_create(sheets)
+        if delete_rows:
+            StudentAnswer.objects.filter(attempt_id__in=list(entries)).delete()
+    return len(sheets), sum(len(sheet.data) for sheet in sheets)
+
+
+def unpack_attempts(attempt_ids):
+    """Turn answer sheets back into StudentAnswer rows and drop the sheets"""
+    sheets = AttemptAnswerSheet.objects.filter(attempt_id__in=attempt_ids)
+    rows = []
+    unpacked = []
+    for sheet in sheets:
+        unpacked.append(sheet.pk)
+        for entry in sheet.entries():
+            rows.append(StudentAnswer(
+                attempt_id=sheet.pk,
+                question_id=entry['question_id'],
+                selected_answer=entry['selected_answer'],
+                is_correct=entry['is_correct'],
+                marks_obtained=round(entry['marks'], 2),
+                time_spent=entry['time_spent'],
+                is_marked_for_review=entry['is_marked_for_review'],
+                is_attempted=entry['is_attempted'],
+            ))
+    with transaction.atomic():
+        StudentAnswer.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        AttemptAnswerSheet.objects.filter(pk__in=unpacked).delete()
+    return len(unpacked)
+
+
+def submitted_attempt_chunks(chunk_size, queryset=None):
+    """Yield lists of submitted attempt ids in primary-key order"""
+    attempts = (queryset if queryset is not None else TestAttempt.objects).filter(status='submitted')
+    last_pk = None
+    while True:
+        page = attempts.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        ids = list(page.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        last_pk = ids[-1]
+        yield ids
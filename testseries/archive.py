@@ -0,0 +1,278 @@
+"""
+Cold archival of old test attempts.
+
+Attempts submitted before a cutoff are written, together with their answers
+and activity logs, to month-partitioned ``.jsonl.gz`` files under
+``ATTEMPT_ARCHIVE_ROOT`` and then deleted from the hot tables. Every attempt
+is its own gzip member, so a single attempt is rehydrated by seeking to its
+offset and decompressing just that member. Recently rehydrated records are
+kept in a per-process LRU cache.
+
+Derived statistics survive the move: each index row keeps the attempt's
+summary (counts and score breakdowns) for the performance rollups, and
+``Question.archived_attempts``/``archived_correct`` keep the archived share
+of the question analytics, so recounts from the hot tables add them back.
+"""
+import json
+import logging
+import os
+import secrets
+import zlib
+from collections import Counter
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils import timezone
+
+from .models import (
+    ArchivedAttempt, AttemptAnswerSheet, Question, StudentAnswer, TestAttempt, TestAttemptLog,
+)
+from .packing import unpack_answers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+ANSWER_FIELDS = [
+    'question_id', 'selected_answer', 'is_correct', 'marks_obtained', 'time_spent',
+    'is_marked_for_review', 'is_attempted',
+]
+
+SUMMARY_FIELDS = [
+    'attempted_questions', 'correct_answers', 'wrong_answers', 'subject_wise_score', 'difficulty_wise_score',
+]
+
+
+def archive_root():
+    return Path(getattr(settings, 'ATTEMPT_ARCHIVE_ROOT', Path(settings.MEDIA_ROOT) / 'storage' / 'attempt_archive'))
+
+
+def _gzip_member(record):
+    """Compress one record as a standalone gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    line = json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+    return compressor.compress(line.encode('utf-8')) + compressor.flush()
+
+
+def _sheet_answers(sheet):
+    return [
+        {
+            'question_id': entry['question_id'],
+            'selected_answer': entry['selected_answer'],
+            'is_correct': entry['is_correct'],
+            'marks_obtained': entry['marks'],
+            'time_spent': entry['time_spent'],
+            'is_marked_for_review': entry['is_marked_for_review'],
+            'is_attempted': entry['is_attempted'],
+        }
+        for entry in unpack_answers(sheet)
+    ]
+
+
+def _chunk_records(attempt_rows):
+    """Build archive records for a chunk of ``TestAttempt.values()`` rows"""
+    ids = [row['id'] for row in attempt_rows]
+    answers = {}
+    for row in StudentAnswer.objects.filter(attempt_id__in=ids).values('attempt_id', *ANSWER_FIELDS).iterator():
+        answers.setdefault(row.pop('attempt_id'), []).append(row)
+    for attempt_id, data in AttemptAnswerSheet.objects.filter(attempt_id__in=ids).values_list('attempt_id', 'data'):
+        answers[attempt_id] = _sheet_answers(data)
+
+    logs = {}
+    for row in TestAttemptLog.objects.filter(attempt_id__in=ids).values().iterator():
+        logs.setdefault(row['attempt_id'], []).append(row)
+
+    return [
+        {'attempt': row, 'answers': answers.get(row['id'], []), 'logs': logs.get(row['id'], [])}
+        for row in attempt_rows
+    ]
+
+
+def _summary(attempt):
+    """Rollup inputs of an archived ``TestAttempt.values()`` row"""
+    summary = {field: attempt.get(field) for field in SUMMARY_FIELDS}
+    time_spent = attempt.get('time_spent')
+    if isinstance(time_spent, str):
+        time_spent = TestAttempt._meta.get_field('time_spent').to_python(time_spent)
+    summary['time_seconds'] = int(time_spent.total_seconds()) if time_spent else 0
+    return summary
+
+
+def _tally_answers(tallies, answers):
+    for answer in answers:
+        if answer['is_attempted']:
+            tallies[answer['question_id'], 'attempts'] += 1
+            tallies[answer['question_id'], 'correct'] += int(bool(answer['is_correct']))
+
+
+def _add_question_tallies(tallies):
+    questions = {question_id for question_id, _ in tallies}
+    for question_id in questions:
+        Question.objects.filter(pk=question_id).update(
+            archived_attempts=F('archived_attempts') + tallies[question_id, 'attempts'],
+            archived_correct=F('archived_correct') + tallies[question_id, 'correct'],
+        )
+
+
+def archive_attempts(cutoff, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Move submitted attempts with ``submitted_at < cutoff`` to the archive.
+
+    Attempts that carry a TestReview are kept, since deleting the attempt
+    would cascade to the review. Returns ``(attempts, bytes_written)``.
+    """
+    candidates = TestAttempt.objects.filter(
+        status='submitted', submitted_at__lt=cutoff, review__isnull=True
+    )
+    if dry_run:
+        return candidates.count(), 0
+
+    root = archive_root()
+    run_id = f"{timezone.now():%Y%m%d%H%M%S}-{secrets.token_hex(8)}"
+    archived = 0
+    written = 0
+
+    while True:
+        rows = list(candidates.order_by('submitted_at', 'pk').values()[:chunk_size])
+        if not rows:
+            break
+
+        index = []
+        handles = {}
+        tallies = Counter()
+        try:
+            for record in _chunk_records(rows):
+                attempt = record['attempt']
+                relative = f"{attempt['submitted_at']:%Y/%m}/attempts-{run_id}.jsonl.gz"
+                handle = handles.get(relative)
+                if handle is None:
+                    path = root / relative
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    handle = handles[relative] = open(path, 'ab')
+                member = _gzip_member(record)
+                offset = handle.tell()
+                handle.write(member)
+                written += len(member)
+                index.append(ArchivedAttempt(
+                    id=attempt['public_id'],
+                    user_id=attempt['user_id'],
+                    test_id=attempt['test_id'],
+                    attempt_number=attempt['attempt_number'],
+                    marks_obtained=attempt['marks_obtained'],
+                    percentage_score=attempt['percentage_score'],
+                    submitted_at=attempt['submitted_at'],
+                    summary=_summary(attempt),
+                    path=relative,
+                    offset=offset,
+                    length=len(member),
+                ))
+                _tally_answers(tallies, record['answers'])
+        finally:
+            # Make the data durable before the rows are deleted
+            for handle in handles.values():
+                handle.flush()
+                os.fsync(handle.fileno())
+                handle.close()
+
+        with transaction.atomic():
+            ArchivedAttempt.objects.bulk_create(index)
+            TestAttempt.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            # Question totals still include these answers; remember which part is archived
+            _add_question_tallies(tallies)
+        archived += len(index)
+
+    logger.info(f"Archived {archived} test attempts ({written} bytes) before {cutoff}")
+    return archived, written
+
+
+def recount_archive(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild ``Question.archived_*`` and missing index summaries from the
+    archive files, for attempts archived before they were kept. Returns the
+    number of archived attempts read.
+    """
+    tallies = Counter()
+    read = 0
+    rows = ArchivedAttempt.objects.order_by('path', 'offset')
+    for archived in rows.iterator(chunk_size=chunk_size):
+        record = _load_record(archived.path, archived.offset, archived.length)
+        _tally_answers(tallies, record['answers'])
+        if not archived.summary:
+            archived.summary = _summary(record['attempt'])
+            archived.save(update_fields=['summary'])
+        read += 1
+    with transaction.atomic():
+        Question.objects.filter(Q(archived_attempts__gt=0) | Q(archived_correct__gt=0)).update(
+            archived_attempts=0, archived_correct=0
+        )
+        _add_question_tallies(tallies)
+    return read
+
+
+@lru_cache(maxsize=getattr(settings, 'ATTEMPT_ARCHIVE_CACHE_SIZE', 256))
+def _load_record(path, offset, length):
+    with open(archive_root() / path, 'rb') as f:
+        f.seek(offset)
+        member = f.read(length)
+    return json.loads(zlib.decompress(member, 31).decode('utf-8'))
+
+
+def _build(model, data):
+    """Unsaved model instance from a ``values()`` dict read back from JSON"""
+    fields = {}
+    for field in model._meta.concrete_fields:
+        if field.attname in data:
+            value = data[field.attname]
+            fields[field.attname] = field.to_python(value) if value is not None else None
+    return model(**fields)
+
+
+def archived_summary(archived):
+    """Rollup inputs of an ArchivedAttempt, read back from the file if not indexed"""
+    if archived.summary:
+        return archived.summary
+    return _summary(_load_record(archived.path, archived.offset, archived.length)['attempt'])
+
+
+def rehydrate_attempt(archived):
+    """Rebuild a read-only TestAttempt, with its answers, from the archive"""
+    record = _load_record(archived.path, archived.offset, archived.length)
+    data = record['attempt']
+    if 'public_id' not in data:
+        # Archived while attempts were still keyed by their UUID
+        data = {**data, 'id': None, 'public_id': data['id']}
+    attempt = _build(TestAttempt, data)
+
+    questions = Question.objects.select_related('subject').in_bulk(
+        [answer['question_id'] for answer in record['answers']]
+    )
+    answers = []
+    for data in record['answers']:
+        question = questions.get(data['question_id'])
+        if question is None:
+            continue
+        answer = _build(StudentAnswer, data)
+        answer.marks_obtained = Decimal(str(data['marks_obtained']))
+        answer.attempt = attempt
+        answer.question = question
+        answers.append(answer)
+    answers.sort(key=lambda a: (a.question.order, a.question.created_at))
+    attempt.archived_answers = answers
+    return attempt
+
+
+def get_attempt_or_404(attempt_id, user):
+    """The user's attempt by public id from the hot tables, falling back to the archive"""
+    attempt = TestAttempt.objects.filter(public_id=attempt_id, user=user).first()
+    if attempt is not None:
+        return attempt
+    archived = ArchivedAttempt.objects.filter(pk=attempt_id, user=user).first()
+    if archived is None:
+        raise Http404("Test attempt not found")
+    return rehydrate_attempt(archived)
@@ -0,0 +1,121 @@
+"""
+Deep copies of tests and test series.
+
+Rows are copied field by field and inserted with ``bulk_create``, so no
+per-row ``save()`` logic (slug probing, fingerprinting) runs. Slugs are
+picked with one lookup, subjects and question banks are kept by reference,
+image files are shared by path rather than duplicated, and the
+question/marks counters are set directly. Attempt analytics start at zero.
+
+Copied questions keep their MinHash signature but get no LSH buckets, so
+deliberate re-runs are not reported as near-duplicates of the original.
+"""
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Question, Test, TestSeries
+
+CHUNK_SIZE = 500
+
+# Fields the copies do not inherit
+QUESTION_RESET = {
+    'total_attempts': 0, 'correct_attempts': 0, 'archived_attempts': 0, 'archived_correct': 0,
+    'duplicate_of_id': None,
+}
+TEST_RESET = {'results_published_at': None, 'regrade_requested_at': None}
+SERIES_RESET = {'total_attempts': 0, 'average_score': 0}
+
+
+def _copy(instance, **overrides):
+    """Unsaved copy of a model instance with ``overrides`` applied"""
+    data = {
+        field.attname: getattr(instance, field.attname)
+        for field in type(instance)._meta.concrete_fields
+        if not field.primary_key
+    }
+    data.update(overrides)
+    return type(instance)(**data)
+
+
+def unique_slug(queryset, title, max_length=50):
+    """First free ``slug``, ``slug-1``, ... in ``queryset``, found with one query"""
+    base = slugify(title)[:max_length - 4] or 'copy'
+    taken = set(queryset.filter(slug__startswith=base).values_list('slug', flat=True))
+    slug = base
+    counter = 1
+    while slug in taken:
+        slug = f"{base}-{counter}"
+        counter += 1
+    return slug
+
+
+def _question_counters(questions):
+    return {
+        'total_questions': len(questions),
+        'total_marks': sum(question.marks for question in questions),
+        'easy_questions': sum(question.difficulty == 'easy' for question in questions),
+        'medium_questions': sum(question.difficulty == 'medium' for question in questions),
+        'hard_questions': sum(question.difficulty == 'hard' for question in questions),
+    }
+
+
+def _copy_test(test, test_series_id, questions, **overrides):
+    counters = {} if test.question_bank_id else _question_counters(questions)
+    return _copy(test, test_series_id=test_series_id, **TEST_RESET, **counters, **overrides)
+
+
+def _copy_questions(questions, test_ids):
+    """Bulk insert copies of ``questions``, re-pointed through ``{old test id: new test id}``"""
+    copies = [
+        _copy(question, test_id=test_ids[question.test_id], **QUESTION_RESET)
+        for question in questions
+    ]
+    Question.objects.bulk_create(copies, batch_size=CHUNK_SIZE)
+    return len(copies)
+
+
+def clone_test(test, test_series=None, title=None):
+    """Copy ``test`` and its questions into ``test_series`` (default: its own)"""
+    test_series = test_series or test.test_series
+    if title is None:
+        title = test.title if test_series.pk != test.test_series_id else f"{test.title} (Copy)"
+    questions = list(test.questions.all())
+
+    with transaction.atomic():
+        copy = _copy_test(
+            test, test_series.pk, questions,
+            title=title, slug=unique_slug(Test.objects.filter(test_series=test_series), title),
+        )
+        Test.objects.bulk_create([copy])
+        _copy_questions(questions, {test.pk: copy.pk})
+    return copy
+
+
+def clone_series(test_series, title=None):
+    """Copy a test series with all of its tests and questions"""
+    title = title or f"{test_series.title} (Copy)"
+    tests = list(test_series.tests.all())
+    questions = list(Question.objects.filter(test__test_series=test_series).order_by('test_id', 'order', 'pk'))
+    by_test = {}
+    for question in questions:
+        by_test.setdefault(question.test_id, []).append(question)
+
+    with transaction.atomic():
+        copy = _copy(
+            test_series, title=title, slug=unique_slug(TestSeries.objects.all(), title), **SERIES_RESET
+        )
+        TestSeries.objects.bulk_create([copy])
+
+        # Slugs only need to be unique within the new series, so they carry over
+        test_copies = [_copy_test(test, copy.pk, by_test.get(test.pk, [])) for test in tests]
+        Test.objects.bulk_create(test_copies, batch_size=CHUNK_SIZE)
+        _copy_questions(questions, {test.pk: test_copy.pk for test, test_copy in zip(tests, test_copies)})
+
+        active = [test_copy for test_copy in test_copies if test_copy.is_active]
+        copy.total_tests = len(active)
+        copy.total_questions = sum(test_copy.total_questions for test_copy in active)
+        copy.total_marks = sum(test_copy.total_marks for test_copy in active)
+        TestSeries.objects.filter(pk=copy.pk).update(
+            total_tests=copy.total_tests, total_questions=copy.total_questions, total_marks=copy.total_marks
+        )
+    return copy
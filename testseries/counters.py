@@ -0,0 +1,131 @@
+"""
+Contention-free Question analytics counters.
+
+Submissions append one small ``QuestionStatDelta`` row per answered question
+instead of incrementing ``Question.total_attempts``/``correct_attempts`` in
+place, so concurrent submissions of the same test never wait on each other's
+row locks. A periodic flush folds all pending deltas into Question with a
+single aggregated UPDATE.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .histograms import flush_score_histograms
+from .models import Question, QuestionStatDelta
+
+logger = logging.getLogger(__name__)
+
+FLUSH_LOCK_KEY = 'testseries:question-stats-flush'
+FLUSH_BATCH_SIZE = 500
+
+
+def record_question_stats(results):
+    """
+    Append analytics deltas for one graded attempt.
+
+    ``results`` maps question id to ``(is_attempted, is_correct, marks)`` as
+    returned by ``grading.grade_attempt``; unattempted questions are skipped.
+    """
+    deltas = [
+        QuestionStatDelta(question_id=question_id, attempts=1, correct=int(is_correct))
+        for question_id, (is_attempted, is_correct, _) in results.items()
+        if is_attempted
+    ]
+    if deltas:
+        QuestionStatDelta.objects.bulk_create(deltas)
+    maybe_flush_question_stats()
+
+
+def maybe_flush_question_stats():
+    """
+    Flush pending question and score histogram deltas at most once per
+    QUESTION_STATS_FLUSH_INTERVAL seconds
+    """
+    interval = getattr(settings, 'QUESTION_STATS_FLUSH_INTERVAL', 60)
+    # cache.add is atomic, so only one caller per interval (and process,
+    # with a local cache) attempts the flush; the flush itself claims its rows
+    if cache.add(FLUSH_LOCK_KEY, 1, timeout=interval):
+        try:
+            flush_question_stats()
+        except Exception as e:
+            logger.error(f"Error flushing question stats: {e}")
+        try:
+            flush_score_histograms()
+        except Exception as e:
+            logger.error(f"Error flushing score histograms: {e}")
+
+
+def flush_question_stats():
+    """
+    Fold all pending deltas into Question with one aggregated UPDATE per
+    batch of FLUSH_BATCH_SIZE questions.
+
+    Returns the number of questions updated.
+    """
+    with transaction.atomic():
+        # Claim the rows before applying them: a concurrent flush (another
+        # worker, the cron command) skips the locked ones, and deltas
+        # committed while this one runs are left for the next.
+        rows = list(
+            QuestionStatDelta.objects.select_for_update(skip_locked=True)
+            .values_list('pk', 'question_id', 'attempts', 'correct')
+        )
+        if not rows:
+            return 0
+
+        # Without row locks (SQLite) the delete is the claim: if another
+        # flush removed some of these rows first, apply nothing.
+        delta_ids = [pk for pk, _, _, _ in rows]
+        deleted = 0
+        for i in range(0, len(delta_ids), FLUSH_BATCH_SIZE):
+            deleted += QuestionStatDelta.objects.filter(pk__in=delta_ids[i:i + FLUSH_BATCH_SIZE]).delete()[0]
+        if deleted != len(delta_ids):
+            transaction.set_rollback(True)
+            logger.warning("Question stats already being flushed elsewhere; skipped")
+            return 0
+
+        totals = {}
+        for _, question_id, attempts, correct in rows:
+            total = totals.setdefault(question_id, [0, 0])
+            total[0] += attempts
+            total[1] += correct
+        add_question_stats(totals)
+
+    logger.info(f"Flushed question stats for {len(totals)} question(s)")
+    return len(totals)
+
+
+def add_question_stats(totals):
+    """
+    Add ``{question_id: (attempts, correct)}`` to the Question counters with
+    one relative UPDATE per batch; negative changes (regrades) stop at zero
+    """
+    question_ids = list(totals)
+    for i in range(0, len(question_ids), FLUSH_BATCH_SIZE):
+        batch = question_ids[i:i + FLUSH_BATCH_SIZE]
+        attempts_case = Case(
+            *[When(pk=question_id, then=Value(totals[question_id][0])) for question_id in batch],
+            default=Value(0), output_field=IntegerField(),
+        )
+        correct_case = Case(
+            *[When(pk=question_id, then=Value(totals[question_id][1])) for question_id in batch],
+            default=Value(0), output_field=IntegerField(),
+        )
+        Question.objects.filter(pk__in=batch).update(
+            total_attempts=Greatest(F('total_attempts') + attempts_case, Value(0)),
+            correct_attempts=Greatest(F('correct_attempts') + correct_case, Value(0)),
+        )
+
+
+def pending_question_stats(question_ids):
+    """Return ``{question_id: (attempts, correct)}`` of deltas not yet flushed"""
+    rows = QuestionStatDelta.objects.filter(question_id__in=question_ids).values(
+        'question_id'
+    ).annotate(attempts=Sum('attempts'), correct=Sum('correct'))
+    return {row['question_id']: (row['attempts'], row['correct']) for row in rows}
+
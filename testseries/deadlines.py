@@ -0,0 +1,104 @@
+"""
+Signed, stateless exam deadlines.
+
+When an attempt is served, the candidate gets a token signed with the
+project's SECRET_KEY (HMAC-SHA256 through ``django.core.signing``). It
+binds the attempt id, the user, the absolute deadline and a version of the
+served question set. Autosave, time-check and submit read the deadline from
+the token alone, so those requests do not need the attempt row to decide
+whether the candidate is still within time.
+
+Autosaved answers are kept in the database (``AttemptAutosave``, one row
+per open attempt), so whichever worker or process grades the attempt sees
+them; autosaves are refused after the deadline. A late submission is graded
+with the last autosave, i.e. the answers as of the deadline.
+"""
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+SALT = 'testseries.deadline'
+
+
+def grace_seconds():
+    return getattr(settings, 'EXAM_DEADLINE_GRACE_SECONDS', 30)
+
+
+def deadline_for(attempt):
+    return attempt.started_at + timedelta(minutes=attempt.test.duration_minutes)
+
+
+def question_set_version(attempt, questions):
+    """Short fingerprint of the questions served in an attempt"""
+    if attempt.paper_id:
+        return f"p{attempt.paper_id}"
+    ids = ','.join(str(pk) for pk in sorted(question.pk for question in questions))
+    return f"{zlib.crc32(ids.encode()):08x}"
+
+
+def issue_token(attempt, questions):
+    """Deadline token of ``attempt``"""
+    return signing.dumps({
+        'a': attempt.public_id.hex,
+        'u': attempt.user_id,
+        'd': int(deadline_for(attempt).timestamp()),
+        'v': question_set_version(attempt, questions),
+    }, salt=SALT)
+
+
+def read_token(token, attempt_id, user_id):
+    """Claims of a valid token for this attempt and user, otherwise ``None``"""
+    if not token:
+        return None
+    try:
+        claims = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None
+    if claims.get('a') != attempt_id.hex or claims.get('u') != user_id:
+        return None
+    return claims
+
+
+def seconds_left(claims):
+    return claims['d'] - timezone.now().timestamp()
+
+
+def is_late(claims):
+    """Past the deadline, allowing ``EXAM_DEADLINE_GRACE_SECONDS`` for network delay"""
+    return seconds_left(claims) < -grace_seconds()
+
+
+def save_answers(attempt_id, answers):
+    """
+    Keep the latest answers (``{field: [values]}``) of an open attempt.
+    Returns ``False`` once the attempt is no longer open.
+    """
+    from .models import AttemptAutosave, TestAttempt
+
+    pk = TestAttempt.objects.filter(
+        public_id=attempt_id, status__in=['started', 'in_progress']
+    ).values_list('pk', flat=True).first()
+    if pk is None:
+        return False
+    AttemptAutosave.objects.bulk_create(
+        [AttemptAutosave(attempt_id=pk, answers=answers, saved_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=['attempt'],
+        update_fields=['answers', 'saved_at'],
+    )
+    return True
+
+
+def saved_answers(attempt):
+    from .models import AttemptAutosave
+
+    return AttemptAutosave.objects.filter(attempt_id=attempt.pk).values_list('answers', flat=True).first()
+
+
+def clear_answers(attempt):
+    from .models import AttemptAutosave
+
+    AttemptAutosave.objects.filter(attempt_id=attempt.pk).delete()
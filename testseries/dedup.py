@@ -0,0 +1,220 @@
+"""
+Near-duplicate question lookup, reporting and merging.
+
+Every saved Question carries a MinHash signature and one QuestionLSHBucket
+row per band. Questions sharing any (band, bucket) pair are candidates; the
+signatures then estimate their similarity. Single lookups go through the
+(band, bucket) index, and whole-bank reports stream the bucket table in
+index order, so neither compares every pair of questions.
+"""
+from array import array
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from .minhash import NUM_PERM, band_keys, from_bytes, question_signature, similarity, to_bytes
+from .models import Question, QuestionBank, QuestionLSHBucket, QuestionStatDelta, TestPaper
+
+DEFAULT_THRESHOLD = 0.7
+
+
+def fingerprint(question):
+    """Compute and set ``question.minhash``; returns the signature"""
+    sig = question_signature(question.question_text, question.options)
+    question.minhash = to_bytes(sig)
+    return sig
+
+
+def store_buckets(signatures):
+    """Replace the LSH bucket rows of ``{question_id: signature}``"""
+    rows = [
+        QuestionLSHBucket(question_id=question_id, band=band, bucket=key)
+        for question_id, sig in signatures.items()
+        for band, key in enumerate(band_keys(sig))
+    ]
+    with transaction.atomic():
+        QuestionLSHBucket.objects.filter(question_id__in=list(signatures)).delete()
+        QuestionLSHBucket.objects.bulk_create(rows, batch_size=2000)
+
+
+def index_questions(queryset, chunk_size=1000):
+    """(Re)compute signatures and buckets of ``queryset``; returns the count"""
+    indexed = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('id', 'question_text', 'options')[:chunk_size]
+        )
+        if not rows:
+            return indexed
+        last_pk = rows[-1][0]
+
+        signatures = {}
+        questions = []
+        for question_id, text, options in rows:
+            sig = signatures[question_id] = question_signature(text, options)
+            questions.append(Question(pk=question_id, minhash=to_bytes(sig)))
+        with transaction.atomic():
+            Question.objects.bulk_update(questions, ['minhash'], batch_size=500)
+            store_buckets(signatures)
+        indexed += len(rows)
+
+
+def find_near_duplicates(question_text, options=None, queryset=None, threshold=DEFAULT_THRESHOLD, exclude=None):
+    """
+    Questions similar to the given text and options.
+
+    Returns ``[(question, similarity)]`` best match first. Merged duplicates
+    are skipped in favour of their canonical question.
+    """
+    sig = question_signature(question_text, options)
+    bands = Q()
+    for band, key in enumerate(band_keys(sig)):
+        bands |= Q(band=band, bucket=key)
+    candidate_ids = set(QuestionLSHBucket.objects.filter(bands).values_list('question_id', flat=True))
+    candidate_ids.discard(exclude)
+    if not candidate_ids:
+        return []
+
+    candidates = (queryset if queryset is not None else Question.objects.all()).filter(
+        pk__in=candidate_ids, duplicate_of__isnull=True
+    ).select_related('test', 'bank')
+    matches = []
+    for question in candidates:
+        if question.minhash is None:
+            continue
+        score = similarity(sig, from_bytes(question.minhash))
+        if score >= threshold:
+            matches.append((question, score))
+    matches.sort(key=lambda match: -match[1])
+    return matches
+
+
+def _candidate_runs(queryset):
+    """Lists of question ids sharing a (band, bucket), streamed in index order"""
+    rows = QuestionLSHBucket.objects.filter(
+        question__in=queryset.filter(duplicate_of__isnull=True)
+    ).order_by('band', 'bucket', 'question_id').values_list('band', 'bucket', 'question_id')
+
+    runs = []
+    current = None
+    members = []
+    for band, bucket, question_id in rows.iterator(chunk_size=5000):
+        if (band, bucket) != current:
+            if len(members) > 1:
+                runs.append(members)
+            current = (band, bucket)
+            members = []
+        members.append(question_id)
+    if len(members) > 1:
+        runs.append(members)
+    return runs
+
+
+def duplicate_clusters(queryset, threshold=DEFAULT_THRESHOLD):
+    """
+    Group near-duplicate questions of ``queryset``.
+
+    Returns lists of question ids, lowest (oldest) id first; singletons are
+    left out.
+    """
+    runs = _candidate_runs(queryset)
+    ids = sorted({question_id for run in runs for question_id in run})
+
+    # Candidate signatures in one flat array, NUM_PERM slots per question
+    signatures = array('I')
+    position = {}
+    for start in range(0, len(ids), 500):
+        rows = Question.objects.filter(pk__in=ids[start:start + 500]).values_list('id', 'minhash')
+        for question_id, data in rows:
+            if data is not None:
+                position[question_id] = len(position)
+                signatures.extend(from_bytes(data))
+
+    def sig(question_id):
+        offset = position[question_id] * NUM_PERM
+        return signatures[offset:offset + NUM_PERM]
+
+    parent = {}
+
+    def find(question_id):
+        root = parent.setdefault(question_id, question_id)
+        while root != parent[root]:
+            root = parent[root]
+        parent[question_id] = root
+        return root
+
+    for run in runs:
+        run = [question_id for question_id in run if question_id in position]
+        if len(run) < 2:
+            continue
+        head = sig(run[0])
+        for other in run[1:]:
+            if similarity(head, sig(other)) >= threshold:
+                a, b = find(run[0]), find(other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+    clusters = {}
+    for question_id in parent:
+        clusters.setdefault(find(question_id), []).append(question_id)
+    return sorted(sorted(members) for members in clusters.values() if len(members) > 1)
+
+
+def _served_ids(bank_id):
+    """Ids of a bank's questions on papers already drawn, which candidates may still be shown"""
+    served = set()
+    for question_ids in TestPaper.objects.filter(test__question_bank_id=bank_id).values_list('question_ids', flat=True):
+        served.update(question_ids)
+    return served
+
+
+def merge_duplicates(clusters):
+    """
+    Fold each cluster into its first (canonical) question.
+
+    Only questions of the same bank, or of the same test, are merged: a
+    report over several tests or banks can cluster questions that belong to
+    different papers. Duplicates are kept so stored answers and papers still
+    resolve, are marked ``duplicate_of`` and drop out of bank pools.
+
+    A bank duplicate that no drawn paper uses is retired: it hands its
+    analytics counters (and pending deltas) to the canonical question. A
+    duplicate still served, on a paper or as a test's own question, keeps
+    its counters, since it is still graded on its own. Returns the number
+    merged.
+    """
+    merged = 0
+    served = {}
+    with transaction.atomic():
+        for cluster in clusters:
+            groups = {}
+            for question_id, test_id, bank_id in Question.objects.filter(pk__in=cluster).order_by('pk').values_list(
+                'id', 'test_id', 'bank_id'
+            ):
+                groups.setdefault(('bank', bank_id) if bank_id else ('test', test_id), []).append(question_id)
+
+            for (kind, scope_id), (canonical, *duplicates) in groups.items():
+                if not duplicates:
+                    continue
+                retired = []
+                if kind == 'bank':
+                    if scope_id not in served:
+                        served[scope_id] = _served_ids(scope_id)
+                    retired = [question_id for question_id in duplicates if question_id not in served[scope_id]]
+                if retired:
+                    counts = Question.objects.filter(pk__in=retired).aggregate(
+                        attempts=Sum('total_attempts'), correct=Sum('correct_attempts')
+                    )
+                    Question.objects.filter(pk=canonical).update(
+                        total_attempts=F('total_attempts') + (counts['attempts'] or 0),
+                        correct_attempts=F('correct_attempts') + (counts['correct'] or 0),
+                    )
+                    Question.objects.filter(pk__in=retired).update(total_attempts=0, correct_attempts=0)
+                    QuestionStatDelta.objects.filter(question_id__in=retired).update(question_id=canonical)
+                Question.objects.filter(pk__in=duplicates).update(duplicate_of=canonical)
+                merged += len(duplicates)
+
+        merged_ids = [question_id for cluster in clusters for question_id in cluster]
+        QuestionBank.objects.filter(questions__in=merged_ids).update(pools_built_at=None)
+    return merged
@@ -0,0 +1,202 @@
+"""
+Shared grading engine for test attempts.
+
+Everything in this module works on plain Python data (dicts, lists, strings)
+and never touches the ORM, so the same code grades a live submission in
+``submit_test`` and re-scores stored answers inside worker processes during a
+bulk regrade.
+"""
+from .packing import pack_answers, unpack_answers
+
+
+def question_snapshot(question):
+    """Return the picklable grading data of a Question instance"""
+    return {
+        'id': question.id,
+        'question_type': question.question_type,
+        'difficulty': question.difficulty,
+        'subject': question.subject.name if question.subject_id else None,
+        'correct_answer': question.correct_answer,
+        'marks': float(question.marks),
+        'negative_marks': float(question.negative_marks),
+    }
+
+
+def normalize_answer(value):
+    """Lower-case and strip an answer; lists are sorted for order-free comparison"""
+    if isinstance(value, (list, tuple)):
+        return sorted(str(v).lower().strip() for v in value)
+    return str(value).lower().strip()
+
+
+def expected_answer(question):
+    """Normalized correct answer of a question snapshot"""
+    correct_answer = question['correct_answer']
+
+    if question['question_type'] == 'mcq_multiple':
+        if isinstance(correct_answer, dict) and 'answers' in correct_answer:
+            return normalize_answer(correct_answer['answers'])
+        if isinstance(correct_answer, list):
+            return normalize_answer(correct_answer)
+        return []
+
+    if isinstance(correct_answer, dict) and 'answer' in correct_answer:
+        return normalize_answer(correct_answer['answer'])
+    if isinstance(correct_answer, str):
+        return normalize_answer(correct_answer)
+    return ''
+
+
+def selected_value(selected_answer):
+    """Extract the raw value from a stored StudentAnswer.selected_answer"""
+    if not isinstance(selected_answer, dict):
+        return ''
+    if 'answers' in selected_answer:
+        return selected_answer['answers'] or []
+    return selected_answer.get('answer', '')
+
+
+def stored_answer(value):
+    """Inverse of ``selected_value``: the JSON stored on StudentAnswer"""
+    if not value:
+        return {}
+    if isinstance(value, list):
+        return {'answers': value}
+    return {'answer': value}
+
+
+def grade_answer(question, value, negative_marking):
+    """
+    Grade a single answer.
+
+    Returns ``(is_attempted, is_correct, marks)`` where ``marks`` is negative
+    for a wrong answer when negative marking is enabled.
+    """
+    if not value:
+        return False, False, 0.0
+
+    is_correct = normalize_answer(value) == expected_answer(question)
+    if is_correct:
+        return True, True, question['marks']
+    if negative_marking:
+        return True, False, -question['negative_marks']
+    return True, False, 0.0
+
+
+def _add_breakdown(breakdown, key, is_correct, marks):
+    entry = breakdown.setdefault(key, {'correct': 0, 'wrong': 0, 'marks': 0.0})
+    if is_correct:
+        entry['correct'] += 1
+    else:
+        entry['wrong'] += 1
+    entry['marks'] += marks
+
+
+def grade_attempt(questions, answers, negative_marking, total_marks, pass_percentage):
+    """
+    Grade a whole attempt.
+
+    ``questions`` is a list of snapshots from ``question_snapshot`` and
+    ``answers`` maps question id to the raw selected value. Returns
+    ``(results, summary)``: ``results`` maps question id to
+    ``(is_attempted, is_correct, marks)`` and ``summary`` holds the
+    TestAttempt score fields.
+    """
+    results = {}
+    correct_answers = 0
+    wrong_answers = 0
+    attempted_questions = 0
+    marks_obtained = 0.0
+    subject_wise_score = {}
+    difficulty_wise_score = {}
+
+    for question in questions:
+        is_attempted, is_correct, marks = grade_answer(
+            question, answers.get(question['id']), negative_marking
+        )
+        results[question['id']] = (is_attempted, is_correct, marks)
+        if not is_attempted:
+            continue
+
+        attempted_questions += 1
+        if is_correct:
+            correct_answers += 1
+        else:
+            wrong_answers += 1
+        marks_obtained += marks
+
+        if question['subject']:
+            _add_breakdown(subject_wise_score, question['subject'], is_correct, marks)
+        _add_breakdown(difficulty_wise_score, question['difficulty'], is_correct, marks)
+
+    percentage_score = 0.0
+    if total_marks > 0:
+        percentage_score = max(0.0, (marks_obtained / float(total_marks)) * 100)
+
+    summary = {
+        'attempted_questions': attempted_questions,
+        'correct_answers': correct_answers,
+        'wrong_answers': wrong_answers,
+        'marks_obtained': round(marks_obtained, 2),
+        'percentage_score': round(percentage_score, 2),
+        'passed': percentage_score >= pass_percentage,
+        'subject_wise_score': subject_wise_score,
+        'difficulty_wise_score': difficulty_wise_score,
+    }
+    return results, summary
+
+
+def regrade_chunk(questions, negative_marking, pass_percentage, attempts):
+    """
+    Re-score a chunk of stored attempts; runs inside a worker process.
+
+    ``attempts`` is a list of ``(attempt_id, total_marks, rows, sheet)`` where
+    each row is ``(answer_id, question_id, selected_answer, is_attempted,
+    is_correct)`` as stored and ``sheet`` is the packed answer sheet bytes or
+    ``None``. Returns ``(graded, tallies)``: ``graded`` is a list of
+    ``(attempt_id, summary, answer_results, sheet)`` with ``answer_results`` a
+    list of ``(answer_id, is_attempted, is_correct, marks)`` and ``sheet`` the
+    re-encoded sheet (or ``None``); ``tallies`` maps question id to the
+    ``[attempts, correct]`` change against the stored grading over the whole
+    chunk.
+    """
+    graded = []
+    tallies = {}
+    for attempt_id, total_marks, rows, sheet in attempts:
+        entries = unpack_answers(sheet) if sheet is not None else None
+        if entries is not None:
+            answers = {e['question_id']: selected_value(e['selected_answer']) for e in entries}
+            stored = {e['question_id']: (e['is_attempted'], e['is_correct']) for e in entries}
+        else:
+            answers = {question_id: selected_value(selected) for _, question_id, selected, _, _ in rows}
+            stored = {question_id: (attempted, correct) for _, question_id, _, attempted, correct in rows}
+
+        results, summary = grade_attempt(
+            questions, answers, negative_marking, total_marks, pass_percentage
+        )
+        answer_results = [
+            (answer_id, *results[question_id])
+            for answer_id, question_id, *_ in rows
+            if question_id in results
+        ]
+
+        new_sheet = None
+        if entries is not None:
+            for entry in entries:
+                if entry['question_id'] in results:
+                    entry['is_attempted'], entry['is_correct'], entry['marks'] = results[entry['question_id']]
+            new_sheet = pack_answers(entries)
+
+        # Only questions the candidate actually had count towards analytics
+        for question_id in answers:
+            is_attempted, is_correct, _ = results.get(question_id, (False, False, 0.0))
+            was_attempted, was_correct = stored.get(question_id, (False, False))
+            attempts_change = int(bool(is_attempted)) - int(bool(was_attempted))
+            correct_change = int(bool(is_attempted and is_correct)) - int(bool(was_attempted and was_correct))
+            if attempts_change or correct_change:
+                tally = tallies.setdefault(question_id, [0, 0])
+                tally[0] += attempts_change
+                tally[1] += correct_change
+
+        graded.append((attempt_id, summary, answer_results, new_sheet))
+    return graded, tallies
@@ -0,0 +1,113 @@
+"""
+Per-test score histograms.
+
+Each graded attempt counts its percentage score in the test's ScoreHistogram
+row, so the result page can place a candidate in the distribution without
+scanning the other attempts.
+
+Like the question counters (see counters.py), submissions and regrades only
+append ``ScoreDelta`` rows, so concurrent submissions of a test never queue
+on its histogram row. The periodic flush folds them in; readers add the
+few pending ones themselves.
+"""
+import logging
+
+from django.db import transaction
+
+from .models import ArchivedAttempt, ScoreDelta, ScoreHistogram, TestAttempt
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+
+def record_score(test_id, percentage, sign=1):
+    """Count one score in (or with ``sign=-1`` remove it from) a test's histogram"""
+    ScoreDelta.objects.create(test_id=test_id, percentage=float(percentage), sign=sign)
+
+
+def record_score_changes(test_id, changes):
+    """Move regraded scores, given as ``(old, new)`` percentages, between buckets"""
+    deltas = []
+    for old, new in changes:
+        if float(old) != float(new):
+            deltas.append(ScoreDelta(test_id=test_id, percentage=float(old), sign=-1))
+            deltas.append(ScoreDelta(test_id=test_id, percentage=float(new), sign=1))
+    if deltas:
+        ScoreDelta.objects.bulk_create(deltas, batch_size=FLUSH_BATCH_SIZE)
+
+
+def flush_score_histograms():
+    """
+    Fold all pending score deltas into their histograms.
+
+    Returns the number of histograms updated.
+    """
+    with transaction.atomic():
+        # Claimed the same way as the question stat deltas
+        rows = list(
+            ScoreDelta.objects.select_for_update(skip_locked=True).values_list('pk', 'test_id', 'percentage', 'sign')
+        )
+        if not rows:
+            return 0
+
+        delta_ids = [pk for pk, _, _, _ in rows]
+        deleted = 0
+        for i in range(0, len(delta_ids), FLUSH_BATCH_SIZE):
+            deleted += ScoreDelta.objects.filter(pk__in=delta_ids[i:i + FLUSH_BATCH_SIZE]).delete()[0]
+        if deleted != len(delta_ids):
+            transaction.set_rollback(True)
+            logger.warning("Score histograms already being flushed elsewhere; skipped")
+            return 0
+
+        scores = {}
+        for _, test_id, percentage, sign in rows:
+            scores.setdefault(test_id, []).append((percentage, sign))
+        # Only flushes and rebuilds lock histograms, always after their deltas
+        for test_id in sorted(scores):
+            ScoreHistogram.objects.get_or_create(test_id=test_id)
+            histogram = ScoreHistogram.objects.select_for_update().get(test_id=test_id)
+            for percentage, sign in scores[test_id]:
+                histogram.add(percentage, sign)
+            histogram.save()
+
+    logger.info(f"Flushed score histograms of {len(scores)} test(s)")
+    return len(scores)
+
+
+def score_histogram(test_id):
+    """A test's histogram including deltas not yet flushed (not saved), or ``None``"""
+    histogram = ScoreHistogram.objects.filter(test_id=test_id).first()
+    pending = ScoreDelta.objects.filter(test_id=test_id).values_list('percentage', 'sign')
+    for percentage, sign in pending:
+        if histogram is None:
+            histogram = ScoreHistogram(test_id=test_id, buckets=[0] * ScoreHistogram.BUCKETS)
+        histogram.add(percentage, sign)
+    return histogram
+
+
+def rebuild_histogram(test):
+    """
+    Recompute a test's histogram from its submitted and archived attempts.
+
+    Pending deltas of the test are dropped, as the scan counts their
+    attempts; a submission committing during the scan may be missed, so
+    repair histograms while the test is not taking submissions.
+    """
+    with transaction.atomic():
+        # Deltas first, then the histogram: the flush's lock order
+        list(ScoreDelta.objects.select_for_update().filter(test=test).values_list('pk'))
+        ScoreHistogram.objects.get_or_create(test=test)
+        histogram = ScoreHistogram.objects.select_for_update().get(test=test)
+        histogram.buckets = [0] * ScoreHistogram.BUCKETS
+        histogram.count = 0
+        histogram.total = histogram.total_squares = 0
+        scores = TestAttempt.objects.filter(test=test, status='submitted').values_list('percentage_score', flat=True)
+        for percentage in scores.iterator(chunk_size=5000):
+            histogram.add(percentage)
+        archived = ArchivedAttempt.objects.filter(test=test).values_list('percentage_score', flat=True)
+        for percentage in archived.iterator(chunk_size=5000):
+            histogram.add(percentage)
+        ScoreDelta.objects.filter(test=test).delete()
+        histogram.save()
+    return histogram
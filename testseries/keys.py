@@ -0,0 +1,147 @@
+"""
+Conversion of the attempt tables from random UUID keys to sequential ones.
+
+TestAttempt, StudentAnswer and TestAttemptLog were keyed by ``uuid4``, which
+made every index and foreign key on them 32 characters wide and scattered
+inserts across the whole primary key index. They now use BigAutoField keys;
+attempts keep their old UUID as ``public_id`` for URLs and deadline tokens.
+
+The data is converted in place, in chunks: the UUID is copied to
+``public_id``, then every row is renumbered with its SQLite ``rowid``
+(insertion order) and the foreign keys pointing at it are rewritten in the
+same chunk. Each chunk leaves the tables consistent, so an interrupted run
+can simply be resumed. Afterwards migration 0013 only has to copy the
+tables into their new integer columns.
+
+The renumbering relies on SQLite's ``rowid`` and typeless columns. On any
+other database the conversion refuses to start while the attempt tables
+hold rows (``KeyConversionError``): convert a SQLite copy of the data, or
+migrate before the first attempt is taken.
+
+Only raw SQL is used here because the migrations call these functions
+while the ORM models already describe the final schema.
+"""
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+ATTEMPT_TABLE = 'testseries_testattempt'
+
+# Tables referencing an attempt, with their foreign key column
+ATTEMPT_REFERENCES = [
+    ('testseries_studentanswer', 'attempt_id'),
+    ('testseries_testattemptlog', 'attempt_id'),
+    ('testseries_attemptanswersheet', 'attempt_id'),
+    ('testseries_testreview', 'attempt_id'),
+]
+
+# Tables whose own key is renumbered without anything pointing at them
+LEAF_TABLES = ['testseries_studentanswer', 'testseries_testattemptlog']
+
+# UUIDField is stored as 32 hex characters on SQLite, renumbered keys are shorter
+UNCONVERTED = "length(id) = 32"
+
+
+class KeyConversionError(Exception):
+    pass
+
+
+def _count(cursor, table, where):
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}")
+    return cursor.fetchone()[0]
+
+
+def pending_rows(connection):
+    """Rows still keyed by UUID, by table"""
+    with connection.cursor() as cursor:
+        return {table: _count(cursor, table, UNCONVERTED) for table in [ATTEMPT_TABLE, *LEAF_TABLES]}
+
+
+def _chunks(connection, step, chunk_size, atomic):
+    """Run ``step`` until it reports no more rows, one transaction per chunk"""
+    total = 0
+    while True:
+        if atomic:
+            with transaction.atomic(using=connection.alias):
+                done = step(chunk_size)
+        else:
+            done = step(chunk_size)
+        if not done:
+            return total
+        total += done
+
+
+def backfill_public_ids(connection, chunk_size=DEFAULT_CHUNK_SIZE, atomic=False):
+    """Copy each attempt's UUID key to ``public_id``"""
+    def step(size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {ATTEMPT_TABLE} SET public_id = id WHERE id IN "
+                f"(SELECT id FROM {ATTEMPT_TABLE} WHERE public_id IS NULL LIMIT %s)",
+                [size],
+            )
+            return cursor.rowcount
+
+    return _chunks(connection, step, chunk_size, atomic)
+
+
+def renumber_attempts(connection, chunk_size=DEFAULT_CHUNK_SIZE, atomic=False):
+    """Give every attempt its rowid as key and repoint the rows referencing it"""
+    def step(size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, id FROM {ATTEMPT_TABLE} WHERE {UNCONVERTED} ORDER BY rowid LIMIT %s", [size]
+            )
+            keys = cursor.fetchall()
+            for table, column in ATTEMPT_REFERENCES:
+                cursor.executemany(f"UPDATE {table} SET {column} = %s WHERE {column} = %s", keys)
+            cursor.executemany(f"UPDATE {ATTEMPT_TABLE} SET id = %s WHERE id = %s", keys)
+            return len(keys)
+
+    return _chunks(connection, step, chunk_size, atomic)
+
+
+def renumber_leaf_table(connection, table, chunk_size=DEFAULT_CHUNK_SIZE, atomic=False):
+    """Give every row of ``table`` its rowid as key"""
+    def step(size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET id = rowid WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE {UNCONVERTED} ORDER BY rowid LIMIT %s)",
+                [size],
+            )
+            return cursor.rowcount
+
+    return _chunks(connection, step, chunk_size, atomic)
+
+
+def check_convertible(connection):
+    """Raise ``KeyConversionError`` before anything is changed if the keys cannot be renumbered here"""
+    if connection.vendor == 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        rows = {table: _count(cursor, table, '1 = 1') for table in [ATTEMPT_TABLE, *LEAF_TABLES]}
+    if any(rows.values()):
+        held = ', '.join(f"{table}: {count}" for table, count in rows.items() if count)
+        raise KeyConversionError(
+            f"Attempt keys can only be renumbered in place on SQLite, and the attempt tables "
+            f"on this {connection.vendor} database hold rows ({held}). Convert a SQLite copy "
+            f"of the data with migrate_attempt_keys and load it back, or empty these tables first."
+        )
+
+
+def renumber_keys(connection, chunk_size=DEFAULT_CHUNK_SIZE, atomic=False):
+    """Renumber all attempt tables; returns rows converted by table"""
+    check_convertible(connection)
+    if connection.vendor != 'sqlite':
+        # Nothing to renumber
+        return {}
+    report = {ATTEMPT_TABLE: renumber_attempts(connection, chunk_size, atomic)}
+    for table in LEAF_TABLES:
+        report[table] = renumber_leaf_table(connection, table, chunk_size, atomic)
+    logger.info(f"Renumbered attempt keys: {report}")
+    return report
@@ -0,0 +1,47 @@
+# testseries/management/commands/archive_attempts.py
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from testseries.archive import archive_attempts, archive_root, recount_archive, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Move old submitted test attempts (with answers and logs) into compressed archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="Archive attempts submitted before this date (YYYY-MM-DD)")
+        parser.add_argument('--older-than-days', type=int, help="Archive attempts submitted more than N days ago")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Attempts per file write / delete")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the attempts that would be archived")
+        parser.add_argument(
+            '--recount', action='store_true',
+            help="Rebuild the archived share of question analytics from the archive files, then exit"
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            read = recount_archive(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'✅ Recounted {read} archived attempt(s)'))
+            return
+
+        if options['before']:
+            try:
+                day = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format')
+            cutoff = timezone.make_aware(datetime.combine(day, time.min))
+        elif options['older_than_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        else:
+            raise CommandError('Specify --before or --older-than-days')
+
+        archived, written = archive_attempts(cutoff, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{archived} attempt(s) submitted before {cutoff:%Y-%m-%d} would be archived'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Archived {archived} attempt(s) into {archive_root()} ({written / 1024:.1f} KB compressed)'
+        ))
@@ -0,0 +1,49 @@
+# testseries/management/commands/find_duplicate_questions.py
+import time
+
+from django.core.management.base import BaseCommand
+from testseries.dedup import DEFAULT_THRESHOLD, duplicate_clusters, index_questions, merge_duplicates
+from testseries.models import Question
+
+
+class Command(BaseCommand):
+    help = 'Report near-duplicate questions (MinHash/LSH) and optionally merge them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bank', type=int, help="Only questions of this question bank ID")
+        parser.add_argument('--test', type=int, help="Only questions of this test ID")
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Minimum estimated similarity (0-1)")
+        parser.add_argument('--reindex', action='store_true', help="Recompute fingerprints of all selected questions first")
+        parser.add_argument('--merge', action='store_true', help="Mark duplicates as merged into the oldest question of the same bank or test")
+
+    def handle(self, *args, **options):
+        questions = Question.objects.all()
+        if options['bank']:
+            questions = questions.filter(bank_id=options['bank'])
+        if options['test']:
+            questions = questions.filter(test_id=options['test'])
+
+        started = time.monotonic()
+        missing = questions if options['reindex'] else questions.filter(minhash__isnull=True)
+        indexed = index_questions(missing)
+        if indexed:
+            self.stdout.write(f'  Fingerprinted {indexed} question(s)')
+
+        clusters = duplicate_clusters(questions, threshold=options['threshold'])
+        elapsed = time.monotonic() - started
+
+        texts = dict(
+            Question.objects.filter(pk__in=[pk for cluster in clusters for pk in cluster]).values_list('id', 'question_text')
+        )
+        for cluster in clusters:
+            self.stdout.write(self.style.WARNING(f'Q{cluster[0]}: {texts[cluster[0]][:80]}'))
+            for question_id in cluster[1:]:
+                self.stdout.write(f'  ~ Q{question_id}: {texts[question_id][:80]}')
+
+        duplicates = sum(len(cluster) - 1 for cluster in clusters)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(clusters)} cluster(s), {duplicates} near-duplicate(s) found in {elapsed:.1f}s'
+        ))
+        if options['merge'] and clusters:
+            merged = merge_duplicates(clusters)
+            self.stdout.write(self.style.SUCCESS(f'✅ Merged {merged} duplicate question(s)'))
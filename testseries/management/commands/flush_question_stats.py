@@ -0,0 +1,21 @@
+# testseries/management/commands/flush_question_stats.py
+from django.core.management.base import BaseCommand
+from testseries.counters import flush_question_stats
+from testseries.histograms import flush_score_histograms
+
+
+class Command(BaseCommand):
+    help = 'Fold buffered question analytics and score histogram deltas into their counters (run from cron)'
+
+    def handle(self, *args, **options):
+        updated = flush_question_stats()
+        if updated:
+            self.stdout.write(self.style.SUCCESS(f'Flushed stats for {updated} question(s)'))
+        else:
+            self.stdout.write(self.style.WARNING('No pending question stats to flush'))
+
+        histograms = flush_score_histograms()
+        if histograms:
+            self.stdout.write(self.style.SUCCESS(f'Flushed score histograms of {histograms} test(s)'))
+        else:
+            self.stdout.write(self.style.WARNING('No pending scores to flush'))
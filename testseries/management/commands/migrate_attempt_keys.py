@@ -0,0 +1,54 @@
+# testseries/management/commands/migrate_attempt_keys.py
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.recorder import MigrationRecorder
+from testseries.keys import KeyConversionError, check_convertible, pending_rows, renumber_keys, DEFAULT_CHUNK_SIZE
+
+EXPAND = '0012_testattempt_public_id'
+CONTRACT = '0013_bigint_attempt_keys'
+
+
+class Command(BaseCommand):
+    help = 'Convert test attempt, answer and log tables from UUID to sequential keys in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Rows converted per transaction")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows still keyed by UUID")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        applied = MigrationRecorder(connection).applied_migrations()
+        if ('testseries', CONTRACT) in applied:
+            self.stdout.write(self.style.SUCCESS('✅ Attempt tables already use sequential keys'))
+            return
+        try:
+            check_convertible(connection)
+        except KeyConversionError as e:
+            raise CommandError(str(e))
+
+        if ('testseries', EXPAND) not in applied:
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f'{EXPAND} is not applied yet; nothing has been converted'))
+                return
+            call_command('migrate', 'testseries', EXPAND, database=options['database'], verbosity=0)
+
+        if options['dry_run']:
+            for table, rows in pending_rows(connection).items():
+                self.stdout.write(self.style.WARNING(f'{table}: {rows} row(s) still keyed by UUID'))
+            return
+
+        # Each chunk commits on its own, so an interrupted run can be resumed
+        started = time.monotonic()
+        report = renumber_keys(connection, options['chunk_size'], atomic=True)
+        for table, rows in report.items():
+            self.stdout.write(f'{table}: {rows} row(s) renumbered')
+
+        # What is left is copying the tables into their integer columns
+        call_command('migrate', 'testseries', CONTRACT, database=options['database'], verbosity=0)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Attempt tables converted to sequential keys in {time.monotonic() - started:.1f}s'
+        ))
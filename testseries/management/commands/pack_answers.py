@@ -0,0 +1,48 @@
+# testseries/management/commands/pack_answers.py
+import time
+
+from django.core.management.base import BaseCommand
+from testseries.answers import pack_attempts, submitted_attempt_chunks, unpack_attempts
+from testseries.models import AttemptAnswerSheet, StudentAnswer, TestAttempt
+
+
+class Command(BaseCommand):
+    help = 'Convert StudentAnswer rows of submitted attempts into packed answer sheets (or back with --unpack)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, help="Only attempts of this test ID")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Attempts per transaction")
+        parser.add_argument('--delete-rows', action='store_true', help="Delete StudentAnswer rows once packed")
+        parser.add_argument('--unpack', action='store_true', help="Restore StudentAnswer rows from packed sheets")
+
+    def handle(self, *args, **options):
+        attempts = TestAttempt.objects.all()
+        if options['test']:
+            attempts = attempts.filter(test_id=options['test'])
+
+        rows_before = StudentAnswer.objects.filter(attempt__in=attempts).count()
+        started = time.monotonic()
+        sheets = 0
+        packed_bytes = 0
+
+        for attempt_ids in submitted_attempt_chunks(options['chunk_size'], attempts):
+            if options['unpack']:
+                sheets += unpack_attempts(attempt_ids)
+            else:
+                written, size = pack_attempts(attempt_ids, delete_rows=options['delete_rows'])
+                sheets += written
+                packed_bytes += size
+
+        elapsed = time.monotonic() - started
+        rows_after = StudentAnswer.objects.filter(attempt__in=attempts).count()
+
+        if options['unpack']:
+            self.stdout.write(self.style.SUCCESS(f'✅ Unpacked {sheets} answer sheet(s) in {elapsed:.1f}s'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Packed {sheets} attempt(s) into {packed_bytes / 1024:.1f} KB in {elapsed:.1f}s'
+            ))
+        self.stdout.write(f'  StudentAnswer rows: {rows_before} -> {rows_after}')
+        self.stdout.write(
+            f'  Answer sheets: {AttemptAnswerSheet.objects.filter(attempt__in=attempts).count()}'
+        )
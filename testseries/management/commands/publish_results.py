@@ -0,0 +1,27 @@
+# testseries/management/commands/publish_results.py
+from django.core.management.base import BaseCommand, CommandError
+from testseries.models import Test
+from testseries.publication import due_tests, publish_results
+
+
+class Command(BaseCommand):
+    help = 'Publish deferred results of tests whose window has closed (run periodically, e.g. every minute from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help="Publish these tests now, even before end_time")
+
+    def handle(self, *args, **options):
+        if options['test_ids']:
+            tests = list(Test.objects.filter(pk__in=options['test_ids']).select_related('test_series'))
+            missing = set(options['test_ids']) - {test.pk for test in tests}
+            if missing:
+                raise CommandError(f'Test(s) {", ".join(map(str, sorted(missing)))} do not exist')
+        else:
+            tests = list(due_tests())
+
+        for test in tests:
+            report = publish_results(test)
+            self.stdout.write(
+                f'  "{test.title}": {report["ranked"]} attempt(s) ranked, {report["finalized"]} finalized'
+            )
+        self.stdout.write(self.style.SUCCESS(f'✅ Published results of {len(tests)} test(s)'))
@@ -0,0 +1,36 @@
+# testseries/management/commands/rebuild_rollups.py
+import time
+
+from django.core.management.base import BaseCommand
+from testseries.models import ArchivedAttempt, TestAttempt
+from testseries.rollups import rebuild_user_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute performance rollups from submitted and archived attempts. '
+        'Attempts of tests whose deferred results are not published yet are left out.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help="Only this user ID (repeatable)")
+        parser.add_argument('--chunk-size', type=int, default=200, help="Users per transaction")
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user_ids = sorted(set(options['user']))
+        else:
+            user_ids = sorted(
+                set(TestAttempt.objects.filter(status='submitted').values_list('user_id', flat=True))
+                | set(ArchivedAttempt.objects.values_list('user_id', flat=True))
+            )
+
+        started = time.monotonic()
+        chunk_size = options['chunk_size']
+        for start in range(0, len(user_ids), chunk_size):
+            rebuild_user_rollups(user_ids[start:start + chunk_size])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rebuilt rollups for {len(user_ids)} user(s) in {elapsed:.1f}s'
+        ))
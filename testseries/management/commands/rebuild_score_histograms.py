@@ -0,0 +1,30 @@
+# testseries/management/commands/rebuild_score_histograms.py
+import time
+
+from django.core.management.base import BaseCommand
+from testseries.histograms import rebuild_histogram
+from testseries.models import Test
+
+
+class Command(BaseCommand):
+    help = 'Recompute score distribution histograms from submitted and archived attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help="ID(s) of the test(s) to rebuild (default: all)")
+
+    def handle(self, *args, **options):
+        tests = Test.objects.all()
+        if options['test_ids']:
+            tests = tests.filter(pk__in=options['test_ids'])
+
+        started = time.monotonic()
+        rebuilt = 0
+        for test in tests.iterator():
+            histogram = rebuild_histogram(test)
+            rebuilt += 1
+            self.stdout.write(
+                f'  "{test.title}": {histogram.count} score(s), mean {histogram.mean}%, std dev {histogram.std_dev}'
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {rebuilt} score histogram(s) in {elapsed:.1f}s'))
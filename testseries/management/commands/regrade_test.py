@@ -0,0 +1,51 @@
+# testseries/management/commands/regrade_test.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from testseries.models import Test
+from testseries.regrade import regrade_test, run_queued_regrades, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-score all submitted attempts of a test after its answer key was corrected. '
+        'Without test IDs, regrade the tests queued from the admin (run periodically, e.g. from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_ids', nargs='*', type=int, help="ID(s) of the test(s) to regrade")
+        parser.add_argument('--workers', type=int, default=None, help="Grading processes (default: CPU count, 1 = in-process)")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Attempts per grading chunk")
+
+    def handle(self, *args, **options):
+        if not options['test_ids']:
+            started = time.monotonic()
+            count = 0
+            for test, report in run_queued_regrades(workers=options['workers'], chunk_size=options['chunk_size']):
+                self.report(test, report, time.monotonic() - started)
+                started = time.monotonic()
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f'✅ Regraded {count} queued test(s)'))
+            return
+
+        for test_id in options['test_ids']:
+            try:
+                test = Test.objects.select_related('test_series').get(pk=test_id)
+            except Test.DoesNotExist:
+                raise CommandError(f'Test {test_id} does not exist')
+
+            self.stdout.write(self.style.NOTICE(f'Regrading "{test}"...'))
+            started = time.monotonic()
+            report = regrade_test(test, workers=options['workers'], chunk_size=options['chunk_size'])
+            self.report(test, report, time.monotonic() - started)
+
+    def report(self, test, report, elapsed):
+        self.stdout.write(
+            f"  {report['attempts']} attempts / {report['answers']} answers rescored in {elapsed:.1f}s"
+        )
+        self.stdout.write(
+            f"  {report['changed']} attempts changed score "
+            f"(total {report['total_delta']:+}, largest gain {report['max_gain']:+}, "
+            f"largest loss {report['max_loss']:+})"
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Regraded "{test.title}"'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 03:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0003_testattemptlog_testreview_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStatDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stat_deltas', to='testseries.question')),
+            ],
+        ),
+    ]
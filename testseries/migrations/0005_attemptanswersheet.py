@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 03:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0004_questionstatdelta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptAnswerSheet',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='answer_sheet', serialize=False, to='testseries.testattempt')),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 03:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0005_attemptanswersheet'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttempt',
+            fields=[
+                ('id', models.UUIDField(editable=False, help_text='Original TestAttempt id', primary_key=True, serialize=False)),
+                ('attempt_number', models.PositiveIntegerField(default=1)),
+                ('marks_obtained', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('percentage_score', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('path', models.CharField(help_text='Relative to ATTEMPT_ARCHIVE_ROOT', max_length=255)),
+                ('offset', models.PositiveBigIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attempts', to='testseries.test')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_test_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-submitted_at'],
+                'indexes': [models.Index(fields=['user', 'test'], name='testseries__user_id_d43731_idx')],
+            },
+        ),
+    ]
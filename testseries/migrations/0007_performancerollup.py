@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 03:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0006_archivedattempt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('overall', 'Overall'), ('subject', 'Subject'), ('difficulty', 'Difficulty')], max_length=10)),
+                ('key', models.CharField(blank=True, help_text='Subject name or difficulty; blank for overall', max_length=100)),
+                ('tests_taken', models.PositiveIntegerField(default=0)),
+                ('attempted', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('wrong', models.PositiveIntegerField(default=0)),
+                ('marks', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('time_seconds', models.PositiveBigIntegerField(default=0)),
+                ('percentage_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('average_percentage', models.DecimalField(decimal_places=2, default=0.0, max_digits=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performance_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'key', 'average_percentage'], name='testseries__dimensi_c01c85_idx')],
+                'unique_together': {('user', 'dimension', 'key')},
+            },
+        ),
+    ]
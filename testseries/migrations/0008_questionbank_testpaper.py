@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0007_performancerollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('pools', models.JSONField(blank=True, default=dict, editable=False)),
+                ('pools_built_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='paper_per_candidate',
+            field=models.BooleanField(default=False, help_text='Generate a different paper for every candidate'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='subject_blueprint',
+            field=models.JSONField(blank=True, default=dict, help_text='Questions per subject code, e.g. {"PHY": 10, "CHEM": 10}'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='test',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='testseries.test'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='bank',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='testseries.questionbank'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='question_bank',
+            field=models.ForeignKey(blank=True, help_text='Draw papers from this bank instead of the questions attached to the test', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tests', to='testseries.questionbank'),
+        ),
+        migrations.CreateModel(
+            name='TestPaper',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_ids', models.JSONField(default=list)),
+                ('total_marks', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='papers', to='testseries.test')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='test_papers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('test', 'user')},
+            },
+        ),
+        migrations.AddField(
+            model_name='testattempt',
+            name='paper',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempts', to='testseries.testpaper'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-19 03:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0008_questionbank_testpaper'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Canonical question this one was merged into', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='testseries.question'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='minhash',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='QuestionLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='testseries.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='testseries__band_d58ccb_idx')],
+            },
+        ),
+    ]
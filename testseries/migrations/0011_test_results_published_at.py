@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0010_scorehistogram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='results_published_at',
+            field=models.DateTimeField(blank=True, help_text='When deferred results were released', null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+import uuid
+
+from django.db import migrations, models
+
+from testseries.keys import backfill_public_ids
+
+
+def copy_ids(apps, schema_editor):
+    backfill_public_ids(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0011_test_results_published_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='public_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='testattempt',
+            name='public_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
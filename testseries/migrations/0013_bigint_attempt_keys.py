@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+from testseries.keys import renumber_keys
+
+
+def renumber(apps, schema_editor):
+    # Usually already done in chunks by ``manage.py migrate_attempt_keys``
+    renumber_keys(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0012_testattempt_public_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber),
+        migrations.AlterField(
+            model_name='testattempt',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='studentanswer',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='testattemptlog',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='archivedattempt',
+            name='id',
+            field=models.UUIDField(editable=False, help_text='public_id of the original TestAttempt', primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 04:38
+
+import base.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0013_bigint_attempt_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='question_image',
+            field=models.ImageField(blank=True, null=True, storage=base.storage.content_storage, upload_to='questions/'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='solution_image',
+            field=models.ImageField(blank=True, null=True, storage=base.storage.content_storage, upload_to='solutions/'),
+        ),
+    ]
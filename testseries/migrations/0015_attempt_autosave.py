@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 04:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0014_content_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptAutosave',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='autosave', serialize=False, to='testseries.testattempt')),
+                ('answers', models.JSONField(default=dict, help_text='{form field: [values]}')),
+                ('saved_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0015_attempt_autosave'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedattempt',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict, help_text='Counts and score breakdowns the performance rollups are rebuilt from'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='archived_attempts',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='archived_correct',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
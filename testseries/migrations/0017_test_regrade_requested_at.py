@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0016_archived_attempt_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='regrade_requested_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Queued for `manage.py regrade_test` (see testseries/regrade.py)', null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 05:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def reset_pools(apps, schema_editor):
+    # Pools held id lists; they now hold sizes and are rebuilt into QuestionPoolEntry on next use
+    apps.get_model('testseries', 'QuestionBank').objects.update(pools={}, pools_built_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0017_test_regrade_requested_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionPoolEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.CharField(help_text='Difficulty or "*"', max_length=10)),
+                ('subject', models.CharField(help_text='Subject id, "0" (no subject) or "*"', max_length=20)),
+                ('position', models.PositiveIntegerField()),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pool_entries', to='testseries.questionbank')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='testseries.question')),
+            ],
+            options={
+                'unique_together': {('bank', 'difficulty', 'subject', 'position')},
+            },
+        ),
+        migrations.RunPython(reset_pools, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 05:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0018_question_pool_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('percentage', models.FloatField()),
+                ('sign', models.SmallIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_deltas', to='testseries.test')),
+            ],
+        ),
+    ]
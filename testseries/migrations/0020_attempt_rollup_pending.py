@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-19 05:21
+
+from django.db import migrations, models
+
+
+def mark_pending(apps, schema_editor):
+    # Submitted attempts of deferred tests not published yet are not in the rollups
+    apps.get_model('testseries', 'TestAttempt').objects.filter(
+        status='submitted', test__show_result_immediately=False, test__results_published_at__isnull=True,
+    ).update(rollup_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testseries', '0019_score_delta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='rollup_pending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+"""
+MinHash fingerprints of question text for near-duplicate detection.
+
+A question is reduced to word 3-gram shingles over its normalized text and
+option values. Its signature keeps, for each of ``NUM_PERM`` independent
+hash functions, the minimum hash over those shingles; two signatures agree
+in a slot with probability equal to the Jaccard similarity of the shingle
+sets. Signatures are ``array('I')`` values stored as fixed 256-byte blobs,
+and split into ``BANDS`` bands of ``ROWS`` slots for locality-sensitive
+hashing. Pure Python, no ORM access.
+"""
+import hashlib
+import re
+import struct
+from array import array
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# blake2b yields 64 bytes (16 slots) per call, so four salted calls fill a signature
+_SALTS = [i.to_bytes(16, 'little') for i in range(NUM_PERM // 16)]
+_SLOTS = struct.Struct('<16I')
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+_EMPTY = array('I', [0xFFFFFFFF] * NUM_PERM)
+
+_TAGS = re.compile(r'<[^>]+>')
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_words(text):
+    """Lower-cased words of ``text`` with markup and punctuation removed"""
+    return _NON_WORD.sub(' ', _TAGS.sub(' ', str(text or '')).lower()).split()
+
+
+def shingles(question_text, options=None):
+    """Word shingles of a question's text followed by its sorted option values"""
+    words = normalize_words(question_text)
+    if isinstance(options, dict):
+        for value in sorted(str(v) for v in options.values()):
+            words.extend(normalize_words(value))
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _token_hashes(token):
+    data = token.encode('utf-8')
+    values = []
+    for salt in _SALTS:
+        values.extend(_SLOTS.unpack(hashlib.blake2b(data, digest_size=64, salt=salt).digest()))
+    return values
+
+
+def signature(tokens):
+    """MinHash signature of a shingle set as an ``array('I')``"""
+    if not tokens:
+        return array('I', _EMPTY)
+    return array('I', map(min, zip(*map(_token_hashes, tokens))))
+
+
+def question_signature(question_text, options=None):
+    return signature(shingles(question_text, options))
+
+
+def to_bytes(sig):
+    return _SIGNATURE.pack(*sig)
+
+
+def from_bytes(data):
+    return array('I', _SIGNATURE.unpack(bytes(data)))
+
+
+def band_keys(sig):
+    """One signed 64-bit bucket key per band"""
+    data = to_bytes(sig)
+    width = ROWS * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(data[band * width:(band + 1) * width], digest_size=8, person=bytes([band])).digest(),
+            'little', signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
@@ -1,11 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from base.models import User
+from base.storage import content_storage
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 from video_courses.models import Category
 import uuid
 import json
+from decimal import Decimal
 
 class TestSeries(models.Model):
     DIFFICULTY_CHOICES = [
@@ -68,6 +70,20 @@ class TestSeries(models.Model):
         self.total_marks = sum(test.total_marks for test in tests)
         self.save(update_fields=['total_tests', 'total_questions', 'total_marks'])
 
+    def update_attempt_stats(self):
+        """Update attempt count and average score from submitted and archived attempts"""
+        totals = [
+            model.objects.filter(test__test_series=self, **filters).aggregate(
+                count=models.Count('pk'), marks=models.Sum('marks_obtained')
+            )
+            for model, filters in ((TestAttempt, {'status': 'submitted'}), (ArchivedAttempt, {}))
+        ]
+        count = sum(stats['count'] for stats in totals)
+        marks = sum(stats['marks'] or 0 for stats in totals)
+        self.total_attempts = count
+        self.average_score = round(marks / count, 2) if count else 0
+        self.save(update_fields=['total_attempts', 'average_score'])
+
 
 class Subject(models.Model):
     name = models.CharField(max_length=100)
@@ -81,6 +97,70 @@ class Subject(models.Model):
         return self.name
 
 
+class QuestionBank(models.Model):
+    """
+    Questions shared by reference across tests.
+
+    Questions are indexed by difficulty and subject in ``QuestionPoolEntry``
+    rows so papers are sampled without scanning the bank; ``pools`` only
+    holds the size of each pool:
+    ``{difficulty or "*": {subject id, "0" (no subject) or "*": count}}``.
+    Both are rebuilt lazily after questions change.
+    """
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    pools = models.JSONField(default=dict, blank=True, editable=False)
+    pools_built_at = models.DateTimeField(blank=True, null=True, editable=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def rebuild_pools(self):
+        """Re-index the bank's questions by difficulty/subject; returns the pool sizes"""
+        with transaction.atomic():
+            # One rebuild at a time; a concurrent caller reuses the result
+            bank = QuestionBank.objects.select_for_update().get(pk=self.pk)
+            if bank.pools_built_at is not None and bank.pools_built_at != self.pools_built_at:
+                self.pools, self.pools_built_at = bank.pools, bank.pools_built_at
+                return self.pools
+
+            QuestionPoolEntry.objects.filter(bank=self).delete()
+            pools, entries = {}, []
+            rows = self.questions.filter(duplicate_of__isnull=True).order_by('pk').values_list(
+                'id', 'difficulty', 'subject_id'
+            )
+            for question_id, difficulty, subject_id in rows.iterator(chunk_size=2000):
+                subject_key = str(subject_id or 0)
+                for d in (difficulty, '*'):
+                    for s in (subject_key, '*'):
+                        position = pools.setdefault(d, {}).get(s, 0)
+                        pools[d][s] = position + 1
+                        entries.append(QuestionPoolEntry(
+                            bank=self, difficulty=d, subject=s, position=position, question_id=question_id
+                        ))
+                if len(entries) >= 2000:
+                    QuestionPoolEntry.objects.bulk_create(entries)
+                    entries = []
+            QuestionPoolEntry.objects.bulk_create(entries)
+
+            self.pools = pools
+            self.pools_built_at = timezone.now()
+            self.save(update_fields=['pools', 'pools_built_at'])
+        return pools
+
+    def get_pools(self):
+        """Pool sizes, rebuilding the index first if questions changed"""
+        if self.pools_built_at is None:
+            return self.rebuild_pools()
+        return self.pools
+
+
 class Test(models.Model):
     test_series = models.ForeignKey(TestSeries, on_delete=models.CASCADE, related_name='tests')
     title = models.CharField(max_length=200)
@@ -97,9 +177,23 @@ class Test(models.Model):
     medium_questions = models.PositiveIntegerField(default=0)
     hard_questions = models.PositiveIntegerField(default=0)
     
+    # Question bank papers (difficulty counts above act as the blueprint)
+    question_bank = models.ForeignKey(
+        QuestionBank, on_delete=models.SET_NULL, null=True, blank=True, related_name='tests',
+        help_text="Draw papers from this bank instead of the questions attached to the test"
+    )
+    subject_blueprint = models.JSONField(
+        default=dict, blank=True, help_text='Questions per subject code, e.g. {"PHY": 10, "CHEM": 10}'
+    )
+    paper_per_candidate = models.BooleanField(default=False, help_text="Generate a different paper for every candidate")
+    
     # Settings
     shuffle_questions = models.BooleanField(default=True)
     show_result_immediately = models.BooleanField(default=True)
+    results_published_at = models.DateTimeField(blank=True, null=True, help_text="When deferred results were released")
+    regrade_requested_at = models.DateTimeField(
+        blank=True, null=True, editable=False, help_text="Queued for `manage.py regrade_test` (see testseries/regrade.py)"
+    )
     allow_review = models.BooleanField(default=True)
     max_attempts = models.PositiveIntegerField(default=1)
     
@@ -132,6 +226,12 @@ class Test(models.Model):
         
     def update_stats(self):
         """Update test statistics"""
+        if self.question_bank_id:
+            # Counts are the blueprint; marks follow the generated papers (see papers.py)
+            self.total_questions = self.easy_questions + self.medium_questions + self.hard_questions
+            self.total_marks = self.papers.aggregate(total=models.Max('total_marks'))['total'] or 0
+            self.save(update_fields=['total_questions', 'total_marks'])
+            return
         questions = self.questions.all()
         self.total_questions = questions.count()
         self.total_marks = sum(q.marks for q in questions)
@@ -165,14 +265,15 @@ class Question(models.Model):
         ('hard', 'Hard'),
     ]
     
-    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='questions')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='questions', null=True, blank=True)
+    bank = models.ForeignKey(QuestionBank, on_delete=models.CASCADE, related_name='questions', null=True, blank=True)
     subject = models.ForeignKey(Subject, on_delete=models.SET_NULL, null=True, blank=True)
     
     question_type = models.CharField(max_length=15, choices=QUESTION_TYPES, default='mcq_single')
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, default='medium')
     
     question_text = models.TextField()
-    question_image = models.ImageField(upload_to='questions/', blank=True, null=True)
+    question_image = models.ImageField(upload_to='questions/', storage=content_storage, blank=True, null=True)
     
     # Marking scheme
     marks = models.PositiveIntegerField(default=1)
@@ -189,12 +290,22 @@ class Question(models.Model):
     correct_answer = models.JSONField(default=dict, help_text="Store correct answer(s)")
     
     explanation = models.TextField(blank=True, help_text="Explanation for the answer")
-    solution_image = models.ImageField(upload_to='solutions/', blank=True, null=True)
+    solution_image = models.ImageField(upload_to='solutions/', storage=content_storage, blank=True, null=True)
     solution_video_url = models.URLField(blank=True, null=True, help_text="YouTube or video URL")
     
     # Analytics
     total_attempts = models.PositiveIntegerField(default=0)
     correct_attempts = models.PositiveIntegerField(default=0)
+    # Share of the above coming from archived attempts (see testseries.archive)
+    archived_attempts = models.PositiveIntegerField(default=0, editable=False)
+    archived_correct = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Near-duplicate detection (see testseries.minhash)
+    minhash = models.BinaryField(blank=True, null=True, editable=False)
+    duplicate_of = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates',
+        help_text="Canonical question this one was merged into"
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -212,6 +323,97 @@ class Question(models.Model):
             return 0
         return round((self.correct_attempts / self.total_attempts) * 100, 1)
 
+    def exact_counts(self):
+        """Return (total_attempts, correct_attempts) including deltas not yet flushed"""
+        from .counters import pending_question_stats
+        attempts, correct = pending_question_stats([self.pk]).get(self.pk, (0, 0))
+        return self.total_attempts + attempts, self.correct_attempts + correct
+
+    def save(self, *args, **kwargs):
+        from .dedup import fingerprint, store_buckets
+        update_fields = kwargs.get('update_fields')
+        refresh = update_fields is None or {'question_text', 'options'} & set(update_fields)
+        if refresh:
+            sig = fingerprint(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'minhash'}
+        super().save(*args, **kwargs)
+        if refresh:
+            store_buckets({self.pk: sig})
+        if self.bank_id:
+            QuestionBank.objects.filter(pk=self.bank_id).update(pools_built_at=None)
+
+    def delete(self, *args, **kwargs):
+        if self.bank_id:
+            QuestionBank.objects.filter(pk=self.bank_id).update(pools_built_at=None)
+        return super().delete(*args, **kwargs)
+
+
+class QuestionLSHBucket(models.Model):
+    """LSH band bucket of a question's MinHash signature"""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='lsh_buckets')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['band', 'bucket'])]
+
+    def __str__(self):
+        return f"Q{self.question_id} band {self.band}"
+
+
+class QuestionPoolEntry(models.Model):
+    """Position of a bank question in one difficulty/subject pool (see QuestionBank)"""
+    bank = models.ForeignKey(QuestionBank, on_delete=models.CASCADE, related_name='pool_entries')
+    difficulty = models.CharField(max_length=10, help_text='Difficulty or "*"')
+    subject = models.CharField(max_length=20, help_text='Subject id, "0" (no subject) or "*"')
+    position = models.PositiveIntegerField()
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ['bank', 'difficulty', 'subject', 'position']
+
+    def __str__(self):
+        return f"{self.bank.name} [{self.difficulty}/{self.subject}] #{self.position}"
+
+
+class TestPaper(models.Model):
+    """Question selection drawn from a bank for a test (per candidate or shared)"""
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='papers')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='test_papers')
+    question_ids = models.JSONField(default=list)
+    total_marks = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['test', 'user']
+
+    def __str__(self):
+        owner = self.user.get_username() if self.user_id else 'shared'
+        return f"{self.test.title} - paper ({owner})"
+
+    def get_questions(self):
+        """Questions of the paper in their drawn order"""
+        questions = Question.objects.select_related('subject').in_bulk(self.question_ids)
+        return [questions[pk] for pk in self.question_ids if pk in questions]
+
+
+class QuestionStatDelta(models.Model):
+    """
+    Append-only log of pending Question analytics increments.
+
+    Submissions insert rows here instead of updating the hot Question rows;
+    ``testseries.counters.flush_question_stats`` folds them into Question.
+    """
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='stat_deltas')
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Q{self.question_id}: +{self.attempts}/{self.correct}"
+
 
 class TestAttempt(models.Model):
     STATUS_CHOICES = [
@@ -222,9 +424,11 @@ class TestAttempt(models.Model):
         ('expired', 'Expired'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Sequential key internally; the random public id is what appears in URLs
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='test_attempts')
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='attempts')
+    paper = models.ForeignKey(TestPaper, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempts')
     
     # Attempt Info
     attempt_number = models.PositiveIntegerField(default=1)
@@ -257,6 +461,9 @@ class TestAttempt(models.Model):
     # Rank (if applicable)
     rank = models.PositiveIntegerField(blank=True, null=True)
     percentile = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
+
+    # Graded while results were deferred, not in the rollups until publication
+    rollup_pending = models.BooleanField(default=False)
     
     is_reviewed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -303,11 +510,38 @@ class TestAttempt(models.Model):
         
         self.save(update_fields=['rank', 'percentile'])
 
+    def get_questions(self):
+        """Questions served in this attempt: its bank paper or the test's own"""
+        if self.paper_id:
+            return self.paper.get_questions()
+        return list(self.test.questions.select_related('subject'))
+
+    # Set on attempts rehydrated from cold storage (see testseries.archive)
+    archived_answers = None
+
+    @property
+    def is_archived(self):
+        return self.archived_answers is not None
+
+    def get_student_answers(self):
+        """
+        Answers of this attempt ordered by question, whichever storage mode
+        was used to save them (packed sheet, StudentAnswer rows or archive)
+        """
+        if self.archived_answers is not None:
+            return self.archived_answers
+        try:
+            sheet = self.answer_sheet
+        except AttemptAnswerSheet.DoesNotExist:
+            return list(
+                self.student_answers.select_related('question', 'question__subject').order_by('question__order')
+            )
+        return sheet.student_answers()
+
 
 class StudentAnswer(models.Model):
     """Stores individual answers for each question in a test attempt"""
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     attempt = models.ForeignKey(TestAttempt, on_delete=models.CASCADE, related_name='student_answers')
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='student_answers')
     
@@ -369,6 +603,232 @@ class StudentAnswer(models.Model):
         return "N/A"
 
 
+class AttemptAnswerSheet(models.Model):
+    """
+    All answers of one attempt packed into a single binary record.
+
+    Alternative to one StudentAnswer row per question, enabled with
+    ``TESTSERIES_ANSWER_STORAGE = 'packed'``. See ``testseries.packing`` for
+    the encoding.
+    """
+
+    attempt = models.OneToOneField(TestAttempt, on_delete=models.CASCADE, primary_key=True, related_name='answer_sheet')
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Answer sheet - {self.attempt_id}"
+
+    def entries(self):
+        from .packing import unpack_answers
+        return unpack_answers(self.data)
+
+    def student_answers(self):
+        """Unsaved StudentAnswer objects so templates keep using the same API"""
+        entries = self.entries()
+        questions = Question.objects.select_related('subject').in_bulk(
+            [entry['question_id'] for entry in entries]
+        )
+        answers = []
+        for entry in entries:
+            question = questions.get(entry['question_id'])
+            if question is None:
+                continue
+            answers.append(StudentAnswer(
+                id=None,
+                attempt=self.attempt,
+                question=question,
+                selected_answer=entry['selected_answer'],
+                is_correct=entry['is_correct'],
+                marks_obtained=Decimal(str(entry['marks'])),
+                time_spent=entry['time_spent'],
+                is_marked_for_review=entry['is_marked_for_review'],
+                is_attempted=entry['is_attempted'],
+            ))
+        answers.sort(key=lambda a: (a.question.order, a.question.created_at))
+        return answers
+
+
+class AttemptAutosave(models.Model):
+    """
+    Latest autosaved answers of an open attempt, kept in the database so a
+    late or timer-expiry submit, or batch finalization, grades them from any
+    worker or process. Removed when the attempt is submitted.
+    """
+
+    attempt = models.OneToOneField(TestAttempt, on_delete=models.CASCADE, primary_key=True, related_name='autosave')
+    answers = models.JSONField(default=dict, help_text="{form field: [values]}")
+    saved_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Autosave - {self.attempt_id}"
+
+
+class ArchivedAttempt(models.Model):
+    """
+    Index entry of an attempt moved to a compressed archive file.
+
+    Each attempt is stored as its own gzip member inside a partition file, so
+    it can be rehydrated by reading ``length`` bytes at ``offset``.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False, help_text="public_id of the original TestAttempt")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_test_attempts')
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='archived_attempts')
+    attempt_number = models.PositiveIntegerField(default=1)
+    marks_obtained = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    percentage_score = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    submitted_at = models.DateTimeField(blank=True, null=True)
+    summary = models.JSONField(
+        default=dict, blank=True,
+        help_text="Counts and score breakdowns the performance rollups are rebuilt from"
+    )
+
+    # Location inside the archive
+    path = models.CharField(max_length=255, help_text="Relative to ATTEMPT_ARCHIVE_ROOT")
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-submitted_at']
+        indexes = [
+            models.Index(fields=['user', 'test']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.get_username()} - {self.test.title} (Attempt {self.attempt_number}, archived)"
+
+
+class PerformanceRollup(models.Model):
+    """
+    Running per-user totals, updated incrementally every time an attempt is
+    graded. One ``overall`` row per user plus one row per subject and per
+    difficulty, so the progress dashboard reads a handful of rows no matter
+    how many attempts the user has.
+    """
+
+    DIMENSION_CHOICES = [
+        ('overall', 'Overall'),
+        ('subject', 'Subject'),
+        ('difficulty', 'Difficulty'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='performance_rollups')
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True, help_text="Subject name or difficulty; blank for overall")
+
+    tests_taken = models.PositiveIntegerField(default=0)
+    attempted = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    wrong = models.PositiveIntegerField(default=0)
+    marks = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    time_seconds = models.PositiveBigIntegerField(default=0)
+
+    # Overall rows only: sum and mean of percentage_score, for cohort percentiles
+    percentage_total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    average_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'dimension', 'key']
+        indexes = [
+            models.Index(fields=['dimension', 'key', 'average_percentage']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.get_username()} - {self.dimension} {self.key}".strip()
+
+    @property
+    def accuracy(self):
+        if self.attempted == 0:
+            return 0
+        return round((self.correct / self.attempted) * 100, 1)
+
+
+class ScoreHistogram(models.Model):
+    """
+    Distribution of percentage scores of a test, kept up to date as attempts
+    are graded. ``buckets`` holds ``BUCKETS`` counts of equal width over
+    0-100%; the running sums give the mean and standard deviation.
+    """
+
+    BUCKETS = 20
+
+    test = models.OneToOneField(Test, on_delete=models.CASCADE, primary_key=True, related_name='score_histogram')
+    buckets = models.JSONField(default=list)
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)
+    total_squares = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.test.title} - score histogram"
+
+    @classmethod
+    def bucket_of(cls, percentage):
+        return min(cls.BUCKETS - 1, max(0, int(float(percentage) * cls.BUCKETS // 100)))
+
+    def add(self, percentage, sign=1):
+        """Count (or with ``sign=-1`` uncount) one score"""
+        if len(self.buckets) != self.BUCKETS:
+            self.buckets = [0] * self.BUCKETS
+        percentage = float(percentage)
+        bucket = self.bucket_of(percentage)
+        self.buckets[bucket] = max(0, self.buckets[bucket] + sign)
+        self.count = max(0, self.count + sign)
+        self.total += sign * percentage
+        self.total_squares += sign * percentage * percentage
+
+    @property
+    def mean(self):
+        if not self.count:
+            return 0
+        return round(self.total / self.count, 2)
+
+    @property
+    def std_dev(self):
+        if not self.count:
+            return 0
+        variance = max(0.0, self.total_squares / self.count - (self.total / self.count) ** 2)
+        return round(variance ** 0.5, 2)
+
+    def percent_below(self, percentage):
+        """
+        Share of scores below ``percentage``, interpolating linearly inside
+        its bucket
+        """
+        if not self.count:
+            return None
+        width = 100 / self.BUCKETS
+        percentage = float(percentage)
+        bucket = self.bucket_of(percentage)
+        fraction = min(1.0, (percentage - bucket * width) / width)
+        below = sum(self.buckets[:bucket]) + self.buckets[bucket] * fraction
+        return round(min(100.0, below / self.count * 100), 1)
+
+
+class ScoreDelta(models.Model):
+    """
+    Append-only log of scores not yet counted in their test's ScoreHistogram.
+
+    Submissions and regrades insert rows here instead of locking the
+    histogram row; ``testseries.histograms.flush_score_histograms`` folds
+    them in.
+    """
+
+    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='score_deltas')
+    percentage = models.FloatField()
+    sign = models.SmallIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Test {self.test_id}: {'+' if self.sign > 0 else '-'}{self.percentage}%"
+
+
 class TestAttemptLog(models.Model):
     """Logs all activities during a test attempt for security and analytics"""
     
@@ -385,7 +845,6 @@ class TestAttemptLog(models.Model):
         ('auto_submitted', 'Auto Submitted (Time Up)'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     attempt = models.ForeignKey(TestAttempt, on_delete=models.CASCADE, related_name='activity_logs')
     question = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -0,0 +1,110 @@
+"""
+Compact binary encoding of all answers of one attempt.
+
+Layout (little-endian)::
+
+    header      version (u8), question count n (u32)
+    question_id n x u32
+    marks       n x i32   (hundredths of a mark)
+    time_spent  n x u32   (seconds)
+    attempted   ceil(n/8) bitmap
+    correct     ceil(n/8) bitmap
+    review      ceil(n/8) bitmap
+    answers     zlib-compressed JSON list of selected_answer dicts
+
+Pure Python, no ORM access, so worker processes can decode and re-encode
+sheets during a regrade.
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<BI')
+
+
+def _to_bytes(values, typecode):
+    arr = array(typecode, values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_bytes(data, typecode):
+    arr = array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+def _bitmap(flags):
+    bits = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+
+def _flags(bits, n):
+    return [bool(bits[i >> 3] & (1 << (i & 7))) for i in range(n)]
+
+
+def pack_answers(entries):
+    """
+    Encode a list of answer entries into bytes.
+
+    Each entry is a dict with ``question_id``, ``selected_answer``,
+    ``is_attempted``, ``is_correct``, ``marks``, ``time_spent`` and
+    ``is_marked_for_review``.
+    """
+    n = len(entries)
+    answers = json.dumps([e['selected_answer'] or {} for e in entries], separators=(',', ':'))
+    return b''.join([
+        _HEADER.pack(FORMAT_VERSION, n),
+        _to_bytes([e['question_id'] for e in entries], 'I'),
+        _to_bytes([int(round(float(e['marks']) * 100)) for e in entries], 'i'),
+        _to_bytes([int(e.get('time_spent') or 0) for e in entries], 'I'),
+        _bitmap([e['is_attempted'] for e in entries]),
+        _bitmap([e['is_correct'] for e in entries]),
+        _bitmap([e.get('is_marked_for_review', False) for e in entries]),
+        zlib.compress(answers.encode('utf-8')),
+    ])
+
+
+def unpack_answers(data):
+    """Decode bytes produced by ``pack_answers`` back into a list of entries"""
+    data = bytes(data)
+    version, n = _HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported answer sheet version {version}")
+
+    offset = _HEADER.size
+    fields = {}
+    for name, typecode in (('question_id', 'I'), ('marks', 'i'), ('time_spent', 'I')):
+        size = n * array(typecode).itemsize
+        fields[name] = _from_bytes(data[offset:offset + size], typecode)
+        offset += size
+
+    bitmap_size = (n + 7) // 8
+    for name in ('is_attempted', 'is_correct', 'is_marked_for_review'):
+        fields[name] = _flags(data[offset:offset + bitmap_size], n)
+        offset += bitmap_size
+
+    answers = json.loads(zlib.decompress(data[offset:]).decode('utf-8'))
+
+    return [
+        {
+            'question_id': fields['question_id'][i],
+            'selected_answer': answers[i],
+            'is_attempted': fields['is_attempted'][i],
+            'is_correct': fields['is_correct'][i],
+            'marks': fields['marks'][i] / 100,
+            'time_spent': fields['time_spent'][i],
+            'is_marked_for_review': fields['is_marked_for_review'][i],
+        }
+        for i in range(n)
+    ]
@@ -0,0 +1,151 @@
+"""
+Paper generation from shared question banks.
+
+A test linked to a QuestionBank has no questions of its own; its
+``easy/medium/hard_questions`` counts and ``subject_blueprint`` describe the
+paper instead. Papers are drawn by sampling positions in the bank's indexed
+pools (``QuestionPoolEntry``) and fetching just those rows, so building one
+costs O(k) in the paper size rather than a scan of the bank. Questions are
+referenced, never copied.
+
+The test's ``total_marks`` follows its papers: the shared paper's total,
+or the highest total drawn so far for per-candidate papers.
+"""
+import random
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+
+from .models import Question, QuestionBank, QuestionPoolEntry, Subject, TestPaper
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+class BlueprintError(ValueError):
+    """The bank cannot satisfy the test's blueprint"""
+
+
+def blueprint(test):
+    """Return ``(difficulty_targets, subject_targets)`` of a bank-driven test"""
+    difficulty_targets = {
+        d: n for d, n in (
+            ('easy', test.easy_questions),
+            ('medium', test.medium_questions),
+            ('hard', test.hard_questions),
+        ) if n
+    }
+    subject_targets = {}
+    if test.subject_blueprint:
+        subjects = dict(
+            Subject.objects.filter(code__in=list(test.subject_blueprint)).values_list('code', 'id')
+        )
+        missing = set(test.subject_blueprint) - set(subjects)
+        if missing:
+            raise BlueprintError(f"Unknown subject code(s): {', '.join(sorted(missing))}")
+        subject_targets = {
+            str(subjects[code]): int(n) for code, n in test.subject_blueprint.items() if int(n)
+        }
+    return difficulty_targets, subject_targets
+
+
+def allocate(pools, difficulty_targets, subject_targets):
+    """
+    Split the blueprint into ``{(difficulty, subject): count}`` pool draws.
+
+    With both targets set every subject is spread over the difficulties,
+    scarcest subjects first, without exceeding any pool.
+    """
+    def available(d, s):
+        return pools.get(d, {}).get(s, 0)
+
+    if not difficulty_targets and not subject_targets:
+        raise BlueprintError("The test has no question blueprint")
+    if not subject_targets:
+        cells = {(d, '*'): n for d, n in difficulty_targets.items()}
+    elif not difficulty_targets:
+        cells = {('*', s): n for s, n in subject_targets.items()}
+    else:
+        if sum(difficulty_targets.values()) != sum(subject_targets.values()):
+            raise BlueprintError("Subject and difficulty blueprints ask for different question counts")
+        remaining = dict(difficulty_targets)
+        cells = {}
+        for s in sorted(subject_targets, key=lambda s: available('*', s)):
+            wanted = subject_targets[s]
+            for d in sorted(remaining, key=lambda d: available(d, s)):
+                take = min(wanted, remaining[d], available(d, s))
+                if take:
+                    cells[(d, s)] = take
+                    remaining[d] -= take
+                    wanted -= take
+            if wanted:
+                raise BlueprintError(f"Not enough questions for subject {s} within the difficulty mix")
+
+    for (d, s), n in cells.items():
+        if available(d, s) < n:
+            raise BlueprintError(f"The bank has {available(d, s)} {d} question(s) for subject {s}, {n} needed")
+    return cells
+
+
+def draw_questions(bank, pools, cells, rng):
+    """Sample question ids for each allocated pool, reading only the drawn entries"""
+    question_ids = []
+    for (d, s), n in sorted(cells.items()):
+        positions = rng.sample(range(pools[d][s]), n)
+        drawn = dict(
+            QuestionPoolEntry.objects.filter(
+                bank=bank, difficulty=d, subject=s, position__in=positions
+            ).values_list('position', 'question_id')
+        )
+        question_ids.extend(drawn[position] for position in positions)
+    return question_ids
+
+
+def get_paper(test, user=None):
+    """
+    The paper ``user`` should sit for ``test``, generated on first use.
+
+    Per-candidate papers are seeded by test and user so a regenerated paper
+    is the same draw; otherwise one shared paper is kept for the test.
+    """
+    owner = user if test.paper_per_candidate else None
+    paper = TestPaper.objects.filter(test=test, user=owner).first()
+    if paper is not None:
+        return paper
+
+    bank = test.question_bank
+    targets = blueprint(test)
+    for retry in (False, True):
+        pools = bank.get_pools()
+        cells = allocate(pools, *targets)
+        rng = random.Random(f"{test.pk}:{owner.pk if owner else 'shared'}")
+        try:
+            question_ids = draw_questions(bank, pools, cells, rng)
+            break
+        except KeyError:
+            if retry:
+                raise
+            # Questions deleted in bulk (no delete() call) left gaps: re-index and draw again
+            QuestionBank.objects.filter(pk=bank.pk).update(pools_built_at=None)
+            bank.pools_built_at = None
+    total_marks = Question.objects.filter(pk__in=question_ids).aggregate(Sum('marks'))['marks__sum'] or 0
+
+    try:
+        with transaction.atomic():
+            paper = TestPaper.objects.create(
+                test=test, user=owner, question_ids=question_ids, total_marks=total_marks
+            )
+    except IntegrityError:
+        # Generated concurrently by another request
+        return TestPaper.objects.get(test=test, user=owner)
+    if paper.total_marks > test.total_marks or owner is None:
+        test.update_stats()
+        test.test_series.update_stats()
+    return paper
+
+
+def test_questions(test):
+    """Every question a test can serve: its own plus those of its papers"""
+    paper_ids = set()
+    for question_ids in test.papers.values_list('question_ids', flat=True):
+        paper_ids.update(question_ids)
+    return Question.objects.filter(Q(test=test) | Q(pk__in=paper_ids))
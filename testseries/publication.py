@@ -0,0 +1,129 @@
+"""
+Deferred release of results for tests with ``show_result_immediately`` off.
+
+When the test window closes, ``publish_results`` finalizes the attempts
+still open, assigns ranks and percentiles from one sort of the cohort's
+scores and writes them back in bulk. It then flips the published flag,
+which result views read from the cache, posts one notification for the
+whole cohort and adds the cohort to the progress rollups, which skip
+attempts graded while the results were deferred.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from base.models import Notification
+
+from .deadlines import deadline_for, saved_answers
+from .models import Test, TestAttempt
+from .rollups import fold_pending_attempts
+from .submission import submit_attempt
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_TYPE = 'test_results'
+
+
+def _published_key(test_id):
+    return f"test_results_published:{test_id}"
+
+
+def results_published(test):
+    """Whether candidates may see their results for ``test``"""
+    if test.show_result_immediately:
+        return True
+    published = cache.get(_published_key(test.pk))
+    if published is None:
+        published = Test.objects.filter(pk=test.pk, results_published_at__isnull=False).exists()
+        # Unpublished tests are re-checked shortly; published ones stay published
+        cache.set(_published_key(test.pk), published, None if published else 60)
+    return published
+
+
+def _autosave_of(attempt):
+    return lambda: MultiValueDict(saved_answers(attempt) or {})
+
+
+def finalize_open_attempts(test, now):
+    """
+    Grade attempts still open when the window closed with their last
+    autosave (stored in the database, so this works from cron). Each one is
+    graded under a row lock; attempts a candidate submitted meanwhile are
+    skipped.
+    """
+    finalized = 0
+    attempts = TestAttempt.objects.filter(
+        test=test, status__in=['started', 'in_progress']
+    ).select_related('test__test_series', 'paper')
+    for attempt in attempts.iterator(chunk_size=200):
+        deadline = deadline_for(attempt)
+        if test.end_time:
+            deadline = min(deadline, test.end_time)
+        if submit_attempt(attempt, _autosave_of(attempt), min(now, deadline), update_series=False):
+            finalized += 1
+    return finalized
+
+
+def assign_ranks(test):
+    """Competition-rank every submitted attempt of ``test`` in one pass"""
+    rows = list(
+        TestAttempt.objects.filter(test=test, status='submitted')
+        .order_by('-marks_obtained').values_list('pk', 'marks_obtained')
+    )
+    total = len(rows)
+    attempts = []
+    rank = 0
+    previous = None
+    for position, (pk, marks) in enumerate(rows, start=1):
+        if marks != previous:
+            rank, previous = position, marks
+        attempts.append(TestAttempt(
+            pk=pk, rank=rank, percentile=round((total - rank + 1) / total * 100, 2)
+        ))
+    TestAttempt.objects.bulk_update(attempts, ['rank', 'percentile'], batch_size=1000)
+    return total
+
+
+def publish_results(test, now=None):
+    """Finalize, rank and release the results of ``test``; returns a report dict"""
+    now = now or timezone.now()
+    finalized = finalize_open_attempts(test, now)
+
+    with transaction.atomic():
+        ranked = assign_ranks(test)
+        Test.objects.filter(pk=test.pk).update(results_published_at=now)
+        test.results_published_at = now
+        Notification.objects.create(
+            notification_type='announcement',
+            title=f"📊 Results published: {test.title}",
+            message=f"Results for '{test.title}' are out. Check your score, rank and percentile.",
+            link=reverse('front_exam_series_detail', args=[test.test_series_id]),
+            related_object_type=NOTIFICATION_TYPE,
+            related_object_id=test.pk,
+            target_group=f"test:{test.pk}",
+            expires_at=now + timedelta(days=30),
+        )
+
+    # After the flag is committed: a submission that still read the test as
+    # unpublished either commits before this and is folded here, or after
+    # it and folds itself (see submission.py)
+    folded = fold_pending_attempts(TestAttempt.objects.filter(test=test))
+
+    test.test_series.update_attempt_stats()
+    cache.set(_published_key(test.pk), True, None)
+    logger.info(f"Published results of test {test.pk}: {ranked} attempts ranked, {finalized} finalized, {folded} added to rollups")
+    return {'ranked': ranked, 'finalized': finalized}
+
+
+def due_tests(now=None):
+    """Closed tests with deferred results that have not been published yet"""
+    return Test.objects.filter(
+        show_result_immediately=False,
+        results_published_at__isnull=True,
+        end_time__lte=now or timezone.now(),
+    ).select_related('test_series')
@@ -0,0 +1,209 @@
+"""
+Bulk re-scoring of stored attempts after an answer-key correction.
+
+Attempts are read in primary-key chunks, graded in a process pool through the
+shared grading engine, and written back with ``bulk_update``.
+
+A regrade takes minutes on large tests, so the admin only queues it
+(``Test.regrade_requested_at``); ``manage.py regrade_test`` run from cron
+works through the queue.
+"""
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .counters import add_question_stats
+from .grading import question_snapshot, regrade_chunk
+from .models import AttemptAnswerSheet, StudentAnswer, Test, TestAttempt
+from .histograms import record_score_changes
+from .papers import test_questions
+from .rollups import apply_rollup_deltas, summary_deltas
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+ATTEMPT_FIELDS = [
+    'attempted_questions', 'correct_answers', 'wrong_answers', 'marks_obtained',
+    'percentage_score', 'passed', 'subject_wise_score', 'difficulty_wise_score',
+]
+
+
+def _attempt_chunks(test, chunk_size):
+    """Yield grading payloads for submitted attempts, ``chunk_size`` at a time"""
+    attempts = TestAttempt.objects.filter(test=test, status='submitted')
+    last_pk = None
+    while True:
+        page = attempts.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        rows = list(page.values_list('pk', 'total_marks', 'user_id', *ATTEMPT_FIELDS)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+
+        answers = {}
+        answer_rows = StudentAnswer.objects.filter(
+            attempt_id__in=[row[0] for row in rows]
+        ).values_list('attempt_id', 'id', 'question_id', 'selected_answer', 'is_attempted', 'is_correct')
+        for attempt_id, *row in answer_rows.iterator(chunk_size=2000):
+            answers.setdefault(attempt_id, []).append(tuple(row))
+
+        sheets = dict(
+            AttemptAnswerSheet.objects.filter(
+                attempt_id__in=[row[0] for row in rows]
+            ).values_list('attempt_id', 'data')
+        )
+
+        payload = [
+            (pk, float(total_marks), answers.get(pk, []), bytes(sheets[pk]) if pk in sheets else None)
+            for pk, total_marks, *_ in rows
+        ]
+        # Old user and scores, to report changes and adjust progress rollups
+        previous = {
+            row[0]: (row[2], dict(zip(ATTEMPT_FIELDS, row[3:])))
+            for row in rows
+        }
+        yield payload, previous
+
+
+def _write_chunk(test_id, chunk, previous, report, in_rollups=True):
+    """
+    Persist one graded chunk and fold its score changes into ``report``, the
+    question counters, the score histogram and the rollups (unless the
+    test's results are still deferred)
+    """
+    graded, tallies = chunk
+
+    attempts = []
+    answers = []
+    sheets = []
+    rollup_deltas = {}
+    score_changes = []
+    for attempt_id, summary, answer_results, sheet in graded:
+        user_id, old_summary = previous[attempt_id]
+        summary_deltas(rollup_deltas, user_id, old_summary, sign=-1)
+        summary_deltas(rollup_deltas, user_id, summary)
+        score_changes.append((old_summary['percentage_score'], summary['percentage_score']))
+
+        attempt = TestAttempt(pk=attempt_id)
+        for field in ATTEMPT_FIELDS:
+            setattr(attempt, field, summary[field])
+        attempts.append(attempt)
+
+        for answer_id, is_attempted, is_correct, marks in answer_results:
+            answers.append(StudentAnswer(
+                pk=answer_id,
+                is_attempted=is_attempted,
+                is_correct=is_correct,
+                marks_obtained=Decimal(str(round(marks, 2))),
+            ))
+
+        if sheet is not None:
+            sheets.append(AttemptAnswerSheet(attempt_id=attempt_id, data=sheet))
+
+        delta = Decimal(str(summary['marks_obtained'])) - old_summary['marks_obtained']
+        report['attempts'] += 1
+        if delta:
+            report['changed'] += 1
+            report['total_delta'] += delta
+            report['max_gain'] = max(report['max_gain'], delta)
+            report['max_loss'] = min(report['max_loss'], delta)
+
+    with transaction.atomic():
+        TestAttempt.objects.bulk_update(attempts, ATTEMPT_FIELDS, batch_size=500)
+        StudentAnswer.objects.bulk_update(
+            answers, ['is_attempted', 'is_correct', 'marks_obtained'], batch_size=1000
+        )
+        AttemptAnswerSheet.objects.bulk_update(sheets, ['data'], batch_size=500)
+        # Relative to what the attempts counted before, so concurrent
+        # submissions and their pending deltas are left alone
+        add_question_stats(tallies)
+        record_score_changes(test_id, score_changes)
+        if in_rollups:
+            apply_rollup_deltas(rollup_deltas)
+    report['answers'] += len(answers)
+
+
+def regrade_test(test, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Re-score every submitted attempt of ``test`` against its current answer key.
+
+    ``workers`` defaults to the CPU count; ``workers=1`` grades in-process.
+    Returns a report dict with the number of attempts and answers rewritten
+    and the score changes.
+    """
+    test_series = test.test_series
+    questions = [
+        question_snapshot(q) for q in test_questions(test).select_related('subject')
+    ]
+    negative_marking = test_series.has_negative_marking
+    pass_percentage = test_series.pass_percentage
+    workers = workers or os.cpu_count() or 1
+    # Deferred results join the rollups when published (see publication.py)
+    in_rollups = test.show_result_immediately or test.results_published_at is not None
+
+    report = {
+        'attempts': 0,
+        'answers': 0,
+        'changed': 0,
+        'total_delta': Decimal('0'),
+        'max_gain': Decimal('0'),
+        'max_loss': Decimal('0'),
+    }
+
+    chunks = _attempt_chunks(test, chunk_size)
+    if workers == 1:
+        for payload, previous in chunks:
+            graded = regrade_chunk(questions, negative_marking, pass_percentage, payload)
+            _write_chunk(test.pk, graded, previous, report, in_rollups)
+    else:
+        # Keep a bounded window of chunks in flight so memory stays flat
+        # regardless of how many attempts the test has.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pending = deque()
+            for payload, previous in chunks:
+                future = pool.submit(
+                    regrade_chunk, questions, negative_marking, pass_percentage, payload
+                )
+                pending.append((future, previous))
+                if len(pending) >= workers * 2:
+                    future, previous = pending.popleft()
+                    _write_chunk(test.pk, future.result(), previous, report, in_rollups)
+            while pending:
+                future, previous = pending.popleft()
+                _write_chunk(test.pk, future.result(), previous, report, in_rollups)
+
+    test_series.update_attempt_stats()
+
+    logger.info(
+        f"Regraded test {test.pk}: {report['attempts']} attempts, "
+        f"{report['changed']} changed, total delta {report['total_delta']}"
+    )
+    return report
+
+
+# ---------------------------------------------
+# Queue
+# ---------------------------------------------
+def queue_regrade(tests):
+    """Ask the next ``regrade_test`` run to regrade ``tests``; returns how many were queued"""
+    return Test.objects.filter(pk__in=[test.pk for test in tests]).update(regrade_requested_at=timezone.now())
+
+
+def run_queued_regrades(workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Regrade every queued test, oldest request first; yields ``(test, report)``"""
+    queued = Test.objects.filter(regrade_requested_at__isnull=False).select_related('test_series')
+    for test in queued.order_by('regrade_requested_at'):
+        requested = test.regrade_requested_at
+        report = regrade_test(test, workers=workers, chunk_size=chunk_size)
+        # Keep a request made while this run was grading
+        Test.objects.filter(pk=test.pk, regrade_requested_at=requested).update(regrade_requested_at=None)
+        yield test, report
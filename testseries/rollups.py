@@ -0,0 +1,205 @@
+"""
+Incremental per-user performance rollups.
+
+Grading adds each attempt's totals to PerformanceRollup rows (overall, per
+subject, per difficulty) instead of re-scanning attempts on every dashboard
+view. Regrades apply the difference between the old and new score.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ArchivedAttempt, PerformanceRollup, TestAttempt
+
+# attempted, correct, wrong, marks, time_seconds, tests_taken, percentage_total
+_EMPTY = (0, 0, 0, Decimal('0'), 0, 0, Decimal('0'))
+
+
+def _add(deltas, key, attempted=0, correct=0, wrong=0, marks=0, time_seconds=0, tests_taken=0, percentage=0):
+    current = deltas.get(key, _EMPTY)
+    deltas[key] = (
+        current[0] + attempted,
+        current[1] + correct,
+        current[2] + wrong,
+        current[3] + Decimal(str(marks)),
+        current[4] + time_seconds,
+        current[5] + tests_taken,
+        current[6] + Decimal(str(percentage)),
+    )
+
+
+def summary_deltas(deltas, user_id, summary, sign=1):
+    """
+    Fold the score fields of one graded attempt into ``deltas``.
+
+    ``summary`` uses the TestAttempt field names; pass ``sign=-1`` to remove
+    a previously counted score.
+    """
+    _add(
+        deltas, (user_id, 'overall', ''),
+        attempted=sign * summary['attempted_questions'],
+        correct=sign * summary['correct_answers'],
+        wrong=sign * summary['wrong_answers'],
+        marks=sign * Decimal(str(summary['marks_obtained'])),
+        percentage=sign * Decimal(str(summary['percentage_score'])),
+    )
+    for dimension, breakdown in (('subject', summary['subject_wise_score']),
+                                 ('difficulty', summary['difficulty_wise_score'])):
+        for key, scores in (breakdown or {}).items():
+            _add(
+                deltas, (user_id, dimension, key[:100]),
+                attempted=sign * (scores.get('correct', 0) + scores.get('wrong', 0)),
+                correct=sign * scores.get('correct', 0),
+                wrong=sign * scores.get('wrong', 0),
+                marks=sign * Decimal(str(round(scores.get('marks', 0), 2))),
+            )
+    return deltas
+
+
+def apply_rollup_deltas(deltas):
+    """Add ``{(user_id, dimension, key): totals}`` to the rollup rows"""
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        PerformanceRollup.objects.bulk_create(
+            [PerformanceRollup(user_id=u, dimension=d, key=k) for u, d, k in deltas],
+            ignore_conflicts=True,
+        )
+        # Lock the rows so concurrent gradings for the same user serialize
+        rows = PerformanceRollup.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _, _ in deltas}
+        )
+        changed = []
+        for row in rows:
+            delta = deltas.get((row.user_id, row.dimension, row.key))
+            if delta is None:
+                continue
+            attempted, correct, wrong, marks, time_seconds, tests_taken, percentage = delta
+            row.attempted = max(0, row.attempted + attempted)
+            row.correct = max(0, row.correct + correct)
+            row.wrong = max(0, row.wrong + wrong)
+            row.marks += marks
+            row.time_seconds = max(0, row.time_seconds + time_seconds)
+            row.tests_taken = max(0, row.tests_taken + tests_taken)
+            row.percentage_total += percentage
+            if row.tests_taken:
+                row.average_percentage = round(row.percentage_total / row.tests_taken, 2)
+            changed.append(row)
+        PerformanceRollup.objects.bulk_update(changed, [
+            'attempted', 'correct', 'wrong', 'marks', 'time_seconds', 'tests_taken',
+            'percentage_total', 'average_percentage',
+        ])
+
+
+def _attempt_deltas(deltas, attempt):
+    summary_deltas(deltas, attempt.user_id, {
+        'attempted_questions': attempt.attempted_questions,
+        'correct_answers': attempt.correct_answers,
+        'wrong_answers': attempt.wrong_answers,
+        'marks_obtained': attempt.marks_obtained,
+        'percentage_score': attempt.percentage_score,
+        'subject_wise_score': attempt.subject_wise_score,
+        'difficulty_wise_score': attempt.difficulty_wise_score,
+    })
+    time_seconds = int(attempt.time_spent.total_seconds()) if attempt.time_spent else 0
+    _add(deltas, (attempt.user_id, 'overall', ''), time_seconds=time_seconds, tests_taken=1)
+
+
+def record_attempt(attempt):
+    """Add a freshly graded attempt to its user's rollups"""
+    deltas = {}
+    _attempt_deltas(deltas, attempt)
+    apply_rollup_deltas(deltas)
+
+
+def _archived_deltas(deltas, archived):
+    from .archive import archived_summary
+
+    summary = archived_summary(archived)
+    summary_deltas(deltas, archived.user_id, {
+        'attempted_questions': summary['attempted_questions'],
+        'correct_answers': summary['correct_answers'],
+        'wrong_answers': summary['wrong_answers'],
+        'marks_obtained': archived.marks_obtained,
+        'percentage_score': archived.percentage_score,
+        'subject_wise_score': summary['subject_wise_score'],
+        'difficulty_wise_score': summary['difficulty_wise_score'],
+    })
+    _add(deltas, (archived.user_id, 'overall', ''), time_seconds=summary['time_seconds'], tests_taken=1)
+
+
+def fold_pending_attempts(attempts):
+    """
+    Add the attempts of ``attempts`` (a TestAttempt queryset) still marked
+    ``rollup_pending`` to the rollups, e.g. when deferred results are
+    published; returns how many were added.
+
+    Each attempt is claimed by clearing its flag, so the publication and a
+    submission that committed meanwhile never both add it.
+    """
+    with transaction.atomic():
+        pending = list(
+            attempts.select_for_update(skip_locked=True).filter(status='submitted', rollup_pending=True)
+            .values_list('pk', flat=True)
+        )
+        claimed = []
+        for start in range(0, len(pending), 1000):
+            chunk = pending[start:start + 1000]
+            with transaction.atomic():
+                if TestAttempt.objects.filter(pk__in=chunk, rollup_pending=True).update(rollup_pending=False) != len(chunk):
+                    # Some were claimed elsewhere (no row locks on SQLite): claim one by one
+                    transaction.set_rollback(True)
+                    chunk = None
+            if chunk is None:
+                chunk = [
+                    pk for pk in pending[start:start + 1000]
+                    if TestAttempt.objects.filter(pk=pk, rollup_pending=True).update(rollup_pending=False)
+                ]
+            claimed.extend(chunk)
+
+        deltas = {}
+        for start in range(0, len(claimed), 1000):
+            rows = TestAttempt.objects.filter(pk__in=claimed[start:start + 1000]).only(
+                'user_id', 'attempted_questions', 'correct_answers', 'wrong_answers', 'marks_obtained',
+                'percentage_score', 'subject_wise_score', 'difficulty_wise_score', 'time_spent',
+            )
+            for attempt in rows:
+                _attempt_deltas(deltas, attempt)
+        apply_rollup_deltas(deltas)
+    return len(claimed)
+
+
+def rebuild_user_rollups(user_ids):
+    """Recompute rollups of the given users from their submitted and archived attempts"""
+    deltas = {}
+    # Deferred results are added when published
+    attempts = TestAttempt.objects.filter(user_id__in=user_ids, status='submitted', rollup_pending=False).only(
+        'user_id', 'attempted_questions', 'correct_answers', 'wrong_answers', 'marks_obtained',
+        'percentage_score', 'subject_wise_score', 'difficulty_wise_score', 'time_spent',
+    )
+    for attempt in attempts.iterator(chunk_size=1000):
+        _attempt_deltas(deltas, attempt)
+    archived = ArchivedAttempt.objects.filter(user_id__in=user_ids).only(
+        'user_id', 'marks_obtained', 'percentage_score', 'summary', 'path', 'offset', 'length',
+    )
+    for attempt in archived.iterator(chunk_size=1000):
+        _archived_deltas(deltas, attempt)
+
+    with transaction.atomic():
+        PerformanceRollup.objects.filter(user_id__in=user_ids).delete()
+        apply_rollup_deltas(deltas)
+
+
+def cohort_percentile(overall):
+    """Share of users whose average percentage is below ``overall``'s"""
+    cohort = PerformanceRollup.objects.filter(dimension='overall', key='', tests_taken__gt=0)
+    total = cohort.count()
+    if total == 0:
+        return None
+    below = cohort.filter(average_percentage__lt=overall.average_percentage).count()
+    same = cohort.filter(
+        ~Q(user_id=overall.user_id), average_percentage=overall.average_percentage
+    ).count()
+    return round(((below + same / 2) / total) * 100, 1)
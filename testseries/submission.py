@@ -0,0 +1,106 @@
+"""
+Grading and persistence of a finished attempt.
+
+Shared by the candidate's own submission and by batch finalization when a
+test's results are published, so both paths update answers, analytics,
+rollups and histograms the same way.
+
+Submission runs in one transaction holding a row lock on the attempt, so a
+double POST, or a candidate's submit racing batch finalization, grades and
+counts the attempt once. Attempts of tests with deferred results are left
+out of the progress rollups and marked ``rollup_pending`` until
+``publish_results`` folds them in. A submission that read the test as
+unpublished but committed after the publication's fold adds itself.
+"""
+from django.db import transaction
+
+from .answers import store_answers
+from .counters import record_question_stats
+from .deadlines import clear_answers
+from .grading import grade_attempt, question_snapshot
+from .histograms import record_score
+from .rollups import fold_pending_attempts, record_attempt
+
+
+def _results_published(test):
+    """Whether ``test`` shows results now; read from the database while they are deferred"""
+    from .models import Test
+
+    if test.show_result_immediately or test.results_published_at:
+        return True
+    return Test.objects.filter(pk=test.pk, results_published_at__isnull=False).exists()
+
+
+def collect_answers(questions, submitted):
+    """Raw answers by question id from a QueryDict-like ``submitted``"""
+    answers = {}
+    for question in questions:
+        answer_key = f'question_{question.id}'
+        if question.question_type == 'mcq_multiple':
+            answers[question.id] = submitted.getlist(answer_key)
+        else:
+            answers[question.id] = submitted.get(answer_key, '')
+    return answers
+
+
+def submit_attempt(attempt, submitted, submitted_at, questions=None, update_series=True):
+    """
+    Grade ``attempt`` with the answers in ``submitted`` and mark it submitted.
+    ``submitted`` may be a callable returning them, evaluated under the row
+    lock (e.g. to read the autosave). Returns ``None`` without doing
+    anything if the attempt was already finished by another request.
+
+    Pass ``update_series=False`` when finalizing many attempts and refresh
+    the series statistics once afterwards.
+    """
+    from .models import TestAttempt
+
+    with transaction.atomic():
+        status = TestAttempt.objects.select_for_update().filter(pk=attempt.pk).values_list('status', flat=True).first()
+        if status not in ('started', 'in_progress'):
+            return None
+        if callable(submitted):
+            submitted = submitted()
+
+        attempt.submitted_at = submitted_at
+        attempt.time_spent = submitted_at - attempt.started_at
+
+        if questions is None:
+            questions = attempt.get_questions()
+        test_series = attempt.test.test_series
+        answers = collect_answers(questions, submitted)
+
+        # Grade through the shared engine (also used by bulk regrades)
+        results, summary = grade_attempt(
+            [question_snapshot(q) for q in questions],
+            answers,
+            test_series.has_negative_marking,
+            attempt.total_marks,
+            test_series.pass_percentage,
+        )
+
+        # Save answers (StudentAnswer rows or a packed sheet)
+        store_answers(attempt, questions, answers, results)
+
+        # Update question analytics (buffered, flushed periodically)
+        record_question_stats(results)
+
+        attempt.status = 'submitted'
+        for field, value in summary.items():
+            setattr(attempt, field, value)
+        # Progress rollups (deferred results: at publication) and score distribution
+        attempt.rollup_pending = not _results_published(attempt.test)
+        attempt.save()
+        if not attempt.rollup_pending:
+            record_attempt(attempt)
+        record_score(attempt.test_id, attempt.percentage_score)
+        clear_answers(attempt)
+
+    # Published while this transaction was open, possibly after the publication's fold
+    if attempt.rollup_pending and _results_published(attempt.test):
+        fold_pending_attempts(TestAttempt.objects.filter(pk=attempt.pk))
+
+    # Test series analytics
+    if update_series:
+        test_series.update_attempt_stats()
+    return attempt
@@ -0,0 +1,604 @@
+import io
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from base.models import User
+from video_courses.models import Category
+
+from .archive import archive_attempts, recount_archive
+from .cloning import clone_test
+from .counters import FLUSH_LOCK_KEY, flush_question_stats, record_question_stats
+from .deadlines import SALT, clear_answers, is_late, issue_token, read_token, save_answers, saved_answers
+from .dedup import duplicate_clusters, merge_duplicates
+from .grading import question_snapshot, regrade_chunk
+from .histograms import flush_score_histograms, rebuild_histogram, score_histogram
+from .keys import KeyConversionError, renumber_keys
+from .models import (
+    AttemptAnswerSheet, AttemptAutosave, PerformanceRollup, Question, QuestionBank, QuestionPoolEntry,
+    QuestionStatDelta, ScoreDelta, ScoreHistogram, StudentAnswer, Test, TestAttempt, TestPaper, TestSeries,
+)
+from .packing import pack_answers, unpack_answers
+from .papers import get_paper
+from .regrade import _attempt_chunks, queue_regrade, regrade_test
+from .submission import submit_attempt
+
+
+def make_test(title='Mock Test', questions=3, **test_fields):
+    category = Category.objects.create(name=f"{title} category")
+    series = TestSeries.objects.create(
+        title=f"{title} series", category=category, description='x', estimated_duration='1 hour',
+        has_negative_marking=True, pass_percentage=40,
+    )
+    test = Test.objects.create(test_series=series, title=title, duration_minutes=30, **test_fields)
+    for order in range(questions):
+        Question.objects.create(
+            test=test, question_text=f"Question {order}", order=order, marks=4, negative_marks=1,
+            options={'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'}, correct_answer={'answer': 'a'},
+        )
+    test.update_stats()
+    return test
+
+
+def start_attempt(test, user, attempt_number=1):
+    return TestAttempt.objects.create(
+        user=user, test=test, status='in_progress', attempt_number=attempt_number,
+        total_questions=test.total_questions, total_marks=test.total_marks,
+    )
+
+
+# ---------------------------------------------
+# Packed answer sheets
+# ---------------------------------------------
+def entry(question_id, selected=None, attempted=False, correct=False, marks=0, **extra):
+    return {
+        'question_id': question_id, 'selected_answer': selected, 'is_attempted': attempted,
+        'is_correct': correct, 'marks': marks, 'time_spent': extra.get('time_spent', 0),
+        'is_marked_for_review': extra.get('review', False),
+    }
+
+
+class PackingTests(SimpleTestCase):
+    def test_empty_sheet(self):
+        self.assertEqual(unpack_answers(pack_answers([])), [])
+
+    def test_unanswered_questions(self):
+        entries = unpack_answers(pack_answers([entry(7), entry(8, {})]))
+        self.assertEqual(entries, [entry(7, {}), entry(8, {})])
+
+    def test_multi_select_and_negative_marks(self):
+        entries = [
+            entry(1, {'answers': ['a', 'c']}, True, True, 4, time_spent=35),
+            entry(2, {'answer': 'b'}, True, False, -1, review=True),
+            entry(3, {'answer': 'd'}, True, False, -0.33),
+            entry(4_000_000_000, {'answers': ['b']}, True, True, 2.5),
+        ]
+        self.assertEqual(unpack_answers(pack_answers(entries)), entries)
+
+    def test_flags_across_bitmap_bytes(self):
+        entries = [entry(pk, {'answer': 'a'}, True, pk % 3 == 0, 1 if pk % 3 == 0 else 0, review=pk == 9)
+                   for pk in range(1, 12)]
+        self.assertEqual(unpack_answers(memoryview(pack_answers(entries))), entries)
+
+    def test_unknown_version_is_refused(self):
+        with self.assertRaises(ValueError):
+            unpack_answers(b'\x02' + pack_answers([])[1:])
+
+
+class PackedRegradeTests(TestCase):
+    """A regrade scores packed sheets exactly like StudentAnswer rows"""
+
+    def setUp(self):
+        self.test = make_test()
+        Question.objects.create(
+            test=self.test, question_text="Pick two", order=9, question_type='mcq_multiple', marks=2,
+            negative_marks=0.5, options={'a': 'A', 'b': 'B', 'c': 'C'}, correct_answer={'answers': ['a', 'c']},
+        )
+        self.test.update_stats()
+        self.questions = list(self.test.questions.order_by('order'))
+        single = [q for q in self.questions if q.question_type != 'mcq_multiple']
+        multi = self.questions[-1]
+        self.answer_sets = [
+            {single[0]: ['a'], single[1]: ['b'], multi: ['a', 'c']},
+            {multi: ['c', 'a'], single[2]: ['a']},
+            {multi: ['a']},
+            {},
+        ]
+
+    def submit_all(self, mode):
+        attempts = []
+        with override_settings(TESTSERIES_ANSWER_STORAGE=mode):
+            for number, answers in enumerate(self.answer_sets, 1):
+                user = User.objects.create_user(email=f'{mode}{number}@example.com', password='x')
+                attempt = start_attempt(self.test, user)
+                submitted = MultiValueDict({f'question_{q.pk}': values for q, values in answers.items()})
+                submit_attempt(attempt, submitted, timezone.now())
+                attempts.append(attempt)
+        return attempts
+
+    def payload(self, attempt):
+        rows = list(StudentAnswer.objects.filter(attempt=attempt).values_list(
+            'id', 'question_id', 'selected_answer', 'is_attempted', 'is_correct'
+        ))
+        sheet = AttemptAnswerSheet.objects.filter(attempt=attempt).values_list('data', flat=True).first()
+        return attempt.pk, float(attempt.total_marks), rows, bytes(sheet) if sheet is not None else None
+
+    def test_packed_and_row_storage_regrade_alike(self):
+        rows_attempts = self.submit_all('rows')
+        packed_attempts = self.submit_all('packed')
+        self.assertTrue(AttemptAnswerSheet.objects.exists())
+
+        # Correct the key of the first question, as a regrade would
+        Question.objects.filter(pk=self.questions[0].pk).update(correct_answer={'answer': 'b'})
+        snapshots = [question_snapshot(q) for q in Question.objects.filter(test=self.test).select_related('subject')]
+        results = {}
+        for mode, attempts in (('rows', rows_attempts), ('packed', packed_attempts)):
+            graded, tallies = regrade_chunk(snapshots, True, 40, [self.payload(a) for a in attempts])
+            results[mode] = ([summary for _, summary, _, _ in graded], tallies)
+
+        self.assertEqual(results['rows'], results['packed'])
+        summaries = results['rows'][0]
+        self.assertEqual([s['marks_obtained'] for s in summaries], [-1 - 1 + 2, 2 + 4, -0.5, 0])
+
+        # The re-encoded sheet carries the new marks
+        _, _, _, sheet = regrade_chunk(snapshots, True, 40, [self.payload(packed_attempts[0])])[0][0]
+        marks = {e['question_id']: e['marks'] for e in unpack_answers(sheet)}
+        self.assertEqual(marks[self.questions[0].pk], -1)
+
+
+# ---------------------------------------------
+# Deadline tokens and autosave
+# ---------------------------------------------
+class DeadlineTokenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='candidate@example.com', password='x')
+        self.test = make_test()
+        self.attempt = start_attempt(self.test, self.user)
+        self.questions = self.attempt.get_questions()
+
+    def test_round_trip(self):
+        token = issue_token(self.attempt, self.questions)
+        claims = read_token(token, self.attempt.public_id, self.user.pk)
+        self.assertEqual(claims['a'], self.attempt.public_id.hex)
+        self.assertFalse(is_late(claims))
+
+    def test_foreign_attempt_or_user_is_rejected(self):
+        token = issue_token(self.attempt, self.questions)
+        other = start_attempt(make_test('Other'), self.user)
+        self.assertIsNone(read_token(token, other.public_id, self.user.pk))
+        self.assertIsNone(read_token(token, self.attempt.public_id, self.user.pk + 1))
+
+    def test_tampered_token_is_rejected(self):
+        token = issue_token(self.attempt, self.questions)
+        payload = signing.loads(token, salt=SALT)
+        payload['d'] += 3600
+        forged = signing.dumps(payload, salt=SALT, key='not-the-secret-key')
+        self.assertIsNone(read_token(forged, self.attempt.public_id, self.user.pk))
+        self.assertIsNone(read_token(token[:-2] + 'xx', self.attempt.public_id, self.user.pk))
+        self.assertIsNone(read_token('', self.attempt.public_id, self.user.pk))
+
+    def test_late_after_deadline_and_grace(self):
+        token = issue_token(self.attempt, self.questions)
+        claims = read_token(token, self.attempt.public_id, self.user.pk)
+        deadline = timezone.now() + timedelta(minutes=30)
+        with mock.patch('django.utils.timezone.now', return_value=deadline + timedelta(seconds=10)):
+            self.assertFalse(is_late(claims))
+        with mock.patch('django.utils.timezone.now', return_value=deadline + timedelta(minutes=5)):
+            self.assertTrue(is_late(claims))
+
+    def test_autosave_is_durable_and_cleared_on_submit(self):
+        first = self.questions[0]
+        self.assertTrue(save_answers(self.attempt.public_id, {f'question_{first.pk}': ['b']}))
+        self.assertTrue(save_answers(self.attempt.public_id, {f'question_{first.pk}': ['a']}))
+        self.assertEqual(saved_answers(self.attempt), {f'question_{first.pk}': ['a']})
+
+        submit_attempt(self.attempt, lambda: MultiValueDict(saved_answers(self.attempt)), timezone.now())
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.marks_obtained, 4)
+        self.assertFalse(AttemptAutosave.objects.exists())
+        self.assertFalse(save_answers(self.attempt.public_id, {}))
+        clear_answers(self.attempt)
+
+
+class SubmitAttemptTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='candidate@example.com', password='x')
+        self.test = make_test()
+        self.attempt = start_attempt(self.test, self.user)
+
+    def test_second_submit_is_ignored(self):
+        questions = self.attempt.get_questions()
+        answers = MultiValueDict({f'question_{q.pk}': ['a'] for q in questions})
+        self.assertIsNotNone(submit_attempt(self.attempt, answers, timezone.now()))
+
+        stale = TestAttempt.objects.get(pk=self.attempt.pk)
+        stale.status = 'in_progress'  # a second request that loaded the row before the first committed
+        self.assertIsNone(submit_attempt(stale, MultiValueDict(), timezone.now()))
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.marks_obtained, 12)
+        self.test.test_series.refresh_from_db()
+        self.assertEqual(self.test.test_series.total_attempts, 1)
+
+
+# ---------------------------------------------
+# Deferred results
+# ---------------------------------------------
+class PublishResultsTests(TestCase):
+    def setUp(self):
+        self.test = make_test(show_result_immediately=False, end_time=timezone.now())
+        self.questions = list(self.test.questions.all())
+
+    def test_open_attempts_are_graded_from_their_autosave(self):
+        from .publication import publish_results
+
+        saved = start_attempt(self.test, User.objects.create_user(email='a@example.com', password='x'))
+        save_answers(saved.public_id, {f'question_{q.pk}': ['a'] for q in self.questions[:2]})
+        blank = start_attempt(self.test, User.objects.create_user(email='b@example.com', password='x'))
+
+        report = publish_results(self.test)
+        self.assertEqual(report['finalized'], 2)
+        saved.refresh_from_db()
+        blank.refresh_from_db()
+        self.assertEqual((saved.status, saved.marks_obtained, saved.rank), ('submitted', 8, 1))
+        self.assertEqual((blank.status, blank.marks_obtained, blank.rank), ('submitted', 0, 2))
+
+    def test_rollups_wait_for_publication(self):
+        from .publication import publish_results
+
+        user = User.objects.create_user(email='a@example.com', password='x')
+        attempt = start_attempt(self.test, user)
+        submit_attempt(attempt, MultiValueDict({f'question_{self.questions[0].pk}': ['a']}), timezone.now())
+        self.assertFalse(PerformanceRollup.objects.filter(user=user).exists())
+
+        publish_results(self.test)
+        publish_results(self.test)
+        overall = PerformanceRollup.objects.get(user=user, dimension='overall', key='')
+        self.assertEqual((overall.tests_taken, overall.correct), (1, 1))
+
+        # Late finalizations after publication are counted right away
+        late = start_attempt(self.test, user, attempt_number=2)
+        self.test.refresh_from_db()
+        late.test = self.test
+        submit_attempt(late, MultiValueDict(), timezone.now())
+        overall.refresh_from_db()
+        self.assertEqual(overall.tests_taken, 2)
+
+    def test_submission_committed_after_the_publication_folds_itself(self):
+        from .publication import publish_results
+
+        user = User.objects.create_user(email='a@example.com', password='x')
+        publish_results(self.test)
+        attempt = start_attempt(self.test, user)
+        # Read the test as unpublished inside its transaction, before the flag was committed
+        with mock.patch('testseries.submission._results_published', side_effect=[False, True]):
+            submit_attempt(attempt, MultiValueDict({f'question_{self.questions[0].pk}': ['a']}), timezone.now())
+        attempt.refresh_from_db()
+        self.assertFalse(attempt.rollup_pending)
+        overall = PerformanceRollup.objects.get(user=user, dimension='overall', key='')
+        self.assertEqual((overall.tests_taken, overall.correct), (1, 1))
+        publish_results(self.test)
+        overall.refresh_from_db()
+        self.assertEqual(overall.tests_taken, 1)
+
+    def test_attempt_submitted_meanwhile_is_not_graded_again(self):
+        from .publication import finalize_open_attempts
+
+        attempt = start_attempt(self.test, User.objects.create_user(email='a@example.com', password='x'))
+        stale = TestAttempt.objects.get(pk=attempt.pk)
+        submit_attempt(attempt, MultiValueDict({f'question_{self.questions[0].pk}': ['a']}), timezone.now())
+
+        stale.status = 'in_progress'
+        # The finalizer loaded the row before the candidate's submit committed
+        self.assertIsNone(submit_attempt(stale, MultiValueDict(), timezone.now(), update_series=False))
+        self.assertEqual(finalize_open_attempts(self.test, timezone.now()), 0)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.marks_obtained, 4)
+
+
+# ---------------------------------------------
+# Question counters
+# ---------------------------------------------
+class QuestionStatsFlushTests(TestCase):
+    def setUp(self):
+        self.question = make_test(questions=1).questions.get()
+        # Keep submissions from flushing on their own
+        cache.add(FLUSH_LOCK_KEY, 1)
+        self.addCleanup(cache.delete, FLUSH_LOCK_KEY)
+        record_question_stats({self.question.pk: (True, True, 4)})
+        record_question_stats({self.question.pk: (True, False, -1)})
+
+    def counters(self):
+        self.question.refresh_from_db()
+        return self.question.total_attempts, self.question.correct_attempts
+
+    def test_rows_claimed_by_another_flush_are_not_applied_twice(self):
+        select_for_update = QuestionStatDelta.objects.select_for_update
+
+        class Raced:
+            def values_list(self, *fields):
+                rows = list(select_for_update(skip_locked=True).values_list(*fields))
+                # Another flush deletes a row between this one's read and claim
+                QuestionStatDelta.objects.filter(pk=rows[0][0]).delete()
+                return rows
+
+        with mock.patch.object(QuestionStatDelta.objects, 'select_for_update', return_value=Raced()):
+            self.assertEqual(flush_question_stats(), 0)
+        self.assertEqual(self.counters(), (0, 0))
+
+        self.assertEqual(flush_question_stats(), 1)
+        self.assertEqual(self.counters(), (2, 1))
+        self.assertEqual(flush_question_stats(), 0)
+        self.assertEqual(self.counters(), (2, 1))
+
+
+# ---------------------------------------------
+# Score histograms
+# ---------------------------------------------
+class ScoreHistogramTests(TestCase):
+    def setUp(self):
+        cache.add(FLUSH_LOCK_KEY, 1)
+        self.addCleanup(cache.delete, FLUSH_LOCK_KEY)
+        self.test = make_test()
+        self.question = self.test.questions.order_by('order').first()
+        for number, answer in enumerate(('a', 'b'), 1):
+            attempt = start_attempt(self.test, User.objects.create_user(email=f'{number}@example.com', password='x'))
+            submit_attempt(attempt, MultiValueDict({f'question_{self.question.pk}': [answer]}), timezone.now())
+
+    def counted(self, histogram):
+        return histogram.count, round(histogram.total, 2), sum(histogram.buckets)
+
+    def test_submissions_append_deltas_folded_by_the_flush(self):
+        self.assertFalse(ScoreHistogram.objects.filter(test=self.test).exists())
+        pending = self.counted(score_histogram(self.test.pk))
+        self.assertEqual(pending[0], 2)
+
+        self.assertEqual(flush_score_histograms(), 1)
+        self.assertFalse(ScoreDelta.objects.exists())
+        self.assertEqual(self.counted(self.test.score_histogram), pending)
+
+    def test_regrade_moves_scores_through_deltas(self):
+        flush_score_histograms()
+        Question.objects.filter(pk=self.question.pk).update(correct_answer={'answer': 'b'})
+        regrade_test(self.test, workers=1)
+        self.assertEqual(ScoreDelta.objects.count(), 4)
+        regraded = self.counted(score_histogram(self.test.pk))
+
+        flush_score_histograms()
+        self.assertEqual(self.counted(ScoreHistogram.objects.get(test=self.test)), regraded)
+        self.assertEqual(self.counted(rebuild_histogram(self.test)), regraded)
+
+
+# ---------------------------------------------
+# Archival
+# ---------------------------------------------
+class ArchivedStatsTests(TestCase):
+    def setUp(self):
+        archive = tempfile.TemporaryDirectory()
+        self.addCleanup(archive.cleanup)
+        settings = override_settings(ATTEMPT_ARCHIVE_ROOT=Path(archive.name))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.test = make_test()
+        self.user = User.objects.create_user(email='candidate@example.com', password='x')
+        questions = list(self.test.questions.all())
+        for number, answers in enumerate(({questions[0]: 'a', questions[1]: 'b'}, {questions[0]: 'a'}), 1):
+            attempt = start_attempt(self.test, self.user, number)
+            submit_attempt(attempt, MultiValueDict({f'question_{q.pk}': [v] for q, v in answers.items()}), timezone.now())
+        flush_question_stats()
+        self.series = self.test.test_series
+
+    def archive(self):
+        archived, _ = archive_attempts(timezone.now() + timedelta(days=1))
+        self.assertEqual(archived, 2)
+        self.assertFalse(TestAttempt.objects.exists())
+
+    def counters(self):
+        return list(self.test.questions.order_by('order').values_list('total_attempts', 'correct_attempts'))
+
+    def test_series_stats_count_archived_attempts(self):
+        self.series.refresh_from_db()
+        before = (self.series.total_attempts, self.series.average_score)
+        self.archive()
+        self.series.update_attempt_stats()
+        self.assertEqual((self.series.total_attempts, self.series.average_score), before)
+        self.assertEqual(before, (2, Decimal('3.50')))
+
+    def test_regrade_keeps_archived_question_analytics(self):
+        before = self.counters()
+        self.archive()
+        regrade_test(self.test, workers=1)
+        self.assertEqual(self.counters(), before)
+        self.assertEqual(before, [(2, 2), (1, 0), (0, 0)])
+
+        Question.objects.update(archived_attempts=0, archived_correct=0)
+        self.assertEqual(recount_archive(), 2)
+        regrade_test(self.test, workers=1)
+        self.assertEqual(self.counters(), before)
+
+    def test_rollups_rebuild_from_archived_attempts(self):
+        before = list(PerformanceRollup.objects.filter(user=self.user).order_by('dimension', 'key').values_list(
+            'dimension', 'key', 'attempted', 'correct', 'tests_taken'
+        ))
+        self.archive()
+        # The user has no live attempts left; the command still finds them
+        PerformanceRollup.objects.filter(user=self.user).delete()
+        call_command('rebuild_rollups', stdout=io.StringIO())
+        after = list(PerformanceRollup.objects.filter(user=self.user).order_by('dimension', 'key').values_list(
+            'dimension', 'key', 'attempted', 'correct', 'tests_taken'
+        ))
+        self.assertEqual(after, before)
+        self.assertIn(('overall', '', 3, 2, 2), after)
+
+
+# ---------------------------------------------
+# Regrade queue
+# ---------------------------------------------
+class RegradeQueueTests(TestCase):
+    def test_admin_queues_and_command_regrades(self):
+        test = make_test()
+        attempt = start_attempt(test, User.objects.create_user(email='a@example.com', password='x'))
+        question = test.questions.order_by('order').first()
+        submit_attempt(attempt, MultiValueDict({f'question_{question.pk}': ['b']}), timezone.now())
+        Question.objects.filter(pk=question.pk).update(correct_answer={'answer': 'b'})
+
+        self.assertEqual(queue_regrade([test]), 1)
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.marks_obtained, -1)
+
+        call_command('regrade_test', workers=1, stdout=io.StringIO())
+        attempt.refresh_from_db()
+        test.refresh_from_db()
+        self.assertEqual(attempt.marks_obtained, 4)
+        self.assertIsNone(test.regrade_requested_at)
+
+
+class RegradeCounterTests(TestCase):
+    def test_submission_during_a_regrade_keeps_its_counts(self):
+        cache.add(FLUSH_LOCK_KEY, 1)
+        self.addCleanup(cache.delete, FLUSH_LOCK_KEY)
+        test = make_test()
+        question = test.questions.order_by('order').first()
+        users = [User.objects.create_user(email=f'{n}@example.com', password='x') for n in range(3)]
+
+        def submit(user, answer):
+            submit_attempt(start_attempt(test, user), MultiValueDict({f'question_{question.pk}': [answer]}), timezone.now())
+
+        submit(users[0], 'b')
+        submit(users[1], 'a')
+        flush_question_stats()
+        Question.objects.filter(pk=question.pk).update(correct_answer={'answer': 'b'})
+
+        def chunks_then_submit(*args, attempt_chunks=_attempt_chunks):
+            yield from attempt_chunks(*args)
+            # Committed after the regrade read its last chunk
+            submit(users[2], 'b')
+
+        with mock.patch('testseries.regrade._attempt_chunks', side_effect=chunks_then_submit):
+            regrade_test(test, workers=1)
+        flush_question_stats()
+        question.refresh_from_db()
+        self.assertEqual((question.total_attempts, question.correct_attempts), (3, 2))
+
+
+# ---------------------------------------------
+# Cloning
+# ---------------------------------------------
+class CloneTests(TestCase):
+    def test_copies_start_without_analytics_or_pending_work(self):
+        test = make_test(show_result_immediately=False)
+        Test.objects.filter(pk=test.pk).update(results_published_at=timezone.now(), regrade_requested_at=timezone.now())
+        test.refresh_from_db()
+        test.questions.update(total_attempts=9, correct_attempts=5, archived_attempts=4, archived_correct=2)
+
+        copy = clone_test(test)
+        copy.refresh_from_db()
+        self.assertEqual((copy.results_published_at, copy.regrade_requested_at), (None, None))
+        self.assertEqual(copy.total_questions, 3)
+        self.assertEqual(
+            set(copy.questions.values_list('total_attempts', 'correct_attempts', 'archived_attempts', 'archived_correct')),
+            {(0, 0, 0, 0)},
+        )
+
+
+# ---------------------------------------------
+# Bank papers
+# ---------------------------------------------
+class BankPaperTests(TestCase):
+    def setUp(self):
+        self.bank = QuestionBank.objects.create(name='Physics bank')
+        for order, difficulty in enumerate(['easy'] * 6 + ['medium'] * 4 + ['hard'] * 2):
+            Question.objects.create(
+                bank=self.bank, question_text=f"Bank question {order}", difficulty=difficulty,
+                marks=2 if difficulty == 'hard' else 1,
+                options={'a': 'A', 'b': 'B'}, correct_answer={'answer': 'a'},
+            )
+        self.test = make_test('Bank Test', questions=0, question_bank=self.bank, paper_per_candidate=True,
+                              easy_questions=2, medium_questions=1, hard_questions=1)
+
+    def test_paper_follows_the_blueprint(self):
+        user = User.objects.create_user(email='a@example.com', password='x')
+        paper = get_paper(self.test, user)
+        questions = paper.get_questions()
+        self.assertEqual(len(set(paper.question_ids)), 4)
+        self.assertEqual(sorted(q.difficulty for q in questions), ['easy', 'easy', 'hard', 'medium'])
+        self.assertEqual(paper.total_marks, 5)
+        self.assertTrue(QuestionPoolEntry.objects.filter(bank=self.bank).exists())
+
+        self.test.refresh_from_db()
+        self.assertEqual((self.test.total_questions, self.test.total_marks), (4, 5))
+
+        # The same candidate gets the same draw when the paper is regenerated
+        paper.delete()
+        self.assertEqual(get_paper(self.test, user).question_ids, paper.question_ids)
+
+    def test_bulk_deleted_questions_are_not_drawn(self):
+        self.bank.get_pools()
+        Question.objects.filter(pk__in=Question.objects.filter(bank=self.bank, difficulty='easy').values('pk')[:3]).delete()
+        for number in range(5):
+            user = User.objects.create_user(email=f'u{number}@example.com', password='x')
+            paper = get_paper(self.test, user)
+            self.assertEqual(len(paper.get_questions()), 4)
+
+
+# ---------------------------------------------
+# Near-duplicate merging
+# ---------------------------------------------
+class MergeDuplicatesTests(TestCase):
+    text = "A body starts from rest and accelerates uniformly at 2 m/s2. How far does it travel in 5 seconds?"
+
+    def question(self, **fields):
+        return Question.objects.create(
+            question_text=self.text, options={'a': '25 m', 'b': '50 m'}, correct_answer={'answer': 'a'}, **fields
+        )
+
+    def test_questions_of_different_tests_are_not_merged(self):
+        first, second = make_test('First', questions=0), make_test('Second', questions=0)
+        a, b = self.question(test=first), self.question(test=second)
+        clusters = duplicate_clusters(Question.objects.filter(pk__in=[a.pk, b.pk]))
+        self.assertEqual(clusters, [[a.pk, b.pk]])
+        self.assertEqual(merge_duplicates(clusters), 0)
+        self.assertFalse(Question.objects.filter(duplicate_of__isnull=False).exists())
+
+    def test_served_duplicates_keep_their_counters(self):
+        bank = QuestionBank.objects.create(name='Kinematics')
+        canonical, served, retired = (
+            self.question(bank=bank, total_attempts=10, correct_attempts=5),
+            self.question(bank=bank, total_attempts=4, correct_attempts=2),
+            self.question(bank=bank, total_attempts=6, correct_attempts=3),
+        )
+        test = make_test('Bank Test', questions=0, question_bank=bank, easy_questions=1)
+        TestPaper.objects.create(test=test, question_ids=[served.pk], total_marks=1)
+
+        self.assertEqual(merge_duplicates(duplicate_clusters(bank.questions.all())), 2)
+        counters = dict(Question.objects.values_list('pk', 'total_attempts'))
+        self.assertEqual(counters, {canonical.pk: 16, served.pk: 4, retired.pk: 0})
+        self.assertEqual(set(Question.objects.filter(duplicate_of=canonical).values_list('pk', flat=True)),
+                         {served.pk, retired.pk})
+
+
+# ---------------------------------------------
+# Key conversion
+# ---------------------------------------------
+class KeyConversionTests(TestCase):
+    def test_other_databases_refuse_before_changing_anything(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(renumber_keys(connection), {})
+
+            attempt = start_attempt(make_test(), User.objects.create_user(email='a@example.com', password='x'))
+            with self.assertRaisesMessage(KeyConversionError, 'testseries_testattempt: 1'):
+                renumber_keys(connection)
+            with self.assertRaisesMessage(CommandError, 'only be renumbered in place on SQLite'):
+                call_command('migrate_attempt_keys', stdout=io.StringIO())
+        self.assertTrue(TestAttempt.objects.filter(pk=attempt.pk).exists())
@@ -8,6 +8,8 @@ import json
 # Import models
 from video_courses.models import Category
 from testseries.models import TestSeries, Test, Question, Subject
+from testseries.dedup import find_near_duplicates
+from testseries.cloning import clone_series, clone_test
 
 
 @login_required
@@ -288,6 +290,38 @@ def test_edit(request, pk):
     }
     return render(request, 'testseries/test_edit.html', context)
 
+# ---------------------------------------------
+# Clone Test Series / Scheduled Test
+# ---------------------------------------------
+@login_required
+@user_passes_test(is_admin)
+def test_series_clone(request, pk):
+    """Copy a test series with all of its tests and questions"""
+    test_series = get_object_or_404(TestSeries, pk=pk)
+    if request.method != 'POST':
+        return redirect('test_series_manage')
+    try:
+        copy = clone_series(test_series)
+        messages.success(request, f'✅ Test series cloned as "{copy.title}" ({copy.total_tests} tests, {copy.total_questions} questions).')
+        return redirect('test_series_detail', pk=copy.pk)
+    except Exception as e:
+        messages.error(request, f'❌ Error cloning test series: {str(e)}')
+        return redirect('test_series_manage')
+
+
+@login_required
+@user_passes_test(is_admin)
+def test_clone(request, pk):
+    """Copy a scheduled test with its questions into the same series"""
+    test = get_object_or_404(Test.objects.select_related('test_series'), pk=pk)
+    if request.method == 'POST':
+        try:
+            copy = clone_test(test)
+            messages.success(request, f'✅ Scheduled test cloned as "{copy.title}" ({copy.total_questions} questions).')
+        except Exception as e:
+            messages.error(request, f'❌ Error cloning scheduled test: {str(e)}')
+    return redirect('test_series_detail', pk=test.test_series_id)
+
 # ---------------------------------------------
 # Create Question
 # ---------------------------------------------
@@ -336,7 +370,7 @@ def question_create(request, test_pk):
 
         try:
             subject = Subject.objects.get(id=subject_id) if subject_id else None
-            Question.objects.create(
+            question = Question.objects.create(
                 test=test,
                 subject=subject,
                 question_type=question_type,
@@ -355,6 +389,13 @@ def question_create(request, test_pk):
                 request,
                 f'✅ Question #{order} added successfully to "{test.title}"! Test now has {test.questions.count()} questions.'
             )
+            similar = find_near_duplicates(question_text, options, exclude=question.pk)
+            if similar:
+                matches = ', '.join(
+                    f'#{match.pk} ({match.test or match.bank}, {score:.0%})'
+                    for match, score in similar[:3]
+                )
+                messages.warning(request, f'⚠️ This question looks like a near-duplicate of {matches}.')
             return redirect('test_edit', pk=test.pk)
 
         except Exception as e:
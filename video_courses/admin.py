@@ -3,7 +3,10 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.db import models
-from .models import Category, VideoCourse, WhatYouLearnPoint, CourseInclude, CourseVideo
+from .models import Category, VideoCourse, WhatYouLearnPoint, CourseInclude, CourseVideo, CourseProgress, UploadSession
+from .previews import queue_previews
+from .probing import queue_probe
+from .transcode import queue_transcode
 
 
 class WhatYouLearnInline(admin.TabularInline):
@@ -274,12 +277,17 @@ class CourseVideoAdmin(admin.ModelAdmin):
     list_display = (
         "title", "course_link", "duration_display", 
         "is_preview", "file_size_display", "thumbnail_preview", 
-        "created_at"
+        "hls_status", "created_at"
     )
-    list_filter = ("course", "is_preview", "created_at")
+    list_filter = ("course", "is_preview", "hls_status", "created_at")
     search_fields = ("title", "course__name")
     ordering = ("course", "id")
-    readonly_fields = ("duration_display", "file_info", "created_at", "updated_at")
+    readonly_fields = (
+        "duration_display", "file_info", "resolution_display", "video_codec", "audio_codec", "bitrate_display",
+        "probed_at", "preview_sprite", "preview_vtt", "hls_status", "hls_playlist", "hls_error",
+        "created_at", "updated_at"
+    )
+    actions = ["repackage_hls", "reprobe_metadata", "regenerate_previews"]
     
     fieldsets = (
         ("Video Information", {
@@ -289,7 +297,13 @@ class CourseVideoAdmin(admin.ModelAdmin):
             "fields": ("file", "thumb_image", "file_info")
         }),
         ("Technical Details", {
-            "fields": ("duration_display",)
+            "fields": ("duration_display", "resolution_display", "video_codec", "audio_codec", "bitrate_display", "probed_at")
+        }),
+        ("Scrub Previews", {
+            "fields": ("preview_sprite", "preview_vtt")
+        }),
+        ("Adaptive Streaming (HLS)", {
+            "fields": ("hls_status", "hls_playlist", "hls_error")
         }),
         ("Timestamps", {
             "classes": ("collapse",),
@@ -313,6 +327,20 @@ class CourseVideoAdmin(admin.ModelAdmin):
         return "Unknown duration"
     duration_display.short_description = "Duration"
     
+    def resolution_display(self, obj):
+        """Display probed frame size"""
+        if obj.width and obj.height:
+            return f"{obj.width}×{obj.height}"
+        return "Not probed yet"
+    resolution_display.short_description = "Resolution"
+    
+    def bitrate_display(self, obj):
+        """Display probed bitrate in kbps"""
+        if obj.bitrate:
+            return f"{obj.bitrate // 1000} kbps"
+        return "Unknown bitrate"
+    bitrate_display.short_description = "Bitrate"
+    
     def file_size_display(self, obj):
         """Display file size in readable format"""
         if obj.file:
@@ -358,6 +386,33 @@ class CourseVideoAdmin(admin.ModelAdmin):
         return "No thumbnail"
     thumbnail_preview.short_description = "Thumbnail"
 
+    def repackage_hls(self, request, queryset):
+        """Queue HLS packaging again for the selected videos"""
+        queued = sum(queue_transcode(video) for video in queryset)
+        if queued:
+            self.message_user(request, f"{queued} video(s) queued for HLS packaging.")
+        else:
+            self.message_user(request, "ffmpeg/ffprobe not found on the server; nothing queued.", level="warning")
+    repackage_hls.short_description = "Re-package selected videos as HLS"
+
+    def reprobe_metadata(self, request, queryset):
+        """Read duration, resolution and codecs again for the selected videos"""
+        queued = sum(queue_probe(video) for video in queryset.exclude(file=""))
+        if queued:
+            self.message_user(request, f"{queued} video(s) queued for probing.")
+        else:
+            self.message_user(request, "ffprobe not found on the server; nothing queued.", level="warning")
+    reprobe_metadata.short_description = "Re-read metadata of selected videos"
+
+    def regenerate_previews(self, request, queryset):
+        """Extract poster and scrub-preview sprites again for the selected videos"""
+        queued = sum(queue_previews(video) for video in queryset.exclude(file=""))
+        if queued:
+            self.message_user(request, f"{queued} video(s) queued for preview generation.")
+        else:
+            self.message_user(request, "ffmpeg/ffprobe not found on the server; nothing queued.", level="warning")
+    regenerate_previews.short_description = "Regenerate poster and scrub previews"
+
 
 @admin.register(WhatYouLearnPoint)
 class WhatYouLearnPointAdmin(admin.ModelAdmin):
@@ -399,3 +454,40 @@ class CourseIncludeAdmin(admin.ModelAdmin):
         """Display truncated label"""
         return obj.label[:60] + "..." if len(obj.label) > 60 else obj.label
     label_preview.short_description = "Include Item"
+
+
+@admin.register(CourseProgress)
+class CourseProgressAdmin(admin.ModelAdmin):
+    list_display = ("user", "course_link", "last_video", "position_seconds", "completed_count", "updated_at")
+    list_filter = ("course",)
+    search_fields = ("user__email", "course__name")
+    list_select_related = ("user", "course", "last_video")
+    readonly_fields = ("user", "course", "last_video", "position_seconds", "completed_count", "updated_at")
+    exclude = ("completed",)
+    
+    def course_link(self, obj):
+        """Clickable course link"""
+        url = reverse("admin:video_courses_videocourse_change", args=[obj.course.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.course.name)
+    course_link.short_description = "Course"
+    course_link.admin_order_field = "course__name"
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("filename", "kind", "user", "progress_display", "status", "updated_at")
+    list_filter = ("status", "kind")
+    search_fields = ("filename", "user__email", "sha256")
+    list_select_related = ("user",)
+    readonly_fields = ("id", "user", "kind", "filename", "length", "offset", "sha256", "status", "error", "created_at", "updated_at")
+    
+    def progress_display(self, obj):
+        """Share of the file received so far"""
+        return f"{obj.offset * 100 // obj.length}%" if obj.length else "-"
+    progress_display.short_description = "Received"
+    
+    def has_add_permission(self, request):
+        return False
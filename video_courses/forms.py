@@ -1,6 +1,7 @@
 from django import forms
 from django.forms import inlineformset_factory
 from .models import VideoCourse, WhatYouLearnPoint, CourseInclude, CourseVideo, Category
+from .uploads import UploadError, claim_upload
 
 
 class VideoCourseForm(forms.ModelForm):
@@ -59,8 +60,43 @@ IncludeFormSet = inlineformset_factory(
 )
 
 
+class CourseVideoForm(forms.ModelForm):
+    # Set by the chunked uploader (see uploads.py) instead of posting the file
+    upload = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = CourseVideo
+        fields = ["title", "is_preview", "file", "thumb_image"]
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.staged = None
+        self.fields["file"].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get("upload")
+        if upload:
+            try:
+                self.staged = claim_upload(self.user, upload, "video")
+                cleaned_data["file"] = self.staged
+            except UploadError as e:
+                self.add_error("file", str(e))
+        elif not cleaned_data.get("file") and "file" not in self.errors:
+            self.add_error("file", "This field is required.")
+        return cleaned_data
+
+    def save(self, commit=True):
+        instance = super().save(commit)
+        if commit and self.staged:
+            self.staged.release()
+        return instance
+
+
 VideoFormSet = inlineformset_factory(
     VideoCourse, CourseVideo,
+    form=CourseVideoForm,
     fields=["title", "is_preview", "file", "thumb_image"],
     extra=2, can_delete=True
 )
@@ -0,0 +1,45 @@
+"""
+Background jobs for course videos.
+
+Probing and HLS packaging run on one bounded thread pool inside the web
+process (``VIDEO_TRANSCODE_WORKERS`` threads). The CPU-heavy work happens in
+ffprobe/ffmpeg child processes, so threads are enough to keep uploads
+responsive. Jobs record their state on the CourseVideo row; management
+commands pick up anything lost to a restart.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def worker_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'VIDEO_TRANSCODE_WORKERS', 2), thread_name_prefix='video'
+            )
+    return _executor
+
+
+def _run(job, video_id):
+    close_old_connections()
+    try:
+        job(video_id)
+    except Exception:
+        logger.exception(f"{job.__name__} crashed for video {video_id}")
+    finally:
+        close_old_connections()
+
+
+def submit_after_commit(job, video_id):
+    """Run ``job(video_id)`` on the pool once the current transaction commits"""
+    transaction.on_commit(lambda: worker_pool().submit(_run, job, video_id))
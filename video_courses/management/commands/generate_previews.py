@@ -0,0 +1,40 @@
+# video_courses/management/commands/generate_previews.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from video_courses.models import CourseVideo
+from video_courses.previews import generate_previews
+from video_courses.transcode import transcoding_available
+
+
+class Command(BaseCommand):
+    help = 'Extract posters and scrub-preview sprite sheets (with WebVTT index) for course videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int, help="Only these CourseVideo ids")
+        parser.add_argument('--all', action='store_true', help="Regenerate every video, not only ones without previews")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="ffmpeg processes to run at once")
+
+    def handle(self, *args, **options):
+        if not transcoding_available():
+            raise CommandError('ffmpeg and ffprobe must be installed (see FFMPEG_BINARY / FFPROBE_BINARY)')
+
+        videos = CourseVideo.objects.exclude(file='')
+        if options['video_ids']:
+            videos = videos.filter(pk__in=options['video_ids'])
+        elif not options['all']:
+            videos = videos.filter(preview_vtt='')
+        ids = list(videos.values_list('pk', flat=True))
+
+        started = time.monotonic()
+        # Each job is an ffmpeg child process, so threads spread the work over all cores
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            done = sum(pool.map(generate_previews, ids))
+
+        if done < len(ids):
+            self.stdout.write(self.style.WARNING(f'{len(ids) - done} video(s) failed; see the logs'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Generated previews for {done} of {len(ids)} video(s) in {time.monotonic() - started:.1f}s'
+        ))
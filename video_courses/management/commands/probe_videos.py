@@ -0,0 +1,43 @@
+# video_courses/management/commands/probe_videos.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from video_courses.models import CourseVideo
+from video_courses.probing import probe_video, probing_available, recount_course_hours
+
+
+class Command(BaseCommand):
+    help = 'Read duration, resolution, codecs and bitrate of course videos with ffprobe and recount course hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int, help="Only these CourseVideo ids")
+        parser.add_argument('--all', action='store_true', help="Probe every video again, not only unprobed ones")
+        parser.add_argument('--workers', type=int, default=4, help="ffprobe processes to run at once")
+
+    def handle(self, *args, **options):
+        if not probing_available():
+            raise CommandError('ffprobe must be installed (see FFPROBE_BINARY)')
+
+        videos = CourseVideo.objects.exclude(file='')
+        if options['video_ids']:
+            videos = videos.filter(pk__in=options['video_ids'])
+        elif not options['all']:
+            videos = videos.filter(probed_at__isnull=True)
+        rows = list(videos.values_list('pk', 'course_id'))
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            results = list(pool.map(probe_video, [pk for pk, _ in rows]))
+        probed = sum(results)
+
+        # Incremental updates are rounded per video; settle the exact totals once
+        course_ids = sorted({course_id for _, course_id in rows})
+        recount_course_hours(course_ids)
+
+        if probed < len(rows):
+            self.stdout.write(self.style.WARNING(f'{len(rows) - probed} video(s) could not be probed; see the logs'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Probed {probed} of {len(rows)} video(s) and recounted {len(course_ids)} course(s) '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,14 @@
+# video_courses/management/commands/purge_uploads.py
+from django.core.management.base import BaseCommand
+from video_courses.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Remove chunked uploads (and their staged files) that have not been touched for UPLOAD_EXPIRY seconds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help="Seconds since the last chunk (default UPLOAD_EXPIRY)")
+
+    def handle(self, *args, **options):
+        removed = purge_stale_uploads(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Removed {removed} stale upload(s)'))
@@ -0,0 +1,41 @@
+# video_courses/management/commands/transcode_videos.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from video_courses.models import CourseVideo
+from video_courses.transcode import transcode_video, transcoding_available
+
+
+class Command(BaseCommand):
+    help = 'Package course videos as adaptive-bitrate HLS (picks up jobs interrupted by a restart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int, help="Only these CourseVideo ids")
+        parser.add_argument('--include-failed', action='store_true', help="Retry videos whose packaging failed")
+        parser.add_argument('--all', action='store_true', help="Re-package every video, including ready ones")
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'VIDEO_TRANSCODE_WORKERS', 2))
+
+    def handle(self, *args, **options):
+        if not transcoding_available():
+            raise CommandError('ffmpeg and ffprobe must be installed (see FFMPEG_BINARY / FFPROBE_BINARY)')
+
+        videos = CourseVideo.objects.exclude(file='')
+        if options['video_ids']:
+            videos = videos.filter(pk__in=options['video_ids'])
+        elif not options['all']:
+            statuses = ['', 'queued', 'processing'] + (['failed'] if options['include_failed'] else [])
+            videos = videos.filter(hls_status__in=statuses)
+        ids = list(videos.values_list('pk', flat=True))
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            results = list(pool.map(transcode_video, ids))
+        ready = sum(results)
+
+        if ready < len(ids):
+            self.stdout.write(self.style.WARNING(f'{len(ids) - ready} video(s) failed; see hls_error in the admin'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Packaged {ready} of {len(ids)} video(s) as HLS in {time.monotonic() - started:.1f}s'
+        ))
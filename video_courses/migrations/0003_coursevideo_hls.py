@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_courses', '0002_videocourse_is_free'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_playlist',
+            field=models.CharField(blank=True, help_text='Master playlist, relative to MEDIA_ROOT', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_status',
+            field=models.CharField(blank=True, choices=[('', 'Not packaged'), ('queued', 'Queued'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='', max_length=12),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_courses', '0003_coursevideo_hls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='audio_codec',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='bitrate',
+            field=models.PositiveIntegerField(default=0, help_text='Overall bitrate in bits per second'),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='height',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='probed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='video_codec',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='width',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='coursevideo',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Detected by ffprobe after upload'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_courses', '0004_coursevideo_probe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='preview_sprite',
+            field=models.CharField(blank=True, help_text='Thumbnail sprite sheet, relative to MEDIA_ROOT', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='preview_vtt',
+            field=models.CharField(blank=True, help_text='WebVTT index of the sprite sheet', max_length=255),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-19 04:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_videos(apps, schema_editor):
+    CourseVideo = apps.get_model('video_courses', 'CourseVideo')
+    counters = {}
+    videos = CourseVideo.objects.order_by('course_id', 'id').only('pk', 'course_id')
+    for video in videos.iterator():
+        video.progress_bit = counters.get(video.course_id, 0)
+        counters[video.course_id] = video.progress_bit + 1
+        video.save(update_fields=['progress_bit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_courses', '0005_coursevideo_previews'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='progress_bit',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(number_videos, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_seconds', models.PositiveIntegerField(default=0)),
+                ('completed', models.BinaryField(default=b'', help_text='Bitmap of completed videos by CourseVideo.progress_bit')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_records', to='video_courses.videocourse')),
+                ('last_video', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='video_courses.coursevideo')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='video_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'course')},
+            },
+        ),
+    ]
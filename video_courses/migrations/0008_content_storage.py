@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 04:38
+
+import base.storage
+import video_courses.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_courses', '0007_upload_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coursevideo',
+            name='file',
+            field=models.FileField(storage=base.storage.content_storage, upload_to=video_courses.models.course_video_upload),
+        ),
+    ]
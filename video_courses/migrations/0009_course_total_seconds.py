@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 05:24
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def count_seconds(apps, schema_editor):
+    # Courses without probed videos keep their hand-entered total_hours
+    VideoCourse = apps.get_model('video_courses', 'VideoCourse')
+    totals = (
+        apps.get_model('video_courses', 'CourseVideo').objects.filter(probed_at__isnull=False)
+        .values_list('course_id').annotate(seconds=Sum('duration_seconds'))
+    )
+    for course_id, seconds in totals:
+        VideoCourse.objects.filter(pk=course_id).update(
+            total_seconds=seconds, total_hours=(Decimal(seconds) / 3600).quantize(Decimal('0.01')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_courses', '0008_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videocourse',
+            name='total_seconds',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of the probed video durations; total_hours follows it'),
+        ),
+        migrations.RunPython(count_seconds, migrations.RunPython.noop),
+    ]
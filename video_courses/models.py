@@ -1,15 +1,14 @@
-from django.db import models
+import posixpath
+import uuid
+
+from django.db import models, transaction
 from django.utils.text import slugify
-from django.core.files.storage import default_storage
 from django.conf import settings
 
+from base.storage import content_storage, is_blob
 
-# Optional: media duration extraction with moviepy
-try:
-    from moviepy.editor import VideoFileClip
-    MOVIEPY_AVAILABLE = True
-except Exception:
-    MOVIEPY_AVAILABLE = False
+from .previews import queue_previews
+from .probing import add_course_seconds, queue_probe
 
 
 
@@ -79,6 +78,7 @@ class VideoCourse(TimestampedModel):
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     rating_count = models.PositiveIntegerField(default=0)
     total_hours = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    total_seconds = models.PositiveIntegerField(default=0, help_text="Sum of the probed video durations; total_hours follows it")
 
 
     class Meta:
@@ -136,13 +136,41 @@ class CourseInclude(TimestampedModel):
 
 
 class CourseVideo(TimestampedModel):
+    HLS_STATUS_CHOICES = [
+        ("", "Not packaged"),
+        ("queued", "Queued"),
+        ("processing", "Processing"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+
     course = models.ForeignKey(VideoCourse, on_delete=models.CASCADE, related_name="videos")
     title = models.CharField(max_length=220)
-    duration_seconds = models.PositiveIntegerField(default=0, help_text="Auto-detected on save")
+    duration_seconds = models.PositiveIntegerField(default=0, help_text="Detected by ffprobe after upload")
     is_preview = models.BooleanField(default=False)
-    file = models.FileField(upload_to=course_video_upload)
+    file = models.FileField(upload_to=course_video_upload, storage=content_storage)
     thumb_image = models.ImageField(upload_to="video_courses/video_thumbs/", blank=True, null=True)
 
+    # Adaptive-bitrate rendition ladder (see video_courses/transcode.py)
+    hls_status = models.CharField(max_length=12, choices=HLS_STATUS_CHOICES, default="", blank=True)
+    hls_playlist = models.CharField(max_length=255, blank=True, help_text="Master playlist, relative to MEDIA_ROOT")
+    hls_error = models.TextField(blank=True)
+
+    # Filled in by ffprobe after upload (see video_courses/probing.py)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    video_codec = models.CharField(max_length=32, blank=True)
+    audio_codec = models.CharField(max_length=32, blank=True)
+    bitrate = models.PositiveIntegerField(default=0, help_text="Overall bitrate in bits per second")
+    probed_at = models.DateTimeField(null=True, blank=True)
+
+    # Scrub previews (see video_courses/previews.py)
+    preview_sprite = models.CharField(max_length=255, blank=True, help_text="Thumbnail sprite sheet, relative to MEDIA_ROOT")
+    preview_vtt = models.CharField(max_length=255, blank=True, help_text="WebVTT index of the sprite sheet")
+
+    # Position in the completion bitmap of CourseProgress; never reused within a course
+    progress_bit = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
 
     class Meta:
         ordering = ["id"]
@@ -152,39 +180,113 @@ class CourseVideo(TimestampedModel):
         return f"{self.course.name} - {self.title}"
 
 
+    @property
+    def hls_ready(self):
+        return self.hls_status == "ready" and bool(self.hls_playlist)
+
+
+    @property
+    def media_directory(self):
+        """Course directory for files derived from the upload (HLS, previews), e.g. video_courses/<slug>"""
+        if self.file.name and not is_blob(self.file.name):
+            # Uploaded before content-addressed storage: video_courses/<slug>/videos/<file>
+            return posixpath.dirname(posixpath.dirname(self.file.name))
+        return posixpath.dirname(posixpath.dirname(course_video_upload(self, "x")))
+
+
+    @property
+    def counted_seconds(self):
+        """Seconds this video contributes to its course's ``total_hours`` (probed videos only)"""
+        return self.duration_seconds if self.probed_at else 0
+
+
     def save(self, *args, **kwargs):
-        # Save first to ensure file exists in storage
-        super().save(*args, **kwargs)
-
-
-        # If duration is zero and we can read it, try extract
-        if self.file and self.duration_seconds in (0, None) and MOVIEPY_AVAILABLE:
-            try:
-                # Build absolute path (works with default local storage)
-                file_path = self.file.path if hasattr(self.file, "path") else None
-                if not file_path:
-                    # If using non-local storage, download temporarily
-                    tmp_name = f"_tmp_{self.pk}.media"
-                    with default_storage.open(self.file.name, "rb") as src, open(tmp_name, "wb") as dst:
-                        dst.write(src.read())
-                    file_path = tmp_name
-
-
-                with VideoFileClip(file_path) as clip:
-                    duration = int(round(clip.duration or 0))
-                    if duration > 0 and duration != self.duration_seconds:
-                        self.duration_seconds = duration
-                        # Save again only if changed
-                        super().save(update_fields=["duration_seconds"])
-
-
-                # Cleanup temp if used
-                if file_path and file_path.startswith("_tmp_"):
-                    import os
-                    try:
-                        os.remove(file_path)
-                    except Exception:
-                        pass
-            except Exception:
-                # Silently ignore extraction errors
-                pass
+        previous = None
+        if self.pk:
+            previous = CourseVideo.objects.filter(pk=self.pk).values(
+                "file", "course_id", "duration_seconds", "probed_at"
+            ).first()
+        file_changed = bool(self.file) and self.file.name != (previous or {}).get("file")
+
+        with transaction.atomic():
+            if self.progress_bit is None or (previous and previous["course_id"] != self.course_id):
+                last_bit = CourseVideo.objects.filter(course_id=self.course_id).aggregate(
+                    last=models.Max("progress_bit")
+                )["last"]
+                self.progress_bit = 0 if last_bit is None else last_bit + 1
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {*kwargs["update_fields"], "progress_bit"}
+            super().save(*args, **kwargs)
+            # Keep course totals in step with edits and moves between courses
+            before = previous["duration_seconds"] if previous and previous["probed_at"] else 0
+            if previous and previous["course_id"] != self.course_id:
+                add_course_seconds(previous["course_id"], -before)
+                before = 0
+            add_course_seconds(self.course_id, self.counted_seconds - before)
+
+        # Metadata, previews and HLS renditions are produced in the background after commit
+        if file_changed:
+            queue_probe(self)
+            queue_previews(self)
+            if getattr(settings, "VIDEO_TRANSCODE_ON_UPLOAD", True):
+                from .transcode import queue_transcode
+                queue_transcode(self)
+
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            add_course_seconds(self.course_id, -self.counted_seconds)
+            return super().delete(*args, **kwargs)
+
+
+
+class CourseProgress(models.Model):
+    """Where a student is in a video course; one row per user and course (see video_courses/progress.py)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="video_progress")
+    course = models.ForeignKey(VideoCourse, on_delete=models.CASCADE, related_name="progress_records")
+    last_video = models.ForeignKey(CourseVideo, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    position_seconds = models.PositiveIntegerField(default=0)
+    completed = models.BinaryField(default=b"", help_text="Bitmap of completed videos by CourseVideo.progress_bit")
+    completed_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    class Meta:
+        unique_together = ("user", "course")
+
+
+    def __str__(self):
+        return f"{self.user} - {self.course.name} ({self.completed_count} done)"
+
+
+class UploadSession(models.Model):
+    """A resumable chunked upload of a large video or PDF (see video_courses/uploads.py)"""
+    STATUS_CHOICES = [
+        ("uploading", "Uploading"),
+        ("complete", "Complete"),
+        ("failed", "Failed"),
+    ]
+    KIND_CHOICES = [
+        ("video", "Course video"),
+        ("pdf", "E-library PDF"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_sessions")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    length = models.PositiveBigIntegerField(help_text="Total size in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Bytes received so far")
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Digest of the assembled file")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="uploading")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "updated_at"])]
+
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.length} bytes, {self.status})"
@@ -0,0 +1,142 @@
+"""
+Offline download packs for purchased video courses.
+
+A pack is the lowest-bitrate HLS rendition of every packaged video in a
+course. Its chunks are the rendition's segments: a few hundred KB each, so
+an interrupted download resumes at the next missing chunk. The pack
+manifest lists every chunk with its SHA-256, size and a signed URL (served
+with Range support and immutable caching by ``signed_media``). The service
+worker keeps chunks in the Cache API under their hash, so a re-sync only
+fetches chunks it does not already hold.
+
+Hashes of a rendition are computed once and stored next to it as
+``offline.json``; HLS output directories never change after packaging.
+"""
+import hashlib
+import json
+import posixpath
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .signing import signed_url, url_ttl
+
+HASHES_NAME = 'offline.json'
+RENDITION_RE = re.compile(r'^(\d+)p$')
+# Synthetic URLs the service worker answers from its pack cache
+OFFLINE_PREFIX = '/offline-packs/'
+
+
+def offline_chunk_url(sha256):
+    return f"{OFFLINE_PREFIX}chunks/{sha256}.ts"
+
+
+def offline_playlist_url(video_id):
+    return f"{OFFLINE_PREFIX}videos/{video_id}/index.m3u8"
+
+
+def lowest_rendition(hls_dir):
+    """Name of the smallest rendition directory, e.g. ``360p``"""
+    heights = []
+    for name in default_storage.listdir(hls_dir)[0]:
+        match = RENDITION_RE.match(name)
+        if match:
+            heights.append((int(match.group(1)), name))
+    return min(heights)[1] if heights else None
+
+
+def _digest(name):
+    with default_storage.open(name, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def rendition_hashes(video):
+    """
+    ``{'rendition', 'playlist', 'chunks': [{'name', 'sha256', 'size'}]}`` for
+    the lowest rendition of a packaged video, computed on first use.
+    """
+    hls_dir = posixpath.dirname(video.hls_playlist)
+    cached = posixpath.join(hls_dir, HASHES_NAME)
+    try:
+        with default_storage.open(cached, 'rb') as f:
+            return json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        # Missing, or still being written by a concurrent request
+        pass
+
+    rendition = lowest_rendition(hls_dir)
+    if rendition is None:
+        return None
+    rendition_dir = posixpath.join(hls_dir, rendition)
+    with default_storage.open(posixpath.join(rendition_dir, 'index.m3u8'), 'rb') as f:
+        playlist = f.read().decode('utf-8')
+    chunks = []
+    for line in playlist.splitlines():
+        name = line.strip()
+        if name and not name.startswith('#'):
+            path = posixpath.join(rendition_dir, name)
+            chunks.append({'name': name, 'sha256': _digest(path), 'size': default_storage.size(path)})
+    info = {'rendition': rendition, 'playlist': playlist, 'chunks': chunks}
+
+    # Two requests racing here compute the same content; the second one keeps the first file
+    if not default_storage.exists(cached):
+        default_storage.save(cached, ContentFile(json.dumps(info).encode('utf-8')))
+    return info
+
+
+def offline_playlist(info):
+    """Rendition playlist with segment URIs pointing at the pack cache"""
+    hashes = {chunk['name']: chunk['sha256'] for chunk in info['chunks']}
+    lines = []
+    for line in info['playlist'].splitlines():
+        name = line.strip()
+        lines.append(offline_chunk_url(hashes[name]) if name in hashes else line)
+    return '\n'.join(lines) + '\n'
+
+
+def build_pack(user, course):
+    """Pack manifest of ``course`` for ``user``, who must have course access"""
+    resource = f"video_course:{course.pk}"
+    videos, digest, total = [], hashlib.sha256(), 0
+    for video in course.videos.all():
+        entry = {'id': video.pk, 'title': video.title, 'duration': video.duration_seconds}
+        info = rendition_hashes(video) if video.hls_ready else None
+        if info is None:
+            # Not packaged as HLS (yet): streaming only
+            entry['available'] = False
+            videos.append(entry)
+            continue
+        rendition_dir = posixpath.join(posixpath.dirname(video.hls_playlist), info['rendition'])
+        chunks = [
+            {
+                'sha256': chunk['sha256'],
+                'size': chunk['size'],
+                'url': signed_url(user.pk, resource, rendition_dir + '/', chunk['name']),
+            }
+            for chunk in info['chunks']
+        ]
+        entry.update({
+            'available': True,
+            'rendition': info['rendition'],
+            'playlist_url': offline_playlist_url(video.pk),
+            'playlist': offline_playlist(info),
+            'chunks': chunks,
+        })
+        videos.append(entry)
+        size = sum(chunk['size'] for chunk in chunks)
+        total += size
+        digest.update(f"{video.pk}:{info['rendition']}:".encode())
+        digest.update(''.join(chunk['sha256'] for chunk in chunks).encode())
+
+    return {
+        'course': course.pk,
+        'name': course.name,
+        'version': digest.hexdigest()[:16],
+        'size': total,
+        'manifest_url': reverse('video_offline_pack', args=[course.pk]),
+        # Chunk URLs are signed; sync again before they expire to refresh them
+        'expires_in': url_ttl() * 3 // 4,
+        'videos': videos,
+    }
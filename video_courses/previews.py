@@ -0,0 +1,198 @@
+"""
+Poster frames and scrub-preview sprites for course videos.
+
+For every uploaded CourseVideo a background job extracts a poster frame
+and one sprite sheet of small thumbnails taken every few seconds, plus a
+WebVTT index mapping each time range to its tile (``sprite.jpg#xywh=...``).
+Players load the index and the sheet once and show seek previews without
+touching the video bytes.
+
+Files live next to the course's uploads in ``<course>/previews/<pk>/`` and
+are named after a hash of their content, so they are served as immutable
+and a replaced upload never collides with cached copies of the old ones.
+"""
+import hashlib
+import logging
+import math
+import os
+import posixpath
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .probing import local_source, media_info
+from .transcode import ffmpeg_binary, run_tool, transcoding_available
+
+logger = logging.getLogger(__name__)
+
+TILE_WIDTH = 160
+SPRITE_COLUMNS = 10
+# One sheet is enough: long videos get a wider interval instead of more tiles
+SPRITE_MAX_TILES = 100
+SPRITE_MIN_INTERVAL = 5
+POSTER_WIDTH = 640
+TEMP_PREFIX = '.tmp-'
+
+
+# ---------------------------------------------
+# ffmpeg commands
+# ---------------------------------------------
+def poster_command(source, out_path, duration):
+    offset = min(5.0, duration / 10) if duration else 0
+    return [
+        ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y', '-ss', f'{offset:.2f}', '-i', source,
+        '-frames:v', '1', '-vf', f'scale={POSTER_WIDTH}:-2', '-q:v', '3', '-f', 'image2', out_path,
+    ]
+
+
+def sprite_layout(duration, width, height):
+    """(interval seconds, tile count, columns, tile height) for a video"""
+    interval = max(SPRITE_MIN_INTERVAL, math.ceil(duration / SPRITE_MAX_TILES))
+    count = max(1, math.ceil(duration / interval))
+    tile_height = 2 * round(TILE_WIDTH * height / width / 2) if width and height else TILE_WIDTH * 9 // 16
+    return interval, count, min(count, SPRITE_COLUMNS), tile_height
+
+
+def sprite_command(source, out_path, interval, count, columns, tile_height):
+    rows = math.ceil(count / columns)
+    return [
+        ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y', '-i', source,
+        '-vf', f'fps=1/{interval},scale={TILE_WIDTH}:{tile_height},tile={columns}x{rows}',
+        '-frames:v', '1', '-q:v', '5', '-f', 'image2', out_path,
+    ]
+
+
+def _timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def webvtt(sprite_name, duration, interval, count, columns, tile_height):
+    """WebVTT cues pointing each interval at its tile of the sprite sheet"""
+    lines = ['WEBVTT', '']
+    for i in range(count):
+        start = i * interval
+        end = min(duration, start + interval) if duration else start + interval
+        x, y = (i % columns) * TILE_WIDTH, (i // columns) * tile_height
+        lines += [
+            f"{_timestamp(start)} --> {_timestamp(end)}",
+            f"{sprite_name}#xywh={x},{y},{TILE_WIDTH},{tile_height}",
+            '',
+        ]
+    return '\n'.join(lines)
+
+
+# ---------------------------------------------
+# Storage
+# ---------------------------------------------
+def previews_directory(video):
+    """Storage-relative directory, e.g. video_courses/<slug>/previews/<pk>"""
+    return posixpath.join(video.media_directory, 'previews', str(video.pk))
+
+
+def _hashed_name(prefix, data, extension):
+    return f"{prefix}-{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+
+def _publish(directory, prefix, data, extension):
+    """Store ``data`` under its content-hashed name; returns the file name"""
+    name = posixpath.join(directory, _hashed_name(prefix, data, extension))
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return posixpath.basename(name)
+
+
+def _prune(directory, keep):
+    """Remove previews of earlier uploads; in-flight temp files are left alone"""
+    try:
+        names = default_storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name not in keep and not name.startswith(TEMP_PREFIX):
+            try:
+                default_storage.delete(posixpath.join(directory, name))
+            except OSError:
+                pass
+
+
+def _render(args, out_path):
+    try:
+        run_tool(args)
+        with open(out_path, 'rb') as f:
+            return f.read()
+    finally:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+
+
+def is_generated_poster(video, name):
+    """Whether ``name`` is a poster written by this module or by older HLS jobs"""
+    if not name or not video.file:
+        return False
+    return name.startswith((previews_directory(video) + '/', posixpath.join(video.media_directory, 'hls') + '/'))
+
+
+# ---------------------------------------------
+# Jobs
+# ---------------------------------------------
+def generate_previews(video_id):
+    """Extract poster, sprite sheet and WebVTT index for one video"""
+    from .models import CourseVideo
+
+    video = CourseVideo.objects.filter(pk=video_id).first()
+    if video is None or not video.file:
+        return False
+    source_name = video.file.name
+    directory = previews_directory(video)
+    started = timezone.now()
+    try:
+        # Frames are rendered locally and stored once their content hash is known
+        with local_source(source_name, video.file.storage) as source, tempfile.TemporaryDirectory(prefix='previews-') as tmp:
+            poster_tmp = os.path.join(tmp, 'poster.jpg')
+            sprite_tmp = os.path.join(tmp, 'sprite.jpg')
+            info = media_info(source)
+            duration = info['duration']
+            interval, count, columns, tile_height = sprite_layout(duration, info['width'], info['height'])
+            poster = _render(poster_command(source, poster_tmp, duration), poster_tmp)
+            sprite = _render(sprite_command(source, sprite_tmp, interval, count, columns, tile_height), sprite_tmp)
+    except Exception as e:
+        logger.error(f"Preview generation for video {video_id} failed: {e}")
+        return False
+
+    poster_name = _publish(directory, 'poster', poster, '.jpg')
+    sprite_name = _publish(directory, 'sprite', sprite, '.jpg')
+    index = webvtt(sprite_name, duration, interval, count, columns, tile_height)
+    vtt_name = _publish(directory, 'sprite', index.encode('utf-8'), '.vtt')
+
+    updates = {
+        'preview_sprite': posixpath.join(directory, sprite_name),
+        'preview_vtt': posixpath.join(directory, vtt_name),
+    }
+    thumb = video.thumb_image.name if video.thumb_image else ''
+    if not thumb or is_generated_poster(video, thumb):
+        # Use the poster unless a thumbnail was uploaded by hand
+        updates['thumb_image'] = posixpath.join(directory, poster_name)
+    # Only publish if the upload was not replaced while we were working
+    if not CourseVideo.objects.filter(pk=video_id, file=source_name).update(**updates):
+        return False
+    _prune(directory, {sprite_name, vtt_name, poster_name})
+    logger.info(
+        f"Generated previews for video {video_id} ({count} tiles every {interval}s) "
+        f"in {(timezone.now() - started).total_seconds():.1f}s"
+    )
+    return True
+
+
+def queue_previews(video):
+    """Generate previews for ``video`` in the background once its upload is committed"""
+    from .jobs import submit_after_commit
+
+    if not transcoding_available():
+        logger.warning(f"ffmpeg/ffprobe not found; no previews for video {video.pk}")
+        return False
+    submit_after_commit(generate_previews, video.pk)
+    return True
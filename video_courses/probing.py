@@ -0,0 +1,186 @@
+"""
+Background extraction of course video metadata with ffprobe.
+
+Duration, resolution, codecs and bitrate are read after the upload has
+committed instead of inside the admin request. ffprobe reads the stored
+file directly: a local path when the storage has one, the file's URL for
+remote storages (ffprobe fetches only the byte ranges it needs), or as a
+last resort a copy streamed in fixed-size chunks to a system temp file.
+Memory use stays bounded in every case.
+
+Course ``total_hours`` follows each probed duration change with an F()
+update, so concurrent probes of one course never overwrite each other.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+PROBE_TIMEOUT = 120
+
+
+class ProbeError(Exception):
+    pass
+
+
+def ffprobe_binary():
+    return getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+
+
+def probing_available():
+    return bool(shutil.which(ffprobe_binary()))
+
+
+@contextmanager
+def local_source(name, storage=None):
+    """Something ffprobe/ffmpeg can open for a stored file"""
+    storage = storage or default_storage
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    url = storage.url(name)
+    if url.startswith(('http://', 'https://')):
+        yield url
+        return
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1]) as tmp:
+        with storage.open(name, 'rb') as src:
+            shutil.copyfileobj(src, tmp, COPY_CHUNK_SIZE)
+        tmp.flush()
+        yield tmp.name
+
+
+def media_info(source):
+    """Duration, size, codecs, bitrate and audio presence of a media file"""
+    args = [ffprobe_binary(), '-v', 'error', '-print_format', 'json', '-show_streams', '-show_format', source]
+    try:
+        result = subprocess.run(args, capture_output=True, timeout=PROBE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise ProbeError(f"ffprobe timed out after {PROBE_TIMEOUT}s")
+    if result.returncode != 0:
+        raise ProbeError(result.stderr.decode('utf-8', 'replace')[-2000:] or "ffprobe failed")
+
+    info = json.loads(result.stdout)
+    streams = info.get('streams', [])
+    container = info.get('format', {})
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if video is None:
+        raise ProbeError("No video stream found")
+    return {
+        'width': int(video.get('width') or 0),
+        'height': int(video.get('height') or 0),
+        'duration': float(container.get('duration') or video.get('duration') or 0),
+        'video_codec': video.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', '') if audio else '',
+        'bitrate': int(container.get('bit_rate') or 0),
+        'has_audio': audio is not None,
+    }
+
+
+# ---------------------------------------------
+# Course totals
+# ---------------------------------------------
+def _hours(seconds):
+    return (Decimal(seconds) / 3600).quantize(Decimal('0.01'))
+
+
+def add_course_seconds(course_id, seconds):
+    """
+    Shift a course's ``total_seconds`` by ``seconds`` and derive
+    ``total_hours`` from the new sum, so rounding never accumulates
+    """
+    if not seconds:
+        return
+    from .models import VideoCourse
+
+    course = VideoCourse.objects.filter(pk=course_id)
+    with transaction.atomic():
+        # The UPDATE holds the row until commit, so the sum read back is ours
+        course.update(total_seconds=Greatest(F('total_seconds') + seconds, Value(0)))
+        total = course.values_list('total_seconds', flat=True).first()
+        if total is not None:
+            course.update(total_hours=_hours(total))
+
+
+def recount_course_hours(course_ids):
+    """Set ``total_seconds``/``total_hours`` to the exact sum of the courses' probed video durations"""
+    from .models import CourseVideo, VideoCourse
+
+    totals = dict(
+        CourseVideo.objects.filter(course_id__in=course_ids, probed_at__isnull=False)
+        .values_list('course_id').annotate(seconds=Sum('duration_seconds'))
+    )
+    for course_id in course_ids:
+        seconds = totals.get(course_id) or 0
+        VideoCourse.objects.filter(pk=course_id).update(total_seconds=seconds, total_hours=_hours(seconds))
+
+
+# ---------------------------------------------
+# Jobs
+# ---------------------------------------------
+def probe_video(video_id):
+    """Probe one video's stored file and record its metadata"""
+    from .models import CourseVideo
+
+    video = CourseVideo.objects.filter(pk=video_id).only('file').first()
+    if video is None or not video.file:
+        return False
+    source_name = video.file.name
+    try:
+        with local_source(source_name, video.file.storage) as source:
+            info = media_info(source)
+    except (ProbeError, OSError, ValueError) as e:
+        logger.error(f"Probing video {video_id} failed: {e}")
+        return False
+
+    duration = int(round(info['duration']))
+    with transaction.atomic():
+        # Skip if the upload was replaced while probing; its own job follows
+        row = (
+            CourseVideo.objects.select_for_update().filter(pk=video_id, file=source_name)
+            .values('duration_seconds', 'probed_at', 'course_id').first()
+        )
+        if row is None:
+            return False
+        CourseVideo.objects.filter(pk=video_id).update(
+            duration_seconds=duration,
+            width=info['width'],
+            height=info['height'],
+            video_codec=info['video_codec'][:32],
+            audio_codec=info['audio_codec'][:32],
+            bitrate=info['bitrate'],
+            probed_at=timezone.now(),
+        )
+        # A preset duration of a video never probed was not counted yet
+        counted = row['duration_seconds'] if row['probed_at'] else 0
+        add_course_seconds(row['course_id'], duration - counted)
+    return True
+
+
+def queue_probe(video):
+    """Probe ``video`` in the background once its upload is committed"""
+    from .jobs import submit_after_commit
+
+    if not probing_available():
+        logger.warning(f"ffprobe not found; metadata of video {video.pk} was not extracted")
+        return False
+    submit_after_commit(probe_video, video.pk)
+    return True
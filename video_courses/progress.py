@@ -0,0 +1,182 @@
+"""
+Batched watch progress for video courses.
+
+The player posts a heartbeat with the current position every few seconds.
+Heartbeats are coalesced per (user, course) in a per-worker buffer (only the
+latest position survives) and mirrored to the cache, so resume points are
+fresh on every worker before they reach the database. The buffer is written
+with one bulk upsert of ``CourseProgress`` rows every
+``VIDEO_PROGRESS_FLUSH_INTERVAL`` seconds, when it holds
+``VIDEO_PROGRESS_BUFFER_SIZE`` users, when a video is completed, or at exit.
+
+Each row is compact: last video, position, and a bitmap of completed videos
+indexed by ``CourseVideo.progress_bit``.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# A video counts as watched once this share of it has been played
+COMPLETE_RATIO = 0.9
+CACHE_TIMEOUT = 24 * 3600
+
+_buffer = {}
+_buffer_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+# ---------------------------------------------
+# Completion bitmap
+# ---------------------------------------------
+def set_bit(bitmap, index):
+    data = bytearray(bitmap or b'')
+    byte, bit = divmod(index, 8)
+    if len(data) <= byte:
+        data.extend(b'\x00' * (byte + 1 - len(data)))
+    data[byte] |= 1 << bit
+    return bytes(data)
+
+
+def has_bit(bitmap, index):
+    byte, bit = divmod(index, 8)
+    return bool(bitmap) and byte < len(bitmap) and bool(bitmap[byte] & (1 << bit))
+
+
+def count_bits(bitmap):
+    return sum(bin(byte).count('1') for byte in bytes(bitmap or b''))
+
+
+# ---------------------------------------------
+# Heartbeats
+# ---------------------------------------------
+def _cache_key(user_id, course_id):
+    return f"video_progress:{user_id}:{course_id}"
+
+
+def is_complete(video, position, ended=False):
+    return ended or bool(video.duration_seconds and position >= video.duration_seconds * COMPLETE_RATIO)
+
+
+def record_heartbeat(user_id, video, position, ended=False):
+    """Buffer the player's position; completed videos are written at once"""
+    global _last_flush
+    position = max(0, int(position))
+    completed = is_complete(video, position, ended)
+    key = (user_id, video.course_id)
+
+    cache.set(_cache_key(*key), {'video_id': video.pk, 'position': position}, CACHE_TIMEOUT)
+    with _buffer_lock:
+        entry = _buffer.setdefault(key, {'completed': set()})
+        entry['video_id'] = video.pk
+        entry['position'] = position
+        if completed and video.progress_bit is not None:
+            entry['completed'].add(video.progress_bit)
+        due = (
+            completed
+            or len(_buffer) >= getattr(settings, 'VIDEO_PROGRESS_BUFFER_SIZE', 500)
+            or time.monotonic() - _last_flush >= getattr(settings, 'VIDEO_PROGRESS_FLUSH_INTERVAL', 30)
+        )
+    if due:
+        flush_progress()
+    return completed
+
+
+def flush_progress():
+    """Upsert every buffered entry; returns the number of rows written"""
+    global _buffer, _last_flush
+    with _buffer_lock:
+        entries, _buffer = _buffer, {}
+        _last_flush = time.monotonic()
+    if not entries:
+        return 0
+    try:
+        _write(entries)
+    except Exception as e:
+        logger.error(f"Error flushing watch progress: {e}")
+        with _buffer_lock:
+            # Newer heartbeats win; completed videos are kept either way
+            for key, entry in entries.items():
+                newer = _buffer.get(key)
+                if newer is None:
+                    _buffer[key] = entry
+                else:
+                    newer['completed'] |= entry['completed']
+        return 0
+    return len(entries)
+
+
+def _write(entries):
+    from .models import CourseProgress
+
+    user_ids = {user_id for user_id, _ in entries}
+    course_ids = {course_id for _, course_id in entries}
+    with transaction.atomic():
+        existing = {
+            (row.user_id, row.course_id): bytes(row.completed)
+            for row in CourseProgress.objects.select_for_update()
+            .filter(user_id__in=user_ids, course_id__in=course_ids).only('user_id', 'course_id', 'completed')
+        }
+        rows = []
+        for (user_id, course_id), entry in entries.items():
+            bitmap = existing.get((user_id, course_id), b'')
+            for index in entry['completed']:
+                bitmap = set_bit(bitmap, index)
+            rows.append(CourseProgress(
+                user_id=user_id,
+                course_id=course_id,
+                last_video_id=entry['video_id'],
+                position_seconds=entry['position'],
+                completed=bitmap,
+                completed_count=count_bits(bitmap),
+            ))
+        CourseProgress.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['user', 'course'],
+            update_fields=['last_video', 'position_seconds', 'completed', 'completed_count', 'updated_at'],
+        )
+
+
+atexit.register(flush_progress)
+
+
+# ---------------------------------------------
+# Resume points
+# ---------------------------------------------
+def progress_for_courses(user, course_ids):
+    """
+    ``{course_id: {'video_id', 'position', 'completed', 'completed_count'}}``
+    for the user's courses: one row read plus one cache read for fresher
+    positions that have not been flushed yet.
+    """
+    from .models import CourseProgress
+
+    if not user.is_authenticated or not course_ids:
+        return {}
+    progress = {
+        row.course_id: {
+            'video_id': row.last_video_id,
+            'position': row.position_seconds,
+            'completed': bytes(row.completed),
+            'completed_count': row.completed_count,
+        }
+        for row in CourseProgress.objects.filter(user=user, course_id__in=course_ids)
+    }
+    cached = cache.get_many([_cache_key(user.pk, course_id) for course_id in course_ids])
+    for course_id in course_ids:
+        latest = cached.get(_cache_key(user.pk, course_id))
+        if latest:
+            entry = progress.setdefault(course_id, {'completed': b'', 'completed_count': 0})
+            entry.update(latest)
+    return progress
+
+
+def course_progress(user, course_id):
+    return progress_for_courses(user, [course_id]).get(course_id)
@@ -0,0 +1,145 @@
+"""
+Signed, expiring media URLs.
+
+A course page checks the viewer's entitlement once and mints URLs of the
+form ``/signed-media/<token>/<name>``. The token is an HMAC-signed payload
+(``django.core.signing``) naming the user, the purchasable resource (e.g.
+``video_course:12``), a storage scope and an expiry. Every later request
+(HLS playlists and segments, preview sprites, byte ranges of a file) is
+verified from the token alone: no session, user or database lookup.
+
+* Scope: a storage directory ending in ``/`` (relative playlist and sprite
+  URLs resolve inside it) or a single file.
+* Expiry: ``MEDIA_URL_TTL`` seconds. Issue times are rounded down to a
+  quarter of that, so the same viewer gets the same URLs for a while and
+  browser caches keep working across page views.
+* Key rotation: tokens are signed with ``MEDIA_SIGNING_KEY`` (default
+  SECRET_KEY) and still accepted when signed with any key in
+  ``MEDIA_SIGNING_KEY_FALLBACKS`` (default SECRET_KEY_FALLBACKS).
+* Revocation: tokens carry the ``media_token_version`` of the user's
+  ``UserCourseAccess`` row (0 when there is none, e.g. free content). When
+  access is lost (refund, deactivation) the version is bumped in the
+  database, and a deleted grant reads as 0; tokens carrying another version
+  are refused. The version is cached for ``MEDIA_TOKEN_VERSION_CACHE_TTL``
+  seconds in front of the database, so with a per-process cache other
+  workers honour a revocation within that delay.
+"""
+import posixpath
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import F
+from django.urls import reverse
+
+SALT = 'video_courses.signed-media'
+DEFAULT_TTL = 6 * 3600
+TTL_BUCKETS = 4
+DEFAULT_VERSION_CACHE_TTL = 30
+
+
+class MediaTokenRevoked(signing.BadSignature):
+    pass
+
+
+def url_ttl():
+    return getattr(settings, 'MEDIA_URL_TTL', DEFAULT_TTL)
+
+
+def _signer():
+    key = getattr(settings, 'MEDIA_SIGNING_KEY', None) or settings.SECRET_KEY
+    fallbacks = getattr(settings, 'MEDIA_SIGNING_KEY_FALLBACKS', None)
+    if fallbacks is None:
+        fallbacks = settings.SECRET_KEY_FALLBACKS
+    return signing.Signer(key=key, salt=SALT, fallback_keys=fallbacks)
+
+
+def _version_key(user_id, resource):
+    return f"media_token_version:{user_id}:{resource}"
+
+
+def _grant(user_id, resource):
+    from base.models import UserCourseAccess
+
+    course_type, course_id = resource.rsplit(':', 1)
+    return UserCourseAccess.objects.filter(user_id=user_id, course_id=int(course_id), course_type=course_type)
+
+
+def token_version(user_id, resource):
+    """Current ``media_token_version`` of the grant, 0 without one (cached briefly)"""
+    key = _version_key(user_id, resource)
+    version = cache.get(key)
+    if version is None:
+        version = _grant(user_id, resource).values_list('media_token_version', flat=True).first() or 0
+        cache.set(key, version, getattr(settings, 'MEDIA_TOKEN_VERSION_CACHE_TTL', DEFAULT_VERSION_CACHE_TTL))
+    return version
+
+
+# ---------------------------------------------
+# Tokens
+# ---------------------------------------------
+def mint_token(user_id, resource, scope):
+    ttl = url_ttl()
+    bucket = max(1, ttl // TTL_BUCKETS)
+    issued = int(time.time()) // bucket * bucket
+    payload = {'u': user_id or 0, 'r': resource, 's': scope, 'e': issued + ttl}
+    if user_id:
+        payload['g'] = token_version(user_id, resource)
+    return _signer().sign_object(payload, compress=True)
+
+
+def verify_token(token):
+    """Payload of a valid token; raises ``signing.BadSignature`` otherwise"""
+    payload = _signer().unsign_object(token)
+    if payload['e'] < time.time():
+        raise signing.SignatureExpired("Media URL expired")
+    if payload['u'] and payload.get('g') != token_version(payload['u'], payload['r']):
+        raise MediaTokenRevoked("Media URL revoked")
+    return payload
+
+
+def revoke_media_tokens(user_id, resource):
+    """Refuse every URL minted so far for ``user_id`` and ``resource``"""
+    _grant(user_id, resource).update(media_token_version=F('media_token_version') + 1)
+    cache.delete(_version_key(user_id, resource))
+
+
+def forget_media_token_version(user_id, resource):
+    """Drop the cached version after the grant was created or deleted"""
+    cache.delete(_version_key(user_id, resource))
+
+
+def scoped_path(scope, name):
+    """Storage path for ``name`` requested under ``scope``, or None if outside it"""
+    if scope.endswith('/'):
+        path = posixpath.normpath(posixpath.join(scope, name))
+        return path if path.startswith(scope) else None
+    return scope if name == posixpath.basename(scope) else None
+
+
+# ---------------------------------------------
+# URLs
+# ---------------------------------------------
+def signed_url(user_id, resource, scope, name):
+    return reverse('signed_media', args=[mint_token(user_id, resource, scope), name])
+
+
+def video_urls(user, video):
+    """
+    Signed playback and scrub-preview URLs of a video. The caller must have
+    checked that ``user`` may watch it.
+    """
+    # Preview videos are free, so their URLs are not tied to (or revoked with) a purchase
+    user_id = user.pk if user.is_authenticated and not video.is_preview else 0
+    resource = f"video_course:{video.course_id}"
+    if video.hls_ready:
+        directory, entry = posixpath.split(video.hls_playlist)
+        play_url, play_type = signed_url(user_id, resource, directory + '/', entry), 'application/x-mpegURL'
+    else:
+        play_url, play_type = signed_url(user_id, resource, video.file.name, posixpath.basename(video.file.name)), 'video/mp4'
+    thumbnails_url = ''
+    if video.preview_vtt:
+        directory, entry = posixpath.split(video.preview_vtt)
+        thumbnails_url = signed_url(user_id, resource, directory + '/', entry)
+    return {'play_url': play_url, 'play_type': play_type, 'thumbnails_url': thumbnails_url}
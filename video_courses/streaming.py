@@ -0,0 +1,337 @@
+"""
+Authorized delivery of course videos and e-library PDFs.
+
+Videos and PDFs are not linked straight to their MEDIA_URL. The views check
+once per user and course whether the viewer has access, then either stream
+the file themselves, honouring HTTP Range
+requests so players can seek and PDF viewers can fetch single pages, or
+hand the transfer to the reverse proxy:
+
+* ``VIDEO_STREAM_OFFLOAD = None``: Django streams. Responses, byte ranges
+  included, go through ``FileResponse`` so WSGI servers with
+  ``wsgi.file_wrapper`` (gunicorn) copy them with ``os.sendfile``; other
+  servers read ``VIDEO_STREAM_CHUNK_SIZE`` blocks.
+* ``'x-accel-redirect'`` (nginx): Django only authorizes and answers with an
+  ``X-Accel-Redirect`` to ``VIDEO_STREAM_ACCEL_PREFIX`` + file name, which
+  must be an ``internal`` location aliased to MEDIA_ROOT.
+* ``'x-sendfile'`` (Apache mod_xsendfile, lighttpd): same, with the absolute
+  file path.
+
+On object storage (``base.s3``) entitled requests are redirected to a
+short-lived presigned URL and the bytes come straight from the bucket;
+the offload settings do not apply. Playlists and WebVTT indexes are still
+answered by Django because they refer to their siblings by relative URL,
+which must resolve to this view and not to the bucket.
+
+The access answer is cached only when the default cache is shared by all
+workers (memcached, Redis, database): a change of ``UserCourseAccess`` then
+drops it everywhere at once. With a per-process cache (the LocMem default)
+every check reads the grant, and ``manage.py check`` warns in production.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils import timezone
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+ENTITLEMENT_TIMEOUT = 300
+
+PRIVATE_CACHE = 'private, max-age=3600, no-transform'
+# HLS output is written once into a versioned directory and never modified
+IMMUTABLE_CACHE = 'private, max-age=31536000, immutable'
+
+# Text files referring to siblings by relative URL; never redirected to the bucket
+PROXIED_EXTENSIONS = ('.m3u8', '.vtt')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# System MIME tables disagree on these (.ts is often TypeScript)
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.mp4': 'video/mp4',
+    '.vtt': 'text/vtt',
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def chunk_size():
+    return getattr(settings, 'VIDEO_STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+# ---------------------------------------------
+# Entitlement
+# ---------------------------------------------
+def _entitlement_key(user_id, course_id, course_type):
+    return f"entitlement:{course_type}:{user_id}:{course_id}"
+
+
+def shared_cache():
+    """Whether the default cache is seen by every worker, so a delete reaches them all"""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def forget_entitlement(user_id, course_id, course_type='video_course'):
+    """Drop the cached answer after a user's access to a course changed"""
+    cache.delete(_entitlement_key(user_id, course_id, course_type))
+
+
+def _course_access(user, course, course_type):
+    """Whether ``user`` may use all content of ``course``; returns (allowed, seconds valid)"""
+    from base.models import UserCourseAccess
+
+    if user.is_staff:
+        return True, ENTITLEMENT_TIMEOUT
+    access = UserCourseAccess.objects.filter(
+        user=user, course_id=course.pk, course_type=course_type
+    ).first()
+    if access is None or not access.has_access:
+        return False, ENTITLEMENT_TIMEOUT
+    timeout = ENTITLEMENT_TIMEOUT
+    if access.expires_at:
+        # Never cache a grant past its expiry
+        timeout = min(timeout, max(1, int((access.expires_at - timezone.now()).total_seconds())))
+    return True, timeout
+
+
+def can_access_course(user, course, course_type='video_course'):
+    """Whether ``user`` may use all content of ``course`` (cached)"""
+    if not user.is_authenticated:
+        return False
+    if not shared_cache():
+        return _course_access(user, course, course_type)[0]
+    key = _entitlement_key(user.pk, course.pk, course_type)
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed, timeout = _course_access(user, course, course_type)
+        cache.set(key, allowed, timeout)
+    return allowed
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if shared_cache():
+        return []
+    return [checks.Warning(
+        "The default cache is per-process, so course entitlements are read from the database on every media request.",
+        hint="Configure a shared CACHES['default'] (Redis, memcached or the database cache) in production.",
+        id='video_courses.W001',
+    )]
+
+
+def can_watch(user, video):
+    """Preview videos are open to everyone, the rest needs course access"""
+    if video.is_preview:
+        return True
+    return can_access_course(user, video.course)
+
+
+def can_read(user, pdf):
+    """Same rule for e-library PDFs"""
+    if pdf.is_preview:
+        return True
+    return can_access_course(user, pdf.course, 'elibrary')
+
+
+# ---------------------------------------------
+# Range requests
+# ---------------------------------------------
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) of a single-range ``Range`` header, or
+    ``None`` to send the whole file. Multiple ranges are answered with the
+    whole file, which RFC 9110 allows.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    """``If-Range``: only serve the range if the file has not changed"""
+    condition = request.headers.get('If-Range')
+    if not condition:
+        return True
+    if condition.startswith(('"', 'W/')):
+        return condition == etag
+    since = parse_http_date_safe(condition)
+    return since is not None and int(mtime) <= since
+
+
+def _not_modified(request, etag):
+    condition = request.headers.get('If-None-Match')
+    return bool(condition) and (condition.strip() == '*' or etag in (c.strip() for c in condition.split(',')))
+
+
+class RangeFile:
+    """
+    ``length`` bytes of an open file from ``start``, for ``FileResponse``.
+    The real file descriptor is exposed and positioned at ``start``, so
+    ``wsgi.file_wrapper`` implementations using ``os.sendfile`` (which send
+    Content-Length bytes from the current offset) copy only the range.
+    """
+
+    def __init__(self, f, start, length):
+        self.file = f
+        self.start = start
+        self.length = length
+        self.file.seek(start)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        remaining = self.length - self.tell()
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.file.read(size) if size > 0 else b''
+
+    def tell(self):
+        return self.file.tell() - self.start
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.tell()
+        elif whence == os.SEEK_END:
+            offset += self.length
+        self.file.seek(self.start + min(max(offset, 0), self.length))
+        return self.tell()
+
+    def close(self):
+        self.file.close()
+
+
+# ---------------------------------------------
+# Responses
+# ---------------------------------------------
+def _offload_response(name, content_type):
+    mode = getattr(settings, 'VIDEO_STREAM_OFFLOAD', None)
+    if not mode:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'VIDEO_STREAM_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix + quote(name)
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = default_storage.path(name)
+    else:
+        raise ValueError(f"Unknown VIDEO_STREAM_OFFLOAD mode: {mode!r}")
+    return response
+
+
+def _presigned_response(name, content_type, cache_control, disposition):
+    expires = default_storage.querystring_expire
+    headers = {'ResponseContentType': content_type, 'ResponseCacheControl': cache_control}
+    if disposition:
+        headers['ResponseContentDisposition'] = disposition
+    url = default_storage.presigned_url(name, expires, **headers)
+    response = HttpResponseRedirect(url)
+    # Re-used while the signature is still well within its lifetime
+    response['Cache-Control'] = f"private, max-age={expires // 2}"
+    return response
+
+
+def _remote_response(request, name, content_type, cache_control):
+    """Small text files of remote storages, read through the storage API"""
+    with default_storage.open(name, 'rb') as f:
+        data = f.read()
+    response = HttpResponse(b'' if request.method == 'HEAD' else data, content_type=content_type)
+    response['Content-Length'] = str(len(data))
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def serve_file(request, name, cache_control=PRIVATE_CACHE, filename=None, as_attachment=False):
+    """
+    Response for a stored file, with Range support, proxy offload or a
+    presigned redirect. ``filename``/``as_attachment`` set Content-Disposition.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    content_type = (
+        CONTENT_TYPES.get(extension)
+        or mimetypes.guess_type(name)[0]
+        or 'application/octet-stream'
+    )
+    disposition = content_disposition_header(as_attachment, filename) if filename or as_attachment else None
+
+    if hasattr(default_storage, 'presigned_url'):
+        if extension in PROXIED_EXTENSIONS:
+            return _remote_response(request, name, content_type, cache_control)
+        # The bucket answers range requests and validators itself
+        return _presigned_response(name, content_type, cache_control, disposition)
+
+    response = _offload_response(name, content_type)
+    if response is not None:
+        # The proxy handles ranges and validators itself
+        response['Cache-Control'] = cache_control
+        if disposition:
+            response['Content-Disposition'] = disposition
+        return response
+
+    path = default_storage.path(name)
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{int(stat.st_mtime):x}-{size:x}"'
+
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+    if byte_range and not _range_applies(request, etag, stat.st_mtime):
+        byte_range = None
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+    elif byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response.block_size = chunk_size()
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(RangeFile(open(path, 'rb'), start, length), status=206, content_type=content_type)
+        response.block_size = chunk_size()
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    if disposition:
+        response['Content-Disposition'] = disposition
+    return response
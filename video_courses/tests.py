@@ -1,3 +1,303 @@
-from django.test import TestCase
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils.http import http_date
+
+from base.models import User, UserCourseAccess
+
+from .models import CourseVideo, UploadSession, VideoCourse
+from .probing import add_course_seconds, probe_video
+from .signing import MediaTokenRevoked, mint_token, scoped_path, verify_token
+from .streaming import RangeFile, RangeNotSatisfiable, can_access_course, parse_range, serve_file
+from .uploads import (
+    ChecksumMismatch, UploadConflict, UploadError, append_chunk, create_upload, fcntl, staging_path,
+)
+from .url import urlpatterns
+from .views import protected_media
+
+
+# ---------------------------------------------
+# Signed media URLs
+# ---------------------------------------------
+class SignedMediaTokenTests(TestCase):
+    resource = 'video_course:7'
+    scope = 'video_courses/hls/7/abc/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='viewer@example.com', password='x')
+        self.access = UserCourseAccess.objects.create(user=self.user, course_id=7, course_type='video_course')
+
+    def test_round_trip(self):
+        payload = verify_token(mint_token(self.user.pk, self.resource, self.scope))
+        self.assertEqual((payload['u'], payload['r'], payload['s']), (self.user.pk, self.resource, self.scope))
+
+    def test_tampered_token_is_rejected(self):
+        token = mint_token(self.user.pk, self.resource, self.scope)
+        with self.assertRaises(signing.BadSignature):
+            verify_token(token[:-1] + ('B' if token.endswith('A') else 'A'))
+        forged = signing.Signer(key='not-the-secret-key', salt='video_courses.signed-media').sign_object(
+            {'u': self.user.pk, 'r': self.resource, 's': '', 'e': time.time() + 60, 'g': 1}, compress=True
+        )
+        with self.assertRaises(signing.BadSignature):
+            verify_token(forged)
+
+    def test_expired_token_is_rejected(self):
+        token = mint_token(self.user.pk, self.resource, self.scope)
+        with mock.patch('time.time', return_value=time.time() + 7 * 3600):
+            with self.assertRaises(signing.SignatureExpired):
+                verify_token(token)
+
+    def test_deactivation_revokes_durably(self):
+        token = mint_token(self.user.pk, self.resource, self.scope)
+        self.access.is_active = False
+        self.access.save()
+        # Another worker: nothing cached, the database alone decides
+        cache.clear()
+        with self.assertRaises(MediaTokenRevoked):
+            verify_token(token)
+
+        self.access.is_active = True
+        self.access.save()
+        with self.assertRaises(MediaTokenRevoked):
+            verify_token(token)
+        verify_token(mint_token(self.user.pk, self.resource, self.scope))
+
+    def test_deleted_grant_revokes(self):
+        token = mint_token(self.user.pk, self.resource, self.scope)
+        self.access.delete()
+        with self.assertRaises(MediaTokenRevoked):
+            verify_token(token)
+
+    def test_free_tokens_are_not_tied_to_a_grant(self):
+        verify_token(mint_token(0, 'video_course:8', self.scope))
+
+    def test_scoped_path(self):
+        self.assertEqual(scoped_path(self.scope, 'seg-1.ts'), self.scope + 'seg-1.ts')
+        self.assertIsNone(scoped_path(self.scope, '../other/seg-1.ts'))
+        self.assertEqual(scoped_path('elibrary/pdfs/a.pdf', 'a.pdf'), 'elibrary/pdfs/a.pdf')
+        self.assertIsNone(scoped_path('elibrary/pdfs/a.pdf', 'b.pdf'))
+
+
+# ---------------------------------------------
+# Range requests and entitlement
+# ---------------------------------------------
+class ParseRangeTests(SimpleTestCase):
+    def test_whole_file(self):
+        for header in (None, '', 'bytes=-', 'items=0-1', 'bytes=0-1,4-5'):
+            self.assertIsNone(parse_range(header, 100))
+
+    def test_closed_and_open_ended(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=90-500', 100), (90, 99))
+
+    def test_suffix(self):
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_not_satisfiable(self):
+        for header, size in (('bytes=100-', 100), ('bytes=5-4', 100), ('bytes=-0', 100), ('bytes=-5', 0)):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, size)
+
+
+class RangeFileTests(SimpleTestCase):
+    def test_reads_only_the_range(self):
+        f = RangeFile(io.BytesIO(bytes(range(100))), 10, 5)
+        self.assertEqual(f.read(3), bytes([10, 11, 12]))
+        self.assertEqual(f.tell(), 3)
+        self.assertEqual(f.read(), bytes([13, 14]))
+        self.assertEqual(f.read(), b'')
+
+    def test_seek_is_clamped_to_the_range(self):
+        f = RangeFile(io.BytesIO(bytes(range(100))), 10, 5)
+        self.assertEqual(f.seek(-2, io.SEEK_END), 3)
+        self.assertEqual(f.read(), bytes([13, 14]))
+        self.assertEqual(f.seek(50), 5)
+        self.assertEqual(f.seek(-50), 0)
+
+
+class ServeFileTests(SimpleTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, VIDEO_STREAM_OFFLOAD=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.name = default_storage.save('videos/clip.mp4', ContentFile(bytes(range(256)) * 4))
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        response = serve_file(self.factory.get('/', headers=headers), self.name)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        if hasattr(response, 'close'):
+            response.close()
+        return response, body
+
+    def test_partial_content(self):
+        response, body = self.get(Range='bytes=1020-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 1020-1023/1024')
+        self.assertEqual(body, bytes([252, 253, 254, 255]))
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.get(Range='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(Range='bytes=0-1', **{'If-Range': etag})[0].status_code, 206)
+        response, body = self.get(Range='bytes=0-1', **{'If-Range': '"stale"'})
+        self.assertEqual((response.status_code, len(body)), (200, 1024))
+        # A date before the last modification means the client's copy is stale
+        self.assertEqual(self.get(Range='bytes=0-1', **{'If-Range': http_date(0)})[0].status_code, 200)
+
+    def test_not_modified(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(**{'If-None-Match': etag})[0].status_code, 304)
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='viewer@example.com', password='x')
+        self.course = VideoCourse.objects.create(name='Optics', original_price=100, selling_price=50)
+
+    def test_grant_changes_apply_immediately_without_a_shared_cache(self):
+        self.assertFalse(can_access_course(self.user, self.course))
+        access = UserCourseAccess.objects.create(user=self.user, course_id=self.course.pk, course_type='video_course')
+        self.assertTrue(can_access_course(self.user, self.course))
+        # Revoked behind this worker's back (another process, a bulk update): no local cache to go stale
+        UserCourseAccess.objects.filter(pk=access.pk).update(is_active=False)
+        self.assertFalse(can_access_course(self.user, self.course))
+
+    def test_shared_cache_answers_are_dropped_on_change(self):
+        with mock.patch('video_courses.streaming.shared_cache', return_value=True):
+            self.assertFalse(can_access_course(self.user, self.course))
+            UserCourseAccess.objects.create(user=self.user, course_id=self.course.pk, course_type='video_course')
+            self.assertTrue(can_access_course(self.user, self.course))
+
+
+# ---------------------------------------------
+# Course totals
+# ---------------------------------------------
+class CourseHoursTests(TestCase):
+    def setUp(self):
+        self.course = VideoCourse.objects.create(name='Optics', original_price=100, selling_price=50)
+
+    def totals(self):
+        self.course.refresh_from_db()
+        return self.course.total_seconds, self.course.total_hours
+
+    def test_small_changes_do_not_drift(self):
+        for _ in range(100):
+            add_course_seconds(self.course.pk, 1)
+        self.assertEqual(self.totals(), (100, Decimal('0.03')))
+        add_course_seconds(self.course.pk, -500)
+        self.assertEqual(self.totals(), (0, Decimal('0.00')))
+
+    def test_first_probe_counts_a_preset_duration_in_full(self):
+        video = CourseVideo.objects.bulk_create([CourseVideo(
+            course=self.course, title='Intro', file='video_courses/blobs/ab/intro.mp4', duration_seconds=600,
+        )])[0]
+        info = {'duration': 900.2, 'width': 1280, 'height': 720, 'video_codec': 'h264', 'audio_codec': 'aac', 'bitrate': 1}
+        with mock.patch('video_courses.probing.local_source', return_value=contextlib.nullcontext('intro.mp4')), \
+                mock.patch('video_courses.probing.media_info', return_value=info):
+            self.assertTrue(probe_video(video.pk))
+            self.assertEqual(self.totals(), (900, Decimal('0.25')))
+            # Probing again only applies the difference
+            info['duration'] = 1800
+            self.assertTrue(probe_video(video.pk))
+        self.assertEqual(self.totals(), (1800, Decimal('0.50')))
+
+
+# ---------------------------------------------
+# Resumable (tus) uploads
+# ---------------------------------------------
+class ChunkedUploadTests(TestCase):
+    data = bytes(range(256)) * 40
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        settings = override_settings(UPLOAD_STAGING_ROOT=staging.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(email='teacher@example.com', password='x')
+        self.session = create_upload(self.user, 'pdf', 'notes.pdf', len(self.data))
+
+    def append(self, start, end, checksum=None, session=None):
+        return append_chunk(session or self.session, start, io.BytesIO(self.data[start:end]), end - start, checksum)
+
+    def test_chunks_assemble_and_complete(self):
+        self.assertEqual(self.append(0, 4000), 4000)
+        self.assertEqual(self.append(4000, len(self.data)), len(self.data))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, 'complete')
+        self.assertEqual(self.session.sha256, hashlib.sha256(self.data).hexdigest())
+
+    def test_wrong_offset_conflicts(self):
+        self.append(0, 4000)
+        with self.assertRaises(UploadConflict):
+            self.append(0, 4000)
+        # A stale session object (another request) re-reads the offset before writing
+        stale = UploadSession.objects.get(pk=self.session.pk)
+        stale.offset = 0
+        with self.assertRaises(UploadConflict):
+            self.append(0, 4000, session=stale)
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).offset, 4000)
+
+    def test_checksum(self):
+        good = ('sha256', hashlib.sha256(self.data[:4000]).digest())
+        with self.assertRaises(ChecksumMismatch):
+            self.append(0, 4000, ('sha256', hashlib.sha256(b'other').digest()))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.offset, 0)
+        self.assertEqual(self.append(0, 4000, good), 4000)
+        with self.assertRaises(UploadError):
+            self.append(4000, 5000, ('crc32', b'1234'))
+
+    def test_chunk_past_length_is_refused(self):
+        with self.assertRaises(UploadError):
+            append_chunk(self.session, 0, io.BytesIO(self.data + b'x'), len(self.data) + 1)
+
+    @skipIf(fcntl is None, "needs fcntl")
+    def test_concurrent_writer_is_refused_before_writing(self):
+        with open(staging_path(self.session), 'r+b') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            with self.assertRaises(UploadConflict):
+                self.append(0, 4000)
+        self.assertEqual(os.path.getsize(staging_path(self.session)), 0)
+        self.assertEqual(self.append(0, 4000), 4000)
+
+
+class ProtectedMediaTests(SimpleTestCase):
+    def test_paid_files_are_not_served_by_the_media_route(self):
+        for name in (
+            'elibrary/pdfs/notes.pdf',
+            'elibrary/blobs/3f/' + '3f' * 32 + '.pdf',
+            'elibrary/courses/previews/sample.pdf',
+            'video_courses/blobs/ab/abcdef.mp4',
+            'video_courses/optics/videos/intro.mp4',
+            'video_courses/optics/hls/v1/720p.m3u8',
+            'storage/upload_staging/x.part',
+        ):
+            self.assertEqual(resolve(f'/media/{name}').func, protected_media, name)
+
+    def test_course_covers_stay_public(self):
+        route = next(p for p in urlpatterns if p.callback is protected_media)
+        self.assertIsNone(route.pattern.match('media/elibrary/courses/covers/c.jpg'))
@@ -0,0 +1,184 @@
+"""
+Adaptive-bitrate HLS packaging of course videos.
+
+Every uploaded CourseVideo is transcoded by the local ffmpeg binary into an
+HLS ladder (one H.264/AAC rendition per rung not taller than the source,
+6 second segments, a master playlist). Output goes to a
+fresh versioned directory next to the course's uploads, so playlists and
+segments never change once written and can be cached as immutable.
+
+Jobs are queued when a video file is saved and run on the shared video job
+pool (see ``jobs.py``); the heavy lifting happens in the ffmpeg child
+processes. Progress is recorded in ``CourseVideo.hls_status``. Jobs
+lost to a restart are picked up again by ``manage.py transcode_videos``.
+"""
+import logging
+import os
+import posixpath
+import secrets
+import shutil
+import subprocess
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from base.storage import delete_directory, local_directory
+
+from .probing import ffprobe_binary, local_source, media_info
+
+logger = logging.getLogger(__name__)
+
+# (height, video kbps, audio kbps), lowest first
+LADDER = [
+    (360, 800, 96),
+    (540, 1400, 128),
+    (720, 2800, 128),
+    (1080, 5000, 160),
+]
+SEGMENT_SECONDS = 6
+MASTER_PLAYLIST = 'master.m3u8'
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def ffmpeg_binary():
+    return getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+
+def transcoding_available():
+    return bool(shutil.which(ffmpeg_binary()) and shutil.which(ffprobe_binary()))
+
+
+def run_tool(args):
+    timeout = getattr(settings, 'VIDEO_TRANSCODE_TIMEOUT', 4 * 3600)
+    try:
+        result = subprocess.run(args, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise TranscodeError(f"{args[0]} timed out after {timeout}s")
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.decode('utf-8', 'replace')[-2000:] or f"{args[0]} failed")
+    return result.stdout
+
+
+# ---------------------------------------------
+# ffmpeg commands
+# ---------------------------------------------
+def renditions(source_height):
+    """Ladder rungs worth producing for a source; never upscales"""
+    rungs = [rung for rung in LADDER if rung[0] <= source_height]
+    if not rungs:
+        # Smaller than the lowest rung: one rendition at the source size
+        height, video_kbps, audio_kbps = LADDER[0]
+        rungs = [(source_height - source_height % 2 or height, video_kbps, audio_kbps)]
+    return rungs
+
+
+def hls_command(source, out_dir, rungs, has_audio):
+    """One ffmpeg run encoding every rendition and writing all playlists"""
+    count = len(rungs)
+    graph = f"[0:v]split={count}" + ''.join(f"[v{i}]" for i in range(count))
+    for i, (height, _, _) in enumerate(rungs):
+        graph += f";[v{i}]scale=-2:{height}[v{i}out]"
+
+    args = [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y', '-i', source, '-filter_complex', graph]
+    stream_map = []
+    for i, (height, video_kbps, audio_kbps) in enumerate(rungs):
+        args += [
+            '-map', f'[v{i}out]', f'-c:v:{i}', 'libx264',
+            f'-b:v:{i}', f'{video_kbps}k', f'-maxrate:v:{i}', f'{video_kbps * 107 // 100}k',
+            f'-bufsize:v:{i}', f'{video_kbps * 2}k',
+        ]
+        if has_audio:
+            args += ['-map', 'a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{audio_kbps}k']
+            stream_map.append(f'v:{i},a:{i},name:{height}p')
+        else:
+            stream_map.append(f'v:{i},name:{height}p')
+    args += [
+        '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p', '-ac', '2',
+        # Keyframe at every segment boundary so renditions switch cleanly
+        '-sc_threshold', '0', '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})',
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(out_dir, '%v', 'seg_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(stream_map),
+        os.path.join(out_dir, '%v', 'index.m3u8'),
+    ]
+    return args
+
+
+# ---------------------------------------------
+# Jobs
+# ---------------------------------------------
+def hls_directory(video):
+    """Fresh storage-relative output directory, e.g. video_courses/<slug>/hls/<pk>-<version>"""
+    return posixpath.join(video.media_directory, 'hls', f"{video.pk}-{secrets.token_hex(4)}")
+
+
+def transcode_video(video_id):
+    """Package one video as HLS and record the outcome on the model"""
+    from .models import CourseVideo
+
+    video = CourseVideo.objects.get(pk=video_id)
+    if not video.file:
+        return False
+    source_name = video.file.name
+    previous = video.hls_playlist
+    CourseVideo.objects.filter(pk=video_id).update(hls_status='processing', hls_error='')
+
+    relative = hls_directory(video)
+    started = timezone.now()
+    try:
+        # Remote storages get the output from a local temp directory, uploaded once ffmpeg is done
+        with local_source(source_name, video.file.storage) as source, local_directory(default_storage, relative) as out_dir:
+            info = media_info(source)
+            rungs = renditions(info['height'])
+            for height, _, _ in rungs:
+                os.makedirs(os.path.join(out_dir, f'{height}p'), exist_ok=True)
+            run_tool(hls_command(source, out_dir, rungs, info['has_audio']))
+    except Exception as e:
+        delete_directory(default_storage, relative)
+        logger.error(f"HLS packaging of video {video_id} failed: {e}")
+        CourseVideo.objects.filter(pk=video_id, file=source_name).update(hls_status='failed', hls_error=str(e)[-2000:])
+        return False
+
+    # Only publish if the upload was not replaced while we were encoding
+    updates = {
+        'hls_status': 'ready',
+        'hls_playlist': posixpath.join(relative, MASTER_PLAYLIST),
+        'hls_error': '',
+    }
+    previous_dir = posixpath.dirname(previous) if previous else None
+    # Posters used to be written into the HLS directory; regenerate those elsewhere
+    stale_poster = bool(previous_dir and video.thumb_image and video.thumb_image.name.startswith(previous_dir + '/'))
+    if stale_poster:
+        updates['thumb_image'] = ''
+    if not CourseVideo.objects.filter(pk=video_id, file=source_name).update(**updates):
+        delete_directory(default_storage, relative)
+        return False
+    delete_directory(default_storage, previous_dir)
+    if stale_poster:
+        from .previews import generate_previews
+        generate_previews(video_id)
+    logger.info(
+        f"Packaged video {video_id} as HLS ({', '.join(f'{h}p' for h, _, _ in rungs)}) "
+        f"in {(timezone.now() - started).total_seconds():.1f}s"
+    )
+    return True
+
+
+def queue_transcode(video):
+    """Mark ``video`` queued and start packaging once the upload is committed"""
+    from .jobs import submit_after_commit
+    from .models import CourseVideo
+
+    if not transcoding_available():
+        logger.warning(f"ffmpeg/ffprobe not found; video {video.pk} will be served as uploaded")
+        return False
+    CourseVideo.objects.filter(pk=video.pk).update(hls_status='queued', hls_error='')
+    video.hls_status = 'queued'
+    submit_after_commit(transcode_video, video.pk)
+    return True
@@ -0,0 +1,291 @@
+"""
+Resumable chunked uploads for large course videos and e-library PDFs.
+
+A small subset of the tus protocol (https://tus.io, core + creation +
+termination + checksum): the browser creates an upload with its total
+length, then PATCHes it in chunks of at most ``UPLOAD_CHUNK_MAX_SIZE``
+bytes, each carrying the offset it starts at. Chunks are written straight
+from the request stream into one staging file per upload under
+``UPLOAD_STAGING_ROOT``; Django's upload handlers and the whole-body
+buffering of a multipart POST are never involved. After a dropped
+connection the client asks for the offset (HEAD) and continues from there.
+
+A PATCH first takes an exclusive lock on the staging file and only then
+checks the offset, so two requests for the same offset (a client retrying
+a chunk that is still arriving) never write at once: the second one gets a
+409 and asks for the offset again.
+
+When the last byte arrives the staging file is hashed in one streaming
+pass (SHA-256, kept on the session). The course form then submits the
+upload id instead of the file and ``claim_upload`` hands the staged file to
+the model's FileField, which moves it into place (a rename on local
+storage), so probing, previews and HLS packaging are queued as for any
+other upload. Abandoned uploads are removed by ``purge_uploads``.
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:
+    # Windows development servers handle one request at a time
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,termination,checksum'
+BLOCK_SIZE = 1024 * 1024
+DEFAULT_CHUNK_MAX_SIZE = 32 * 1024 * 1024
+DEFAULT_MAX_SIZE = 20 * 1024 ** 3
+DEFAULT_EXPIRY = 24 * 3600
+
+EXTENSIONS = {
+    'video': ('.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi'),
+    'pdf': ('.pdf',),
+}
+
+
+class UploadError(Exception):
+    """Refused request; ``status`` is the HTTP status to answer with"""
+    status = 400
+
+
+class UploadConflict(UploadError):
+    status = 409
+
+
+class ChecksumMismatch(UploadError):
+    # tus checksum extension
+    status = 460
+
+
+def chunk_max_size():
+    return getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', DEFAULT_CHUNK_MAX_SIZE)
+
+
+def max_upload_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def staging_path(session):
+    root = getattr(settings, 'UPLOAD_STAGING_ROOT', None) or os.path.join(settings.MEDIA_ROOT, 'storage', 'upload_staging')
+    return os.path.join(root, f"{session.pk}.part")
+
+
+def parse_metadata(header):
+    """tus ``Upload-Metadata``: comma separated ``key base64(value)`` pairs"""
+    metadata = {}
+    for pair in filter(None, (p.strip() for p in (header or '').split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ''
+        except (binascii.Error, UnicodeDecodeError):
+            raise UploadError(f"Invalid metadata value for {key}")
+    return metadata
+
+
+# ---------------------------------------------
+# Sessions
+# ---------------------------------------------
+def create_upload(user, kind, filename, length):
+    from .models import UploadSession
+
+    filename = os.path.basename(filename or '').strip()
+    if kind not in EXTENSIONS:
+        raise UploadError(f"Unknown upload kind: {kind}")
+    if not filename or not filename.lower().endswith(EXTENSIONS[kind]):
+        raise UploadError(f"Allowed file types: {', '.join(EXTENSIONS[kind])}")
+    if length <= 0:
+        raise UploadError("Upload-Length must be positive")
+    if length > max_upload_size():
+        raise UploadError(f"File is larger than {max_upload_size()} bytes")
+
+    session = UploadSession.objects.create(user=user, kind=kind, filename=filename[-255:], length=length)
+    path = staging_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return session
+
+
+def _copy_chunk(stream, f, size, digest):
+    written = 0
+    while written < size:
+        block = stream.read(min(BLOCK_SIZE, size - written))
+        if not block:
+            break
+        f.write(block)
+        if digest is not None:
+            digest.update(block)
+        written += len(block)
+    return written
+
+
+@contextmanager
+def _writer_lock(f):
+    """Exclusive lock on an open staging file: one writer per upload at a time"""
+    if fcntl is None:
+        yield
+        return
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadConflict("Another request is writing to this upload")
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def append_chunk(session, offset, stream, size, checksum=None):
+    """
+    Write ``size`` bytes of ``stream`` at ``offset`` and return the new
+    offset. ``checksum`` is an optional ``(algorithm, digest)`` pair for
+    this chunk (tus ``Upload-Checksum``). A client that disconnects midway
+    keeps what was received and resumes from the returned offset.
+    """
+    from .models import UploadSession
+
+    if size > chunk_max_size():
+        raise UploadError(f"Chunks are limited to {chunk_max_size()} bytes")
+    if offset + size > session.length:
+        raise UploadError("Chunk goes past Upload-Length")
+
+    digest = None
+    if checksum:
+        algorithm, expected = checksum
+        if algorithm not in ('sha1', 'sha256', 'md5'):
+            raise UploadError(f"Unsupported checksum algorithm: {algorithm}")
+        digest = hashlib.new(algorithm)
+
+    try:
+        f = open(staging_path(session), 'r+b')
+    except FileNotFoundError:
+        raise UploadConflict("Upload was discarded")
+    with f, _writer_lock(f):
+        # Claim the offset before writing: read it again now that no one else can move it
+        session.refresh_from_db(fields=['offset', 'status'])
+        if session.status != 'uploading':
+            raise UploadConflict("Upload is already finished")
+        if offset != session.offset:
+            raise UploadConflict(f"Upload-Offset must be {session.offset}")
+
+        f.seek(offset)
+        written = _copy_chunk(stream, f, size, digest)
+        if digest is not None and (written != size or digest.digest() != expected):
+            # Leave the bytes where they are: the offset is not advanced
+            raise ChecksumMismatch("Chunk checksum mismatch")
+        f.flush()
+
+        # Still compare-and-swap: without fcntl the lock above is a no-op
+        with transaction.atomic():
+            moved = UploadSession.objects.filter(pk=session.pk, offset=offset, status='uploading').update(
+                offset=offset + written, updated_at=timezone.now()
+            )
+        if not moved:
+            raise UploadConflict("Upload-Offset changed by another request")
+        session.offset = offset + written
+        if session.offset == session.length:
+            finish_upload(session)
+    return session.offset
+
+
+def finish_upload(session):
+    """Hash the assembled file in one streaming pass"""
+    path = staging_path(session)
+    size = os.path.getsize(path)
+    if size != session.length:
+        session.status, session.error = 'failed', f"Assembled {size} of {session.length} bytes"
+        logger.error(f"Upload {session.pk} failed: {session.error}")
+    else:
+        with open(path, 'rb') as f:
+            session.sha256 = hashlib.file_digest(f, 'sha256').hexdigest()
+        session.status = 'complete'
+    session.save(update_fields=['status', 'sha256', 'error', 'updated_at'])
+
+
+def discard_upload(session):
+    try:
+        os.remove(staging_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+# ---------------------------------------------
+# Attaching to CourseVideo / ELibraryPDF
+# ---------------------------------------------
+class StagedFile(File):
+    """
+    A finished upload, ready for ``FieldFile.save``. FileSystemStorage moves
+    files that expose ``temporary_file_path`` instead of copying them; other
+    storages read ``chunks()``. The staging file is only opened when read.
+    """
+
+    def __init__(self, session):
+        self.session_id = session.pk
+        self.path = staging_path(session)
+        # Lets content-addressed storage move the file in without hashing it again
+        self.sha256 = session.sha256
+        super().__init__(None, name=session.filename)
+        self.size = session.length
+
+    def open(self, mode='rb'):
+        if self.closed:
+            self.file = open(self.path, mode)
+        else:
+            self.seek(0)
+        return self
+
+    def chunks(self, chunk_size=None):
+        self.open()
+        try:
+            yield from super().chunks(chunk_size)
+        finally:
+            self.close()
+
+    def temporary_file_path(self):
+        return self.path
+
+    def release(self):
+        """Call once the file is saved; the session goes when the transaction commits"""
+        from .models import UploadSession
+
+        transaction.on_commit(lambda: UploadSession.objects.filter(pk=self.session_id).delete())
+
+
+def claim_upload(user, upload_id, kind):
+    """Staged file of a complete upload by ``user``, for assigning to a FileField"""
+    from .models import UploadSession
+
+    try:
+        session = UploadSession.objects.get(pk=upload_id, user=user, kind=kind, status='complete')
+    except (UploadSession.DoesNotExist, ValidationError):
+        raise UploadError("Upload not found or not finished")
+    staged = StagedFile(session)
+    if not os.path.exists(staged.path):
+        raise UploadError("Upload was already used")
+    return staged
+
+
+def purge_stale_uploads(max_age=None):
+    """Remove uploads untouched for ``UPLOAD_EXPIRY`` seconds; returns the count"""
+    from .models import UploadSession
+
+    max_age = max_age if max_age is not None else getattr(settings, 'UPLOAD_EXPIRY', DEFAULT_EXPIRY)
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in stale:
+        discard_upload(session)
+    return len(stale)
@@ -1,4 +1,5 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
@@ -6,4 +7,15 @@ urlpatterns = [
     path("video-courses/<int:pk>/edit/", views.video_course_edit_by_pk, name="video_course_edit_by_pk"),  # Changed name here
     path("video-courses/<int:pk>/delete/", views.video_course_delete, name="video_course_delete"),
     path("video-courses/manage/", views.video_course_manage, name="video_course_manage"),
+    path("videos/<int:pk>/stream/", views.video_stream, name="video_stream"),
+    path("videos/<int:pk>/hls/<path:name>", views.video_hls, name="video_hls"),
+    path("videos/<int:pk>/previews/<str:name>", views.video_preview, name="video_preview"),
+    path("videos/<int:pk>/progress/", views.video_progress, name="video_progress"),
+    path("signed-media/<str:token>/<path:name>", views.signed_media, name="signed_media"),
+    path("video-courses/<int:pk>/offline-pack/", views.video_offline_pack, name="video_offline_pack"),
+    path("uploads/", views.upload_create, name="upload_create"),
+    path("uploads/<uuid:upload_id>/", views.upload_detail, name="upload_detail"),
+    # Keep the development media server from bypassing the entitlement check;
+    # of the e-library only the course covers are public
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>video_courses/(?:blobs/.*|[^/]+/(?:videos/.*|hls/.*\.(?:m3u8|ts|json)|previews/.*/sprite-.*))|elibrary/(?!courses/covers/).*|storage/upload_staging/.*)$", views.protected_media),
 ]
@@ -4,10 +4,26 @@ from django.urls import reverse
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404
+from django.core.exceptions import PermissionDenied
+from django.views.decorators.http import require_http_methods, require_GET
 from django.db import models
 import json
-from video_courses.models import VideoCourse
+from video_courses.models import VideoCourse, CourseVideo, UploadSession
+from video_courses.streaming import can_access_course, can_watch, serve_file, IMMUTABLE_CACHE, PRIVATE_CACHE
+from video_courses.offline import build_pack
+from video_courses.signing import scoped_path, verify_token
+from django.core import signing
+from base.storage import is_blob
+from video_courses.progress import record_heartbeat
+from video_courses.uploads import (
+    TUS_EXTENSIONS, TUS_VERSION, UploadError, append_chunk, chunk_max_size, create_upload, discard_upload,
+    max_upload_size, parse_metadata,
+)
+import base64
+import binascii
+import posixpath
+import re
 from .forms import VideoCourseForm, LearnFormSet, IncludeFormSet, VideoFormSet
 
 
@@ -21,7 +37,9 @@ def video_course_create(request):
         form = VideoCourseForm(request.POST, request.FILES, instance=course)
         learn_fs = LearnFormSet(request.POST, instance=course, prefix="learn")
         include_fs = IncludeFormSet(request.POST, instance=course, prefix="incl")
-        video_fs = VideoFormSet(request.POST, request.FILES, instance=course, prefix="vid")
+        video_fs = VideoFormSet(
+            request.POST, request.FILES, instance=course, prefix="vid", form_kwargs={"user": request.user}
+        )
 
 
 
@@ -220,7 +238,9 @@ def video_course_edit_by_pk(request, pk):
         form = VideoCourseForm(request.POST, request.FILES, instance=course)
         learn_fs = LearnFormSet(request.POST, instance=course, prefix="learn")
         include_fs = IncludeFormSet(request.POST, instance=course, prefix="incl")
-        video_fs = VideoFormSet(request.POST, request.FILES, instance=course, prefix="vid")
+        video_fs = VideoFormSet(
+            request.POST, request.FILES, instance=course, prefix="vid", form_kwargs={"user": request.user}
+        )
 
 
 
@@ -392,3 +412,179 @@ def video_course_toggle_status(request, pk):
             "success": False,
             "error": f"Failed to update course status: {str(e)}"
         }, status=500)
+
+
+# ---------------------------------------------
+# Stream Course Video
+# ---------------------------------------------
+@require_http_methods(["GET", "HEAD"])
+def video_stream(request, pk):
+    """Serve a course video to entitled viewers, with Range support for seeking"""
+    video = get_object_or_404(CourseVideo.objects.select_related("course"), pk=pk)
+    if not can_watch(request.user, video):
+        raise PermissionDenied("Purchase the course to watch this video.")
+    try:
+        return serve_file(request, video.file.name)
+    except FileNotFoundError:
+        raise Http404("Video file not found")
+
+
+HLS_FILE_RE = re.compile(r"^(?:[\w-]+/)?[\w.-]+\.(?:m3u8|ts)$")
+
+
+@require_http_methods(["GET", "HEAD"])
+def video_hls(request, pk, name):
+    """Serve the HLS playlists and segments of a packaged course video"""
+    video = get_object_or_404(CourseVideo.objects.select_related("course"), pk=pk, hls_status="ready")
+    if not HLS_FILE_RE.match(name) or ".." in name:
+        raise Http404("Not found")
+    if not can_watch(request.user, video):
+        raise PermissionDenied("Purchase the course to watch this video.")
+    try:
+        return serve_file(request, posixpath.join(posixpath.dirname(video.hls_playlist), name), IMMUTABLE_CACHE)
+    except FileNotFoundError:
+        raise Http404("Not found")
+
+
+PREVIEW_FILE_RE = re.compile(r"^sprite-[0-9a-f]{12}\.(?:jpg|vtt)$")
+
+
+@require_http_methods(["GET", "HEAD"])
+def video_preview(request, pk, name):
+    """Serve the seek-preview sprite sheet and its WebVTT index"""
+    video = get_object_or_404(CourseVideo.objects.select_related("course"), pk=pk)
+    if not PREVIEW_FILE_RE.match(name) or not video.preview_vtt:
+        raise Http404("Not found")
+    if not can_watch(request.user, video):
+        raise PermissionDenied("Purchase the course to watch this video.")
+    try:
+        return serve_file(request, posixpath.join(posixpath.dirname(video.preview_vtt), name), IMMUTABLE_CACHE)
+    except FileNotFoundError:
+        raise Http404("Not found")
+
+
+@require_http_methods(["GET", "HEAD"])
+def signed_media(request, token, name):
+    """Serve a file covered by a signed media URL; no session or database access"""
+    try:
+        payload = verify_token(token)
+    except signing.BadSignature:
+        raise PermissionDenied("This media link has expired. Reload the page.")
+    path = scoped_path(payload["s"], name)
+    if path is None:
+        raise Http404("Not found")
+    # Directory scopes hold versioned HLS output and content-hashed previews; blobs are named by their hash
+    cache_control = IMMUTABLE_CACHE if payload["s"].endswith("/") or is_blob(path) else PRIVATE_CACHE
+    try:
+        return serve_file(request, path, cache_control)
+    except FileNotFoundError:
+        raise Http404("Not found")
+
+
+@require_GET
+def video_offline_pack(request, pk):
+    """Manifest of the offline download pack of a purchased course"""
+    course = get_object_or_404(VideoCourse, pk=pk)
+    if not can_access_course(request.user, course):
+        return JsonResponse({"status": "error", "message": "Purchase the course to download it."}, status=403)
+    response = JsonResponse(build_pack(request.user, course))
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@require_POST
+def video_progress(request, pk):
+    """Player heartbeat: remember the position in a video (buffered, see progress.py)"""
+    video = get_object_or_404(CourseVideo.objects.select_related("course"), pk=pk)
+    if not request.user.is_authenticated or not can_watch(request.user, video):
+        return JsonResponse({"status": "error", "message": "Not allowed"}, status=403)
+    try:
+        position = float(request.POST.get("position", ""))
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid position"}, status=400)
+    ended = request.POST.get("ended") in ("1", "true")
+    completed = record_heartbeat(request.user.pk, video, position, ended)
+    return JsonResponse({"status": "success", "completed": completed})
+
+
+# ---------------------------------------------
+# Resumable uploads (tus, see uploads.py)
+# ---------------------------------------------
+def _tus_response(status=204, **headers):
+    response = HttpResponse(status=status)
+    response["Tus-Resumable"] = TUS_VERSION
+    response["Cache-Control"] = "no-store"
+    for name, value in headers.items():
+        response[name.replace("_", "-")] = str(value)
+    return response
+
+
+def _tus_error(error):
+    response = _tus_response(error.status)
+    if error.status == 460:
+        response.reason_phrase = "Checksum Mismatch"
+    response.content = str(error)
+    response["Content-Type"] = "text/plain; charset=utf-8"
+    return response
+
+
+@require_http_methods(["POST", "OPTIONS"])
+def upload_create(request):
+    """Start a chunked upload: ``Upload-Length`` and ``Upload-Metadata`` (filename, kind)"""
+    if request.method == "OPTIONS":
+        return _tus_response(
+            Tus_Version=TUS_VERSION, Tus_Extension=TUS_EXTENSIONS, Tus_Max_Size=max_upload_size(),
+            Tus_Checksum_Algorithm="sha1,sha256,md5",
+        )
+    if not request.user.is_staff:
+        return _tus_response(403)
+    try:
+        metadata = parse_metadata(request.headers.get("Upload-Metadata"))
+        length = int(request.headers.get("Upload-Length", ""))
+        session = create_upload(request.user, metadata.get("kind", ""), metadata.get("filename", ""), length)
+    except ValueError:
+        return _tus_error(UploadError("Upload-Length is required"))
+    except UploadError as e:
+        return _tus_error(e)
+    return _tus_response(
+        201, Location=reverse("upload_detail", args=[session.pk]), Upload_Offset=0, Upload_Chunk_Max_Size=chunk_max_size()
+    )
+
+
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def upload_detail(request, upload_id):
+    """HEAD reports the offset to resume from, PATCH appends a chunk, DELETE aborts"""
+    if not request.user.is_staff:
+        return _tus_response(403)
+    session = UploadSession.objects.filter(pk=upload_id, user=request.user).first()
+    if session is None:
+        return _tus_response(404)
+    if request.method == "DELETE":
+        discard_upload(session)
+        return _tus_response(204)
+    if session.status == "failed":
+        return _tus_response(410)
+    if request.method == "HEAD":
+        return _tus_response(200, Upload_Offset=session.offset, Upload_Length=session.length)
+
+    if request.content_type != "application/offset+octet-stream":
+        return _tus_response(415)
+    checksum = None
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+        size = int(request.META.get("CONTENT_LENGTH") or 0)
+        if request.headers.get("Upload-Checksum"):
+            algorithm, _, value = request.headers["Upload-Checksum"].partition(" ")
+            checksum = (algorithm, base64.b64decode(value, validate=True))
+    except (ValueError, binascii.Error):
+        return _tus_error(UploadError("Invalid Upload-Offset or Upload-Checksum"))
+    try:
+        offset = append_chunk(session, offset, request, size, checksum)
+    except UploadError as e:
+        return _tus_error(e)
+    return _tus_response(204, Upload_Offset=offset)
+
+
+def protected_media(request, path):
+    """Course videos and e-library PDFs are only served through their entitlement-checked views"""
+    raise Http404("Not found")